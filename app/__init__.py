@@ -17,6 +17,20 @@ def create_app(config_name=None):
     db.init_app(app)
     CORS(app)
     
+    from app.services import price_cache
+    from app.pagination import count_cache, cursor_url
+    from app.cache import response_cache
+    from app.ids import id_generator
+    from app.stream import broadcaster
+    from app.catalog import catalog_index
+    id_generator.init_app(app)
+    broadcaster.init_app(app)
+    catalog_index.init_app(app)
+    price_cache.init_app(app)
+    count_cache.init_app(app)
+    response_cache.init_app(app)
+    app.add_template_global(cursor_url)
+    
     # Initialize login manager
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -45,10 +59,13 @@ def create_app(config_name=None):
     def server_error(error):
         return render_template('errors/500.html'), 500
     
-    # Create database tables and seed initial data (with error handling for Vercel)
+    # Create or upgrade database tables and seed initial data (with error handling for Vercel)
     with app.app_context():
         try:
-            db.create_all()
+            from app.schema import upgrade_schema
+            for change in upgrade_schema():
+                if not change.startswith('created table'):
+                    print(f"✓ Schema upgrade: {change}")
             # Seed initial data if needed
             _seed_initial_data()
         except Exception as e:
@@ -56,6 +73,12 @@ def create_app(config_name=None):
             # Continue running even if DB init fails
             pass
     
+    from app.search import catalog_search
+    catalog_search.init_app(app)
+    
+    from app.scheduler import scheduler
+    scheduler.init_app(app)
+    
     return app
 
 def _seed_initial_data():
@@ -110,7 +133,7 @@ def _seed_initial_data():
                     'name': 'Antminer L7',
                     'manufacturer': 'Bitmain',
                     'model': 'L7',
-                    'hash_rate': 9.5,
+                    'hash_rate': 0.0095,  # 9.5 GH/s
                     'power_consumption': 3425,
                     'algorithm': 'Scrypt',
                     'price_usd': 8500,
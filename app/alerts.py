@@ -0,0 +1,124 @@
+"""
+Price alert evaluation
+
+Pending alerts live in a composite index on (miner_id, alert_type, is_active,
+target_price): one sorted threshold list per miner and direction. When a
+miner's price moves, the alerts it crossed are a single range of that list
+(drops_to alerts with target_price >= price, rises_to alerts with
+target_price <= price), so each direction is triggered with one
+UPDATE ... RETURNING that touches only the alerts that fire. Triggered alerts
+are deactivated, which moves them out of the range, so the cost of a price
+update does not grow with the number of active alerts.
+
+ORM changes to ASICMiner.price_usd are evaluated in the same flush; code that
+writes prices with bulk Core statements calls PriceAlertEngine.evaluate().
+"""
+import math
+import logging
+from datetime import datetime
+from app.models import db, ASICMiner, PriceAlert
+
+logger = logging.getLogger(__name__)
+
+ALERT_TYPES = ('drops_to', 'rises_to')
+
+class PriceAlertEngine:
+    """Finds and triggers the price alerts crossed by price changes"""
+
+    @staticmethod
+    def _trigger(executor, miner_id, price, now):
+        table = PriceAlert.__table__
+        triggered = []
+        for alert_type, crossed in (
+            ('drops_to', table.c.target_price >= price),
+            ('rises_to', table.c.target_price <= price)
+        ):
+            rows = executor.execute(
+                db.update(table)
+                .where(
+                    table.c.miner_id == miner_id,
+                    table.c.alert_type == alert_type,
+                    table.c.is_active == True,
+                    crossed,
+                    table.c.triggered == False
+                )
+                .values(triggered=True, is_active=False, triggered_at=now)
+                .returning(table.c.id, table.c.user_id, table.c.miner_id, table.c.alert_type, table.c.target_price)
+            ).all()
+            triggered.extend(rows)
+        return triggered
+
+    @staticmethod
+    def _watched(executor, miner_ids, batch_size=500):
+        """The miner_ids (sorted) that have active, untriggered alerts"""
+        table = PriceAlert.__table__
+        watched = set()
+        for start in range(0, len(miner_ids), batch_size):
+            watched.update(executor.execute(
+                db.select(table.c.miner_id).distinct().where(
+                    table.c.miner_id.in_(miner_ids[start:start + batch_size]),
+                    table.c.is_active == True,
+                    table.c.triggered == False
+                )
+            ).scalars())
+        return sorted(watched)
+
+    @staticmethod
+    def evaluate(prices, connection=None):
+        """Trigger the alerts crossed by {miner_id: price}; returns the triggered rows
+
+        Runs in the current session's transaction (or on connection) and leaves
+        the commit to the caller. Miners are processed in id order so
+        concurrent evaluations lock alert rows in the same sequence.
+        """
+        executor = connection if connection is not None else db.session
+        now = datetime.utcnow()
+        triggered = []
+        miner_ids = sorted(prices)
+        if len(miner_ids) > 1:
+            # Bulk price changes (imports, evaluate_all) mostly hit miners nobody watches
+            miner_ids = PriceAlertEngine._watched(executor, miner_ids)
+        for miner_id in miner_ids:
+            price = prices[miner_id]
+            if price is None:
+                continue
+            triggered.extend(PriceAlertEngine._trigger(executor, miner_id, price, now))
+        if triggered:
+            logger.info(f"Triggered {len(triggered)} price alerts across {len({row.miner_id for row in triggered})} miners")
+        return triggered
+
+    @staticmethod
+    def evaluate_all():
+        """Re-check every miner at its current price and commit; returns the triggered rows
+
+        Catches alerts created beyond their threshold and prices written
+        without going through evaluate().
+        """
+        try:
+            prices = dict(db.session.query(ASICMiner.id, ASICMiner.price_usd).all())
+            triggered = PriceAlertEngine.evaluate(prices)
+            db.session.commit()
+            return triggered
+        except Exception as e:
+            logger.error(f"Error evaluating price alerts: {e}")
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def create(user_id, miner, target_price, alert_type='drops_to'):
+        """Add an alert for miner and evaluate it against the current price; the caller commits"""
+        if alert_type not in ALERT_TYPES:
+            raise ValueError(f"alert_type must be one of {', '.join(ALERT_TYPES)}")
+        if target_price is None or not (math.isfinite(target_price) and target_price > 0):
+            raise ValueError('target_price must be a positive finite number')
+        alert = PriceAlert(user_id=user_id, miner_id=miner.id, target_price=target_price, alert_type=alert_type)
+        db.session.add(alert)
+        db.session.flush()
+        PriceAlertEngine.evaluate({miner.id: miner.price_usd})
+        db.session.refresh(alert)
+        return alert
+
+@db.event.listens_for(ASICMiner, 'after_update')
+def _miner_price_changed(mapper, connection, miner):
+    if db.inspect(miner).attrs.price_usd.history.has_changes():
+        PriceAlertEngine.evaluate({miner.id: miner.price_usd}, connection)
@@ -0,0 +1,290 @@
+"""
+In-process caches shared across requests
+
+TTLCache backs upstream lookups (prices, listing counts). ResponseCache stores
+rendered responses for anonymous visitors, keyed on a namespace version held
+in the database so a bump from any worker invalidates every worker's copies.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import request, session, make_response, current_app
+from flask_login import current_user
+from app.models import db, dialect_insert, CacheVersion
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """Process-wide TTL cache for expensive lookups
+    
+    Fresh entries are served directly; entries past their TTL are served stale
+    while a background refresh runs (stale-while-revalidate), and entries close
+    to expiry are refreshed ahead of time. Concurrent misses for the same key
+    collapse into a single upstream fetch (single-flight).
+    """
+    
+    def __init__(self, ttl=60, stale_ttl=600, refresh_ahead=0.8, error_backoff=30, wait_timeout=15, config_prefix=None):
+        self.config_prefix = config_prefix
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.refresh_ahead = refresh_ahead
+        self.error_backoff = error_backoff
+        self.wait_timeout = wait_timeout
+        self._entries = {}  # key -> (value, fetched_at)
+        self._failures = {}  # key -> monotonic time of last failed fetch
+        self._inflight = {}  # key -> threading.Event set when the fetch finishes
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'refreshes': 0, 'errors': 0, 'collapsed': 0}
+    
+    def init_app(self, app):
+        """Read <config_prefix>_TTL, _STALE_TTL, _REFRESH_AHEAD and _ERROR_BACKOFF from the Flask config"""
+        prefix = self.config_prefix
+        if not prefix:
+            return
+        self.ttl = app.config.get(f'{prefix}_TTL', self.ttl)
+        self.stale_ttl = app.config.get(f'{prefix}_STALE_TTL', self.stale_ttl)
+        self.refresh_ahead = app.config.get(f'{prefix}_REFRESH_AHEAD', self.refresh_ahead)
+        self.error_backoff = app.config.get(f'{prefix}_ERROR_BACKOFF', self.error_backoff)
+    
+    def get(self, key, loader):
+        """Return the cached value for key, calling loader() to fill it when needed"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, fetched_at = entry
+                age = now - fetched_at
+                if age < self.ttl:
+                    self._stats['hits'] += 1
+                    if age >= self.ttl * self.refresh_ahead:
+                        self._start_background_refresh(key, loader)
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    self._stats['stale'] += 1
+                    self._start_background_refresh(key, loader)
+                    return value
+            
+            self._stats['misses'] += 1
+            failed_at = self._failures.get(key)
+            if failed_at is not None and now - failed_at < self.error_backoff:
+                raise RuntimeError(f"Upstream fetch for {key} failed recently, backing off")
+            
+            event = self._inflight.get(key)
+            leader = event is None
+            if leader:
+                event = self._inflight[key] = threading.Event()
+            else:
+                self._stats['collapsed'] += 1
+        
+        if leader:
+            return self._load(key, loader, event)
+        
+        # Another request is already fetching this key; wait for its result
+        event.wait(self.wait_timeout)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            raise RuntimeError(f"Upstream fetch for {key} did not produce a value")
+        return entry[0]
+    
+    def _start_background_refresh(self, key, loader):
+        """Start a refresh thread unless one is already running (lock held)"""
+        if key in self._inflight:
+            return
+        event = self._inflight[key] = threading.Event()
+        thread = threading.Thread(
+            target=self._refresh_quietly,
+            args=(key, loader, event),
+            name='ttl-cache-refresh',
+            daemon=True
+        )
+        thread.start()
+    
+    def _refresh_quietly(self, key, loader, event):
+        try:
+            self._load(key, loader, event)
+        except Exception as e:
+            logger.warning(f"Background cache refresh failed for {key}: {e}")
+    
+    def _load(self, key, loader, event):
+        """Run loader and publish its result to waiters"""
+        try:
+            value = loader()
+            with self._lock:
+                self._entries[key] = (value, time.monotonic())
+                self._failures.pop(key, None)
+                self._stats['refreshes'] += 1
+            return value
+        except Exception:
+            with self._lock:
+                self._failures[key] = time.monotonic()
+                self._stats['errors'] += 1
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            event.set()
+    
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._failures.clear()
+            else:
+                self._entries.pop(key, None)
+                self._failures.pop(key, None)
+    
+    def get_stats(self):
+        """Return hit/miss/stale counters and the hit ratio"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['stale'] + stats['misses']
+        stats['hit_ratio'] = (stats['hits'] + stats['stale']) / lookups if lookups else 0.0
+        return stats
+
+# ==================== CACHE VERSIONS ====================
+_versions = {}  # namespace -> (version, checked_at)
+_versions_lock = threading.Lock()
+
+def get_version(namespace, max_age=None):
+    """Current version of a cache namespace, re-read from the database every max_age seconds"""
+    if max_age is None:
+        max_age = current_app.config.get('CACHE_VERSION_CHECK_INTERVAL', 2)
+    now = time.monotonic()
+    with _versions_lock:
+        cached = _versions.get(namespace)
+    if cached is not None and now - cached[1] < max_age:
+        return cached[0]
+    
+    try:
+        version = db.session.query(CacheVersion.version).filter_by(name=namespace).scalar() or 0
+    except Exception as e:
+        logger.warning(f"Could not read cache version for {namespace}: {e}")
+        db.session.rollback()
+        version = cached[0] if cached is not None else 0
+    with _versions_lock:
+        _versions[namespace] = (version, now)
+    return version
+
+def bump_version(namespace):
+    """Invalidate a cache namespace in every worker; call after the change has committed"""
+    try:
+        stmt = dialect_insert(CacheVersion).values(name=namespace, version=1, updated_at=datetime.utcnow())
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CacheVersion.name],
+            set_={'version': CacheVersion.version + 1, 'updated_at': stmt.excluded.updated_at}
+        )
+        db.session.execute(stmt)
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error bumping cache version for {namespace}: {e}")
+        db.session.rollback()
+        return
+    with _versions_lock:
+        _versions.pop(namespace, None)
+    response_cache.purge(namespace)
+
+# ==================== RESPONSE CACHE ====================
+class ResponseCache:
+    """LRU cache of rendered GET responses for anonymous visitors
+    
+    Keys are built from the namespace version, endpoint, view args and the
+    sorted query string, so bumping the namespace version orphans every
+    entry rendered before the change.
+    """
+    
+    def __init__(self, timeout=300, threshold=500):
+        self.enabled = True
+        self.timeout = timeout
+        self.threshold = threshold
+        self._entries = OrderedDict()  # key -> (body, status, headers, expires_at)
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'evictions': 0}
+    
+    def init_app(self, app):
+        """Use CACHE_TYPE, CACHE_DEFAULT_TIMEOUT and CACHE_THRESHOLD from the Flask config"""
+        self.enabled = app.config.get('CACHE_TYPE', 'simple') != 'null'
+        self.timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', self.timeout)
+        self.threshold = app.config.get('CACHE_THRESHOLD', self.threshold)
+    
+    def cached(self, namespace='catalog', timeout=None):
+        """View decorator caching anonymous GET responses in the given namespace"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self._cacheable():
+                    with self._lock:
+                        self._stats['bypassed'] += 1
+                    return view(*args, **kwargs)
+                
+                key = self._make_key(namespace)
+                now = time.monotonic()
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry[3] > now:
+                        self._entries.move_to_end(key)
+                        self._stats['hits'] += 1
+                    else:
+                        entry = None
+                        self._stats['misses'] += 1
+                if entry is not None:
+                    response = current_app.response_class(entry[0], status=entry[1], headers=entry[2])
+                    response.headers['X-Cache'] = 'HIT'
+                    return response
+                
+                response = make_response(view(*args, **kwargs))
+                if response.status_code == 200 and not response.direct_passthrough:
+                    self._store(key, response, now + (timeout or self.timeout))
+                response.headers['X-Cache'] = 'MISS'
+                return response
+            return wrapper
+        return decorator
+    
+    def _cacheable(self):
+        if not self.enabled or request.method != 'GET':
+            return False
+        if current_user.is_authenticated:
+            return False
+        # Pages carrying one-off flash messages must not be shared
+        return '_flashes' not in session
+    
+    @staticmethod
+    def _make_key(namespace):
+        # Blank args stay in the key: views may treat them as meaningful (an empty cursor selects keyset mode)
+        args = tuple(sorted((name, tuple(request.args.getlist(name))) for name in request.args.keys()))
+        view_args = tuple(sorted((request.view_args or {}).items()))
+        return (namespace, get_version(namespace), request.endpoint, view_args, args)
+    
+    def _store(self, key, response, expires_at):
+        headers = [(k, v) for k, v in response.headers.items() if k.lower() != 'set-cookie']
+        with self._lock:
+            self._entries[key] = (response.get_data(), response.status_code, headers, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.threshold:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+    
+    def purge(self, namespace=None):
+        """Drop this worker's entries for a namespace (or all)"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == namespace]:
+                    del self._entries[key]
+    
+    def get_stats(self):
+        """Return hit/miss counters and the hit ratio"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
+
+response_cache = ResponseCache()
@@ -0,0 +1,320 @@
+"""
+In-memory catalog snapshot for marketplace listings
+
+The available part of the ASICMiner catalog (with each miner's latest
+profitability) is loaded once per worker into NumPy columns plus a list of
+lightweight row objects the listing templates render. Every sort mode has a
+precomputed permutation, so a listing request is a boolean filter mask, a
+binary search for the cursor position and a slice: no SQL and no ORM
+hydration. The snapshot is rebuilt when the 'catalog' cache version moves
+(every path that changes listings already bumps it); while one thread
+rebuilds, others keep serving the previous snapshot.
+
+Sort keys and cursors match _miner_sort() and keyset_paginate(), so cursors
+from either path are interchangeable. Free-text search keeps using the SQL
+path (see app/search.py).
+
+Facet counts (algorithm, manufacturer, release year, price range) come from
+the same snapshot: each facet column is stored as integer codes, and the
+count for every value is one bincount over the rows matching all other
+applied filters. Results are cached per filter combination for the life of
+the snapshot, so a browse page renders its facets without touching the
+database.
+"""
+import time
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime
+import numpy as np
+from app.models import db, ASICMiner, LatestProfitability
+from app.cache import get_version
+from app.pagination import KeysetPagination, encode_cursor, decode_cursor, clamp_per_page
+
+logger = logging.getLogger(__name__)
+
+# sort mode -> (key column, descending); ties are broken by id in the same direction
+SORT_MODES = {
+    'newest': ('created_at', True),
+    'price_low': ('price_usd', False),
+    'price_high': ('price_usd', True),
+    'profitability': ('profitability_score', True)
+}
+
+FACETS = ['algorithm', 'manufacturer', 'release_year', 'price_range']
+# price range key -> (label, low inclusive, high exclusive)
+PRICE_RANGES = {
+    'under-2000': ('Under $2,000', 0.0, 2000.0),
+    '2000-5000': ('$2,000 - $5,000', 2000.0, 5000.0),
+    '5000-10000': ('$5,000 - $10,000', 5000.0, 10000.0),
+    '10000-plus': ('$10,000+', 10000.0, float('inf'))
+}
+FACET_CACHE_SIZE = 256  # Filter combinations whose facet counts are kept per snapshot
+
+ListingProfitability = namedtuple('ListingProfitability', ['daily_profit_usd', 'roi_days'])
+
+class CatalogRow:
+    """Listing fields of one miner, shaped like ASICMiner for the templates"""
+
+    __slots__ = ('id', 'name', 'manufacturer', 'model', 'algorithm', 'hash_rate', 'power_consumption',
+                 'price_usd', 'profitability_score', 'release_year', 'image_url', 'created_at',
+                 'latest_profitability')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    def get_latest_profitability(self):
+        return self.latest_profitability
+
+class CatalogSnapshot:
+    """Immutable columnar copy of the available catalog at one cache version"""
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.built_at = datetime.utcnow()
+        self.rows = rows
+        n = len(rows)
+        self.id = np.fromiter((r.id for r in rows), dtype=np.int64, count=n)
+        self.price_usd = np.fromiter((r.price_usd for r in rows), dtype=np.float64, count=n)
+        # NULL score or creation time (not written by the app) sort as the column default / epoch
+        self.profitability_score = np.fromiter((r.profitability_score or 0.0 for r in rows), dtype=np.float64, count=n)
+        self.created_at = np.array([r.created_at or datetime(1970, 1, 1) for r in rows], dtype='datetime64[us]')
+        self.release_year = np.fromiter((r.release_year or 0 for r in rows), dtype=np.int64, count=n)
+        self.algorithm = np.array([r.algorithm for r in rows], dtype=object)
+        self.manufacturer = np.array([r.manufacturer for r in rows], dtype=object)
+
+        # Facet columns as integer codes into their sorted distinct values
+        self._facet_values = {}
+        self._facet_codes = {}
+        for facet in ('algorithm', 'manufacturer', 'release_year'):
+            values, codes = np.unique(getattr(self, facet), return_inverse=True)
+            self._facet_values[facet] = values.tolist()
+            self._facet_codes[facet] = codes.ravel()
+        edges = [low for _, low, _ in PRICE_RANGES.values()][1:]
+        self._facet_values['price_range'] = list(PRICE_RANGES)
+        self._facet_codes['price_range'] = np.searchsorted(edges, self.price_usd, 'right')
+        self._facet_cache = {}
+        self._facet_lock = threading.Lock()
+
+        # Ascending (key, id) permutation per key column; descending modes walk it backwards
+        self._ascending = {}
+        for column in {column for column, _ in SORT_MODES.values()}:
+            order = np.lexsort((self.id, getattr(self, column)))
+            self._ascending[column] = (order, getattr(self, column)[order], self.id[order])
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _filter_masks(self, algorithm=None, manufacturer=None, min_price=None, max_price=None,
+                      release_year=None, price_range=None):
+        """{facet: boolean mask} for each applied filter; min/max price belong to the price_range facet"""
+        masks = {}
+        if algorithm:
+            masks['algorithm'] = self.algorithm == algorithm
+        if manufacturer:
+            masks['manufacturer'] = self.manufacturer == manufacturer
+        if release_year:
+            masks['release_year'] = self.release_year == release_year
+        price = None
+        if min_price:
+            price = self.price_usd >= min_price
+        if max_price:
+            price = (self.price_usd <= max_price) if price is None else price & (self.price_usd <= max_price)
+        if price_range in PRICE_RANGES:
+            _, low, high = PRICE_RANGES[price_range]
+            in_range = (self.price_usd >= low) & (self.price_usd < high)
+            price = in_range if price is None else price & in_range
+        if price is not None:
+            masks['price_range'] = price
+        return masks
+
+    def mask(self, algorithm=None, manufacturer=None, min_price=None, max_price=None, release_year=None, price_range=None):
+        """Boolean row mask for the listing filters (exact facet matches, inclusive price bounds)"""
+        mask = np.ones(len(self.rows), dtype=bool)
+        for applied in self._filter_masks(algorithm, manufacturer, min_price, max_price, release_year, price_range).values():
+            mask &= applied
+        return mask
+
+    def facets(self, filters, base=None):
+        """Count per value of every facet, each conditioned on all other applied filters
+
+        filters takes the keyword arguments of mask(). base optionally limits
+        the rows further (e.g. to search matches); only calls without it are
+        cached.
+        """
+        key = tuple(sorted((name, value) for name, value in filters.items() if value))
+        if base is None:
+            with self._facet_lock:
+                cached = self._facet_cache.get(key)
+            if cached is not None:
+                return cached
+
+        masks = self._filter_masks(**filters)
+        selected = dict(filters)
+        result = {}
+        for facet in FACETS:
+            rows = np.ones(len(self.rows), dtype=bool) if base is None else base.copy()
+            for other, applied in masks.items():
+                if other != facet:
+                    rows &= applied
+            values = self._facet_values[facet]
+            counts = np.bincount(self._facet_codes[facet][rows], minlength=len(values))
+            entries = [{
+                'value': value,
+                'label': PRICE_RANGES[value][0] if facet == 'price_range' else str(value),
+                'count': int(count),
+                'selected': selected.get(facet) == value
+            } for value, count in zip(values, counts) if not (facet == 'release_year' and value == 0)]
+            if facet == 'release_year':
+                entries.reverse()  # Newest first
+            result[facet] = entries
+
+        if base is None:
+            with self._facet_lock:
+                if len(self._facet_cache) >= FACET_CACHE_SIZE:
+                    self._facet_cache.clear()
+                self._facet_cache[key] = result
+        return result
+
+    def _order(self, sort_by):
+        """(display permutation, key column, descending) for a sort mode"""
+        column, descending = SORT_MODES.get(sort_by, SORT_MODES['newest'])
+        order = self._ascending[column][0]
+        return (order[::-1] if descending else order), column, descending
+
+    def _split(self, column, descending, key, miner_id, inclusive):
+        """Display positions before the cursor row (and the row itself if inclusive)"""
+        _, keys, ids = self._ascending[column]
+        if column == 'created_at':
+            key = np.datetime64(key, 'us')
+        low = np.searchsorted(keys, key, 'left')
+        high = np.searchsorted(keys, key, 'right')
+        # Ascending rows below (key, id), or at or below it; descending display counts from the top
+        side = 'right' if inclusive != descending else 'left'
+        below = int(low + np.searchsorted(ids[low:high], miner_id, side))
+        return len(keys) - below if descending else below
+
+    def _cursor(self, direction, column, row):
+        return encode_cursor([direction, getattr(self, column)[row].item(), int(self.id[row])])
+
+    def page(self, mask, sort_by='newest', cursor=None, per_page=None, with_total=True):
+        """One KeysetPagination of rows matching mask; raises ValueError on a malformed cursor"""
+        per_page = clamp_per_page(per_page)
+        order, column, descending = self._order(sort_by)
+        positions = np.flatnonzero(mask[order])  # Display positions of the matching rows
+
+        direction = 'next'
+        values = None
+        if cursor:
+            decoded = decode_cursor(cursor)
+            if len(decoded) != 3 or decoded[0] not in ('next', 'prev'):
+                raise ValueError('Invalid cursor')
+            direction, values = decoded[0], decoded[1:]
+            key_type = datetime if column == 'created_at' else (int, float)
+            if not isinstance(values[0], key_type) or not isinstance(values[1], int):
+                raise ValueError('Invalid cursor')
+
+        if direction == 'next':
+            start = 0
+            if values is not None:
+                start = int(np.searchsorted(positions, self._split(column, descending, *values, True)))
+            selected = positions[start:start + per_page]
+            has_next, has_prev = start + per_page < len(positions), values is not None
+        else:
+            end = int(np.searchsorted(positions, self._split(column, descending, *values, False)))
+            selected = positions[max(end - per_page, 0):end]
+            has_next, has_prev = True, end > per_page
+
+        rows = order[selected]
+        next_cursor = prev_cursor = None
+        if len(rows) and has_next:
+            next_cursor = self._cursor('next', column, rows[-1])
+        if len(rows) and has_prev:
+            prev_cursor = self._cursor('prev', column, rows[0])
+        return KeysetPagination(
+            [self.rows[i] for i in rows], per_page, next_cursor, prev_cursor,
+            len(positions) if with_total else None
+        )
+
+    def offset_page(self, mask, sort_by='newest', page=1, per_page=None):
+        """(items, total) for a numbered page, as the legacy OFFSET listing returns"""
+        per_page = clamp_per_page(per_page)
+        order = self._order(sort_by)[0]
+        matching = order[mask[order]]
+        start = (page - 1) * per_page
+        return [self.rows[i] for i in matching[start:start + per_page]], len(matching)
+
+class CatalogIndex:
+    """Per-worker holder of the current CatalogSnapshot"""
+
+    def __init__(self):
+        self.enabled = True
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._stats = {'builds': 0, 'build_seconds': 0.0, 'hits': 0}
+
+    def init_app(self, app):
+        """Read CATALOG_SNAPSHOT_ENABLED"""
+        self.enabled = app.config.get('CATALOG_SNAPSHOT_ENABLED', True)
+
+    @staticmethod
+    def build(version=0):
+        """Load the available catalog and latest profitability into a new snapshot"""
+        rows = db.session.query(
+            ASICMiner.id, ASICMiner.name, ASICMiner.manufacturer, ASICMiner.model, ASICMiner.algorithm,
+            ASICMiner.hash_rate, ASICMiner.power_consumption, ASICMiner.price_usd,
+            ASICMiner.profitability_score, ASICMiner.release_year, ASICMiner.image_url, ASICMiner.created_at,
+            LatestProfitability.daily_profit_usd, LatestProfitability.roi_days,
+            LatestProfitability.miner_id.isnot(None)
+        ).outerjoin(LatestProfitability, LatestProfitability.miner_id == ASICMiner.id).filter(
+            ASICMiner.is_available == True
+        ).all()
+        return CatalogSnapshot(version, [
+            CatalogRow(
+                id=r[0], name=r[1], manufacturer=r[2], model=r[3], algorithm=r[4], hash_rate=r[5],
+                power_consumption=r[6], price_usd=r[7], profitability_score=r[8], release_year=r[9],
+                image_url=r[10], created_at=r[11],
+                latest_profitability=ListingProfitability(r[12], r[13]) if r[14] else None
+            ) for r in rows
+        ])
+
+    def snapshot(self):
+        """Snapshot for the current 'catalog' version, rebuilding it if the version moved"""
+        version = get_version('catalog')
+        current = self._snapshot
+        if current is not None and current.version == version:
+            self._stats['hits'] += 1
+            return current
+        # Single rebuild per version; other threads serve the previous snapshot meanwhile
+        if current is not None and not self._lock.acquire(blocking=False):
+            self._stats['hits'] += 1
+            return current
+        if current is None:
+            self._lock.acquire()
+        try:
+            current = self._snapshot
+            if current is None or current.version != version:
+                started = time.perf_counter()
+                current = self._snapshot = self.build(version)
+                self._stats['builds'] += 1
+                self._stats['build_seconds'] += time.perf_counter() - started
+                logger.info(f"Built catalog snapshot v{version}: {len(current)} miners")
+            return current
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        """Drop this worker's snapshot"""
+        self._snapshot = None
+
+    def get_stats(self):
+        """Build counters and the size and version of the current snapshot"""
+        stats = dict(self._stats)
+        current = self._snapshot
+        stats['version'] = current.version if current is not None else None
+        stats['miners'] = len(current) if current is not None else 0
+        stats['built_at'] = current.built_at.isoformat() if current is not None else None
+        return stats
+
+catalog_index = CatalogIndex()
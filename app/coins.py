@@ -0,0 +1,230 @@
+"""
+Per-algorithm coin models for mining revenue
+
+Each CoinModel describes how a coin pays for hash power: the expected number
+of hashes per block is difficulty * hashes_per_difficulty, so one TH/s earns
+1e12 * 86400 / (difficulty * hashes_per_difficulty) blocks' worth of
+block_reward per day. Network difficulty, block reward and price are read
+from the Cryptocurrency table (model defaults fill gaps until the first
+refresh) and folded into one USD-per-TH/s-per-day coefficient per algorithm.
+Miner profitability is then hash_rate * coefficient minus power costs.
+
+Coefficients are cached per process and rebuilt when the 'coins' cache
+version changes, which update_crypto_data() and refresh_network() bump after
+writing new prices or network parameters.
+"""
+import re
+import logging
+import threading
+from datetime import date
+import requests
+from flask import has_app_context
+from app.models import db, Cryptocurrency
+from app.cache import get_version, bump_version
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+HASHES_PER_TH = 1e12
+
+class CoinModel:
+    """Network parameters of one minable coin and where to refresh them"""
+
+    def __init__(self, symbol, coin_id, algorithm, hashes_per_difficulty, difficulty, block_reward, price,
+                 difficulty_url=None, difficulty_field=None, next_halving=None, halving_interval_days=None):
+        self.symbol = symbol
+        self.coin_id = coin_id  # CoinGecko id, also Cryptocurrency.name
+        self.algorithm = algorithm
+        self.hashes_per_difficulty = hashes_per_difficulty
+        self.difficulty = difficulty  # Defaults used until the table has values
+        self.block_reward = block_reward
+        self.price = price
+        self.difficulty_url = difficulty_url
+        self.difficulty_field = difficulty_field
+        self.next_halving = next_halving  # date the block reward next halves, if it does
+        self.halving_interval_days = halving_interval_days
+
+    def coins_per_th(self, difficulty, block_reward):
+        """Coins earned per day by 1 TH/s at the given network parameters"""
+        if not difficulty or block_reward is None:
+            return 0.0
+        return HASHES_PER_TH * SECONDS_PER_DAY / (difficulty * self.hashes_per_difficulty) * block_reward
+
+    def fetch_difficulty(self, session=requests, timeout=10):
+        """Current network difficulty from difficulty_url, or None when the coin has no source"""
+        if not self.difficulty_url:
+            return None
+        response = session.get(self.difficulty_url, timeout=timeout)
+        response.raise_for_status()
+        return float(response.json()[self.difficulty_field])
+
+class Coefficient:
+    """Precomputed revenue of 1 TH/s per day for one algorithm"""
+
+    def __init__(self, algorithm, revenue_per_th, output_per_th, symbol, price):
+        self.algorithm = algorithm
+        self.revenue_per_th = revenue_per_th  # USD/day, summed over merge-mined coins
+        self.output_per_th = output_per_th  # Primary coin units/day
+        self.symbol = symbol
+        self.price = price
+
+UNKNOWN = Coefficient(None, 0.0, 0.0, None, 0.0)
+
+class CoinRegistry:
+    """Coin models by algorithm with cached revenue coefficients"""
+
+    def __init__(self):
+        self.models = {}  # algorithm -> [CoinModel], primary coin first
+        self.aliases = {}  # normalized name -> algorithm
+        self._resolved = {}
+        self._coefficients = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(name):
+        return re.sub(r'[^a-z0-9]', '', (name or '').lower())
+
+    def register(self, model, aliases=()):
+        """Add a coin for model.algorithm; later coins for the same algorithm are merge-mined extras"""
+        self.models.setdefault(model.algorithm, []).append(model)
+        for alias in (model.algorithm,) + tuple(aliases):
+            self.aliases[self._normalize(alias)] = model.algorithm
+        with self._lock:
+            self._resolved.clear()
+            self._coefficients = None
+
+    def resolve(self, algorithm):
+        """Registered algorithm for a free-form miner algorithm string, or None"""
+        resolved = self._resolved.get(algorithm)
+        if resolved is not None or algorithm in self._resolved:
+            return resolved
+        key = self._normalize(algorithm)
+        resolved = self.aliases.get(key)
+        if resolved is None:
+            # Longest alias first so 'sha256d' is not claimed by a shorter alias
+            for alias in sorted(self.aliases, key=len, reverse=True):
+                if alias and alias in key:
+                    resolved = self.aliases[alias]
+                    break
+        self._resolved[algorithm] = resolved
+        return resolved
+
+    def coins(self):
+        """Every registered coin model"""
+        return [model for models in self.models.values() for model in models]
+
+    def _network(self):
+        """{symbol: (difficulty, block_reward, price)} from the table, falling back to model defaults"""
+        rows = {}
+        if has_app_context():
+            rows = {
+                row.symbol: row for row in db.session.query(
+                    Cryptocurrency.symbol, Cryptocurrency.network_difficulty, Cryptocurrency.block_reward,
+                    Cryptocurrency.current_price
+                ).filter(Cryptocurrency.symbol.in_([model.symbol for model in self.coins()]))
+            }
+        network = {}
+        for model in self.coins():
+            row = rows.get(model.symbol)
+            network[model.symbol] = (
+                (row.network_difficulty if row is not None else None) or model.difficulty,
+                row.block_reward if row is not None and row.block_reward is not None else model.block_reward,
+                (row.current_price if row is not None else None) or model.price
+            )
+        return network
+
+    def _build(self, network, prices=None):
+        coefficients = {}
+        for algorithm, models in self.models.items():
+            revenue = 0.0
+            output = None
+            for model in models:
+                difficulty, block_reward, price = network[model.symbol]
+                if prices is not None and model.coin_id in prices:
+                    price = prices[model.coin_id].get('usd', price)
+                coins = model.coins_per_th(difficulty, block_reward)
+                revenue += coins * price
+                if output is None:
+                    output = coins
+                    primary_price = price
+            coefficients[algorithm] = Coefficient(algorithm, revenue, output, models[0].symbol, primary_price)
+        return coefficients
+
+    def coefficients(self, prices=None):
+        """{algorithm: Coefficient}; prices ({coin_id: {'usd': x}}) overrides table prices for one calculation"""
+        if prices is not None:
+            return self._build(self._network(), prices)
+        version = get_version('coins') if has_app_context() else None
+        with self._lock:
+            if self._coefficients is not None and self._version == version:
+                return self._coefficients
+        coefficients = self._build(self._network())
+        with self._lock:
+            self._coefficients, self._version = coefficients, version
+        return coefficients
+
+    def coefficient(self, algorithm, prices=None, coefficients=None):
+        """Coefficient for a miner algorithm string (zero revenue when no coin model matches)"""
+        if coefficients is None:
+            coefficients = self.coefficients(prices)
+        return coefficients.get(self.resolve(algorithm), UNKNOWN)
+
+    def refresh_network(self, session=requests, commit=True):
+        """Fetch difficulty for coins with a source and store it; returns the symbols updated"""
+        fetched = {}
+        for model in self.coins():
+            try:
+                difficulty = model.fetch_difficulty(session)
+            except Exception as e:
+                logger.warning(f"Could not fetch {model.symbol} difficulty: {e}")
+                continue
+            if difficulty:
+                fetched[model.symbol] = difficulty
+        # Write only after all network I/O so no transaction stays open across requests
+        for symbol, difficulty in fetched.items():
+            self.set_network(symbol, difficulty=difficulty, commit=False)
+        if fetched and commit:
+            db.session.commit()
+            bump_version('coins')
+        return list(fetched)
+
+    def set_network(self, symbol, difficulty=None, block_reward=None, commit=True):
+        """Store network parameters for a registered coin, creating its Cryptocurrency row if needed"""
+        model = next((model for model in self.coins() if model.symbol == symbol), None)
+        if model is None:
+            raise ValueError(f"No coin model registered for {symbol}")
+        crypto = Cryptocurrency.query.filter_by(symbol=symbol).first()
+        if crypto is None:
+            crypto = Cryptocurrency(name=model.coin_id, symbol=symbol, algorithm=model.algorithm, current_price=0.0)
+            db.session.add(crypto)
+        if difficulty is not None:
+            crypto.network_difficulty = difficulty
+        if block_reward is not None:
+            crypto.block_reward = block_reward
+        elif crypto.block_reward is None:
+            crypto.block_reward = model.block_reward
+        if commit:
+            db.session.commit()
+            bump_version('coins')
+        return crypto
+
+coin_registry = CoinRegistry()
+
+# Defaults are approximate network values; the Cryptocurrency table takes precedence once populated
+coin_registry.register(
+    CoinModel('BTC', 'bitcoin', 'SHA-256', 2 ** 32, 1.2e14, 3.125, 50000,
+              'https://mempool.space/api/v1/mining/hashrate/3d', 'currentDifficulty',
+              next_halving=date(2028, 4, 15), halving_interval_days=1460),
+    aliases=('SHA256', 'SHA-256d', 'Bitcoin')
+)
+coin_registry.register(
+    CoinModel('LTC', 'litecoin', 'Scrypt', 2 ** 32, 4.0e7, 6.25, 200,
+              'https://litecoinspace.org/api/v1/mining/hashrate/3d', 'currentDifficulty',
+              next_halving=date(2027, 7, 20), halving_interval_days=1460),
+    aliases=('Litecoin',)
+)
+coin_registry.register(CoinModel('DOGE', 'dogecoin', 'Scrypt', 2 ** 32, 3.0e7, 10000, 0.15))  # Merge-mined with LTC
+coin_registry.register(CoinModel('ETC', 'ethereum-classic', 'Etchash', 1, 2.3e15, 2.56, 20), aliases=('Ethash', 'Ethereum'))
+coin_registry.register(CoinModel('XMR', 'monero', 'RandomX', 1, 5.0e11, 0.6, 150), aliases=('Monero',))
+coin_registry.register(CoinModel('KAS', 'kaspa', 'kHeavyHash', 2, 5.0e16, 4.0, 0.1), aliases=('Kaspa',))
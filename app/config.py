@@ -19,19 +19,108 @@ class Config:
     SESSION_COOKIE_SAMESITE = 'Lax'
     
     # Cache configuration (disabled for Vercel)
-    CACHE_TYPE = 'simple'
+    CACHE_TYPE = 'simple'  # 'null' disables the anonymous response cache
     CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_THRESHOLD = 500  # Max cached responses per worker
+    CACHE_VERSION_CHECK_INTERVAL = 2  # Seconds between cross-worker invalidation checks
+    
+    # Crypto price cache (seconds)
+    PRICE_CACHE_TTL = int(os.environ.get('PRICE_CACHE_TTL', 60))
+    PRICE_CACHE_STALE_TTL = int(os.environ.get('PRICE_CACHE_STALE_TTL', 600))
+    PRICE_CACHE_REFRESH_AHEAD = 0.8  # Fraction of TTL after which a hit triggers a refresh
+    PRICE_CACHE_ERROR_BACKOFF = 30
     
     # Celery configuration (disabled for Vercel)
     CELERY_BROKER_URL = os.environ.get('REDIS_URL', '')
     CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', '')
     
+    # Database task queue (see app/tasks.py)
+    TASK_BATCH_SIZE = 50  # Tasks claimed per worker round trip
+    TASK_POLL_INTERVAL = 1.0  # Seconds an idle worker waits before polling again
+    TASK_LEASE = 300  # Seconds before a claimed task from a silent worker is retried
+    TASK_MAX_ATTEMPTS = 5
+    TASK_RETRY_BASE = 5  # Backoff before retry n is up to TASK_RETRY_BASE * 2**(n-1) seconds
+    TASK_RETRY_MAX = 3600
+    TASK_RETENTION_DAYS = 7  # Done and dead tasks kept for inspection
+    TASK_EXTERNAL_WORKER = os.environ.get('TASK_EXTERNAL_WORKER', 'false').lower() in ('1', 'true', 'yes')  # A `python -m app.tasks worker` process is deployed
+    TASK_INPROCESS_INTERVAL = int(os.environ.get('TASK_INPROCESS_INTERVAL', 0 if TASK_EXTERNAL_WORKER else 10))  # Drain the queue from the scheduler; safe alongside a worker
+    
+    # Profitability history retention
+    PROFITABILITY_INSERT_BATCH_SIZE = 1000
+    PROFITABILITY_RAW_RETENTION_DAYS = int(os.environ.get('PROFITABILITY_RAW_RETENTION_DAYS', 7))
+    PROFITABILITY_HOURLY_RETENTION_DAYS = int(os.environ.get('PROFITABILITY_HOURLY_RETENTION_DAYS', 90))
+    
     # Pagination
     ITEMS_PER_PAGE = 12
+    MAX_ITEMS_PER_PAGE = 100  # Hard ceiling for per_page on every listing
+    PAGINATION_COUNT_CACHE_TTL = 60  # Seconds a listing total is reused before recounting
+    EXPORT_BATCH_SIZE = 1000  # Rows fetched and written per chunk by the streaming exports
+    IMPORT_BATCH_SIZE = 2000  # Rows upserted per transaction by the bulk catalog import
+    IMPORT_MAX_ERRORS = 1000  # Row errors kept in an import report (all invalid rows are still counted)
+    CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', 'true').lower() in ('1', 'true', 'yes')  # In-memory listings (see app/catalog.py); facets always use the snapshot
+    
+    # Stock reservations (add-to-cart holds)
+    RESERVATION_TTL = int(os.environ.get('RESERVATION_TTL', 900))  # Seconds a hold is guaranteed
+    RESERVATION_SHARDS = 8  # Stock rows per miner that holds are spread across
+    RESERVATION_MAX_QUANTITY = 100  # Largest single hold
+    RESERVATION_SWEEP_INTERVAL = int(os.environ.get('RESERVATION_SWEEP_INTERVAL', 30))  # Expiry job interval; 0 disables
+    RESERVATION_SWEEP_BATCH = 500
+    
+    # Background jobs (see app/scheduler.py); intervals in seconds, 0 disables a job
+    SCHEDULER_ENABLED = os.environ.get('SCHEDULER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SCHEDULER_TICK = 15  # Seconds between checks for due jobs
+    SCHEDULER_HISTORY_DAYS = 30  # Job run history kept
+    CRYPTO_PRICE_UPDATE_INTERVAL = int(os.environ.get('CRYPTO_PRICE_UPDATE_INTERVAL', 600))
+    PROFITABILITY_UPDATE_INTERVAL = int(os.environ.get('PROFITABILITY_UPDATE_INTERVAL', 3600))
+    PROFITABILITY_COMPACT_INTERVAL = int(os.environ.get('PROFITABILITY_COMPACT_INTERVAL', 86400))
+    TASK_PRUNE_INTERVAL = 86400
+    MININGNOW_SCRAPE_INTERVAL = int(os.environ.get('MININGNOW_SCRAPE_INTERVAL', 0))
+    ROI_SIMULATION_INTERVAL = int(os.environ.get('ROI_SIMULATION_INTERVAL', 0))  # Catalog-wide simulation refresh
+    COIN_PRICE_PRUNE_INTERVAL = 86400
+    SIMULATION_PRUNE_INTERVAL = 3600  # Drop expired cached ROI simulations
+    
+    # Order/tracking number generation (see app/ids.py)
+    ID_NODE_ID = os.environ.get('ID_NODE_ID')  # 0-63, distinct per node; hostname hash when unset
+    ID_LOCK_DIR = os.environ.get('ID_LOCK_DIR')  # Per-node process slot locks; system temp dir when unset
+    
+    # miningnow.com catalog ingestion (see app/scraper.py)
+    MININGNOW_BASE_URL = os.environ.get('MININGNOW_BASE_URL', 'https://miningnow.com')
+    SCRAPER_LISTING_PATH = '/asic-miners/'
+    SCRAPER_DETAIL_PREFIX = '/asic-miner/'  # Links on listing pages that lead to miner pages
+    SCRAPER_CONCURRENCY = int(os.environ.get('SCRAPER_CONCURRENCY', 8))  # Parallel requests and pooled connections
+    SCRAPER_TIMEOUT = 10
+    SCRAPER_MAX_PAGES = 50  # Listing pages followed per run
+    SCRAPER_MAX_PAGE_BYTES = 2 * 1024 * 1024
+    SCRAPER_BATCH_SIZE = 100  # Miners upserted per transaction
+    SCRAPER_USER_AGENT = os.environ.get('SCRAPER_USER_AGENT', 'CryptoMinerPro catalog sync')
     
     # Mining data
     DEFAULT_ELECTRICITY_COST = 0.12  # $/kWh
     DEFAULT_POOL_FEE = 0.01  # 1%
+    PROFITABILITY_GRID_MAX_STEPS = 101  # Values per sensitivity grid axis
+    PROFITABILITY_GRID_MAX_CELLS = 50000
+    FLEET_MAX_LINES = 200  # Lines accepted by the fleet profitability endpoint
+    
+    # Coin price history (see app/prices.py)
+    COIN_PRICE_RAW_RETENTION_DAYS = int(os.environ.get('COIN_PRICE_RAW_RETENTION_DAYS', 90))  # 5-minute, hourly and daily candles are kept
+    COIN_PRICE_MAX_POINTS = 5000  # Largest point budget for a chart range
+    COIN_PRICE_OVERSAMPLE = 2  # Samples per returned point LTTB chooses from at least
+    
+    # Live price/profitability stream (see app/stream.py)
+    STREAM_POLL_INTERVAL = 2  # Seconds between checks for new prices per process
+    STREAM_HEARTBEAT = 15  # Seconds of silence before a keep-alive comment
+    STREAM_MAX_DURATION = 3600  # Connections are closed after this and EventSource reconnects
+    STREAM_MAX_CONNECTIONS = int(os.environ.get('STREAM_MAX_CONNECTIONS', 48))  # Per process; keep below server threads
+    
+    # Monte Carlo ROI simulation (see app/simulation.py)
+    SIMULATION_PATHS = 10000  # Default price/difficulty paths per miner
+    SIMULATION_MAX_PATHS = 100000  # Largest path count accepted from signed-in API callers
+    SIMULATION_HORIZON_DAYS = 1095
+    SIMULATION_MAX_HORIZON_DAYS = 1825
+    SIMULATION_ANONYMOUS_MAX_PATHS = 10000  # Anonymous callers are held to the defaults
+    SIMULATION_ANONYMOUS_MAX_HORIZON_DAYS = 1095
+    SIMULATION_PROCESSES = int(os.environ.get('SIMULATION_PROCESSES', 1))  # Worker processes for catalog-wide runs
+    SIMULATION_CACHE_TTL = int(os.environ.get('SIMULATION_CACHE_TTL', 21600))  # Seconds a cached distribution is served
 
 class DevelopmentConfig(Config):
     """Development configuration"""
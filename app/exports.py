@@ -0,0 +1,176 @@
+"""
+Streaming bulk exports (NDJSON or CSV, optionally gzipped)
+
+Each export is a Core SELECT of plain columns executed with yield_per, which
+streams from a server-side cursor on PostgreSQL (fetchmany on SQLite) and
+never builds ORM objects, so memory stays at one batch of rows however large
+the export is. Batches are formatted and, when requested, compressed on the
+fly into chunks of a generator response; nothing is buffered whole.
+
+Exports are not response-cached: ResponseCache would read the whole body.
+"""
+import io
+import csv
+import json
+import math
+import zlib
+import logging
+from datetime import datetime
+from flask import Response, current_app, stream_with_context
+from app.models import db, ASICMiner, ProfitabilityData, ProfitabilityRollup, Order, OrderItem
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv')
+}
+
+MINER_COLUMNS = [
+    ASICMiner.id, ASICMiner.name, ASICMiner.manufacturer, ASICMiner.model, ASICMiner.algorithm,
+    ASICMiner.hash_rate, ASICMiner.power_consumption, ASICMiner.efficiency_rating, ASICMiner.price_usd,
+    ASICMiner.stock_quantity, ASICMiner.release_year, ASICMiner.profitability_score, ASICMiner.is_available,
+    ASICMiner.created_at, ASICMiner.updated_at
+]
+
+PROFITABILITY_COLUMNS = [
+    ProfitabilityData.id, ProfitabilityData.miner_id, ProfitabilityData.timestamp,
+    ProfitabilityData.daily_profit_usd, ProfitabilityData.monthly_profit_usd, ProfitabilityData.yearly_profit_usd,
+    ProfitabilityData.net_profit_daily, ProfitabilityData.electricity_cost, ProfitabilityData.roi_days,
+    ProfitabilityData.data_source
+]
+
+ROLLUP_COLUMNS = [
+    ProfitabilityRollup.miner_id, ProfitabilityRollup.resolution, ProfitabilityRollup.bucket_start,
+    ProfitabilityRollup.sample_count, ProfitabilityRollup.daily_profit_min, ProfitabilityRollup.daily_profit_avg,
+    ProfitabilityRollup.daily_profit_max, ProfitabilityRollup.roi_days_min, ProfitabilityRollup.roi_days_avg,
+    ProfitabilityRollup.roi_days_max, ProfitabilityRollup.electricity_cost_avg
+]
+
+ORDER_LINE_COLUMNS = [
+    Order.id.label('order_id'), Order.order_number, Order.user_id, Order.status, Order.payment_status,
+    Order.payment_method, Order.total_amount, Order.created_at, OrderItem.id.label('item_id'),
+    OrderItem.miner_id, OrderItem.quantity, OrderItem.unit_price, OrderItem.total_price
+]
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+def _json_line(encode, columns, row):
+    """One NDJSON line; non-finite floats (e.g. ROI of an unprofitable miner) become null"""
+    try:
+        return encode(dict(zip(columns, row))) + '\n'
+    except ValueError:
+        return encode({
+            column: None if isinstance(value, float) and not math.isfinite(value) else value
+            for column, value in zip(columns, row)
+        }) + '\n'
+
+class Exporter:
+    """SELECTs for each export and the streaming response that writes them"""
+
+    @staticmethod
+    def miners(algorithm=None, manufacturer=None, available_only=False):
+        """Catalog rows, by id"""
+        query = db.select(*MINER_COLUMNS)
+        if algorithm:
+            query = query.where(ASICMiner.algorithm == algorithm)
+        if manufacturer:
+            query = query.where(ASICMiner.manufacturer == manufacturer)
+        if available_only:
+            query = query.where(ASICMiner.is_available == True)
+        return query.order_by(ASICMiner.id)
+
+    @staticmethod
+    def profitability(resolution='raw', miner_id=None, start=None, end=None):
+        """Raw profitability history, or its hourly/daily rollups, by time; raises ValueError"""
+        if resolution == 'raw':
+            table, time_column = ProfitabilityData, ProfitabilityData.timestamp
+            # Ids follow insertion (time) order and stream straight off the primary key
+            query, order = db.select(*PROFITABILITY_COLUMNS), [ProfitabilityData.id]
+        elif resolution in ('hour', 'day'):
+            table, time_column = ProfitabilityRollup, ProfitabilityRollup.bucket_start
+            query = db.select(*ROLLUP_COLUMNS).where(ProfitabilityRollup.resolution == resolution)
+            order = [ProfitabilityRollup.bucket_start, ProfitabilityRollup.miner_id]
+        else:
+            raise ValueError('resolution must be raw, hour or day')
+        if miner_id:
+            query = query.where(table.miner_id == miner_id)
+        if start:
+            query = query.where(time_column >= start)
+        if end:
+            query = query.where(time_column < end)
+        return query.order_by(*order)
+
+    @staticmethod
+    def order_lines(status=None, start=None, end=None):
+        """One row per order item with its order's fields, by order then item"""
+        query = db.select(*ORDER_LINE_COLUMNS).join(OrderItem, OrderItem.order_id == Order.id)
+        if status:
+            query = query.where(Order.status == status)
+        if start:
+            query = query.where(Order.created_at >= start)
+        if end:
+            query = query.where(Order.created_at < end)
+        return query.order_by(Order.id, OrderItem.id)
+
+    @staticmethod
+    def _chunks(query, fmt, batch_size):
+        """Formatted text per batch of rows; the CSV header comes first"""
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        columns = list(result.keys())
+        if fmt == 'csv':
+            buffer = io.StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            writer.writerow(columns)
+            for batch in result.partitions():
+                writer.writerows(
+                    [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in batch
+                )
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            encode = json.JSONEncoder(default=_json_default, separators=(',', ':'), allow_nan=False).encode
+            for batch in result.partitions():
+                yield ''.join(_json_line(encode, columns, row) for row in batch)
+
+    @staticmethod
+    def stream(query, fmt='ndjson', compress=False, batch_size=None):
+        """Bytes of the export, gzip-compressed on the fly when compress is set"""
+        if batch_size is None:
+            batch_size = current_app.config.get('EXPORT_BATCH_SIZE', 1000)
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31: gzip container
+        try:
+            for text in Exporter._chunks(query, fmt, batch_size):
+                data = text.encode()
+                if compressor is not None:
+                    data = compressor.compress(data)
+                if data:
+                    yield data
+            if compressor is not None:
+                yield compressor.flush()
+        except Exception as e:
+            # Headers are already sent; log and end the stream early (the client sees a truncated file)
+            logger.error(f"Error streaming export: {e}")
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def response(name, query, fmt='ndjson', compress=False):
+        """Streaming download response for an export; raises ValueError on an unknown format"""
+        if fmt not in FORMATS:
+            raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+        mimetype, extension = FORMATS[fmt]
+        filename = f"{name}-{datetime.utcnow():%Y%m%d-%H%M%S}.{extension}"
+        if compress:
+            mimetype, filename = 'application/gzip', filename + '.gz'
+        response = Response(stream_with_context(Exporter.stream(query, fmt, compress)), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.headers['Cache-Control'] = 'no-store'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
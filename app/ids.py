@@ -0,0 +1,164 @@
+"""
+Time-ordered, collision-free identifiers for order and tracking numbers
+
+Snowflake-style layout in 70 bits, rendered as 14 Crockford base32 characters
+so string order matches time order:
+
+    42 bits  milliseconds since 2024-01-01 UTC (about 139 years)
+     6 bits  node id: ID_NODE_ID, or a hash of the hostname when unset
+    10 bits  process slot on the node
+    12 bits  per-millisecond sequence (4096 ids/ms per process)
+
+A process claims its slot by taking a non-blocking flock on one of 1024 lock
+files under ID_LOCK_DIR; the lock is held for the life of the process and
+released by the kernel when it exits, so live gunicorn workers on a node never
+share a slot and no database round trip is needed. Where flock is unavailable
+the slot falls back to the low bits of the pid. Set ID_NODE_ID to a distinct
+value per node (0-63) to rule out hostname hash collisions between nodes.
+"""
+import os
+import time
+import socket
+import logging
+import tempfile
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'  # Crockford base32, no I/L/O/U
+
+class SnowflakeGenerator:
+    """Thread-safe, fork-aware generator of 70-bit time-ordered ids"""
+
+    EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+    NODE_BITS = 6
+    SLOT_BITS = 10
+    SEQUENCE_BITS = 12
+    CODE_LENGTH = 14
+
+    def __init__(self, node_id=None, lock_dir=None):
+        self.node_id = node_id
+        self.lock_dir = lock_dir
+        self._lock = threading.Lock()
+        self._worker_id = None
+        self._slot_file = None
+        self._last_ms = -1
+        self._sequence = 0
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def init_app(self, app):
+        """Read the node id and slot lock directory from config"""
+        node_id = app.config.get('ID_NODE_ID')
+        self.node_id = int(node_id) if node_id not in (None, '') else None
+        self.lock_dir = app.config.get('ID_LOCK_DIR') or None
+
+    def _after_fork(self):
+        # The child inherits the parent's slot lock; claim its own slot on next use
+        self._lock = threading.Lock()
+        if self._slot_file is not None:
+            try:
+                self._slot_file.close()
+            except OSError:
+                pass
+        self._slot_file = None
+        self._worker_id = None
+        self._last_ms = -1
+        self._sequence = 0
+
+    def _node(self):
+        if self.node_id is not None:
+            return self.node_id % (1 << self.NODE_BITS)
+        return zlib.crc32(socket.gethostname().encode()) % (1 << self.NODE_BITS)
+
+    def _claim_slot(self):
+        """Lock the first free slot file on this node; falls back to pid bits"""
+        slots = 1 << self.SLOT_BITS
+        if fcntl is not None:
+            lock_dir = self.lock_dir or os.path.join(tempfile.gettempdir(), 'asic-id-slots')
+            try:
+                os.makedirs(lock_dir, exist_ok=True)
+                start = os.getpid() % slots
+                for offset in range(slots):
+                    slot = (start + offset) % slots
+                    handle = open(os.path.join(lock_dir, f'slot-{slot}.lock'), 'a')
+                    try:
+                        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        handle.close()
+                        continue
+                    self._slot_file = handle
+                    return slot
+                logger.error(f"All {slots} id slots in {lock_dir} are taken, falling back to pid bits")
+            except OSError as e:
+                logger.error(f"Could not claim an id slot in {lock_dir}, falling back to pid bits: {e}")
+        return os.getpid() % slots
+
+    @staticmethod
+    def _now_ms():
+        return time.time_ns() // 1_000_000
+
+    def next_id(self):
+        """Next id as an integer; strictly increasing within the process"""
+        with self._lock:
+            if self._worker_id is None:
+                self._worker_id = (self._node() << self.SLOT_BITS) | self._claim_slot()
+
+            # Never step backwards if the wall clock does; borrow the next
+            # millisecond when the sequence for this one is exhausted
+            now = max(self._now_ms() - self.EPOCH_MS, self._last_ms)
+            if now == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << self.SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    now += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now
+
+            worker_bits = self.NODE_BITS + self.SLOT_BITS
+            return (now << (worker_bits + self.SEQUENCE_BITS)) | (self._worker_id << self.SEQUENCE_BITS) | self._sequence
+
+    def next_code(self):
+        """Next id as a fixed-width base32 string that sorts in creation order"""
+        return self.encode(self.next_id())
+
+    @classmethod
+    def encode(cls, value):
+        chars = []
+        for _ in range(cls.CODE_LENGTH):
+            value, digit = divmod(value, 32)
+            chars.append(ALPHABET[digit])
+        return ''.join(reversed(chars))
+
+    @classmethod
+    def decode(cls, code):
+        """Split an id (int or code) into (unix_ms, node, slot, sequence)"""
+        if isinstance(code, str):
+            value = 0
+            for char in code.upper():
+                value = value * 32 + ALPHABET.index(char)
+        else:
+            value = code
+        sequence = value & ((1 << cls.SEQUENCE_BITS) - 1)
+        value >>= cls.SEQUENCE_BITS
+        slot = value & ((1 << cls.SLOT_BITS) - 1)
+        value >>= cls.SLOT_BITS
+        node = value & ((1 << cls.NODE_BITS) - 1)
+        value >>= cls.NODE_BITS
+        return value + cls.EPOCH_MS, node, slot, sequence
+
+id_generator = SnowflakeGenerator()
+
+def new_order_number():
+    """Order number such as ORD-0MHEQFP2DAJC00"""
+    return 'ORD-' + id_generator.next_code()
+
+def new_tracking_number():
+    """Shipping tracking number such as CMP0MHEQFP2DAJC01"""
+    return 'CMP' + id_generator.next_code()
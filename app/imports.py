@@ -0,0 +1,297 @@
+"""
+Bulk catalog import from CSV, JSON or NDJSON price lists
+
+Rows are parsed and validated one at a time as the file is read (a JSON
+array is decoded element by element, never loaded whole) and written in
+batches of IMPORT_BATCH_SIZE, one transaction per batch. Each batch:
+
+    - looks up the batch's (manufacturer, model) keys in one query
+    - inserts new miners with one executemany INSERT and updates known
+      ones with one executemany UPDATE by primary key, the same matching
+      the miningnow.com sync uses (app/scraper.py)
+    - upserts their Inventory rows with one executemany statement
+    - evaluates price alerts for miners whose price changed
+
+Stock shards of miners whose stock changed are resynced after the last
+batch; miners without shards yet get them on their first hold
+(app/reservations.py). The catalog cache version is bumped once.
+Invalid rows are skipped and reported with their row number and reason;
+they never abort the import.
+"""
+import csv
+import json
+import math
+import time
+import logging
+from datetime import datetime
+from flask import current_app
+from app.models import db, dialect_insert, ASICMiner, Inventory
+from app.alerts import PriceAlertEngine
+from app.reservations import reservations
+from app.cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_FIELDS = ('manufacturer', 'model', 'hash_rate', 'power_consumption', 'algorithm', 'price_usd')
+OPTIONAL_FIELDS = ('name', 'stock_quantity', 'description', 'image_url', 'release_year', 'is_available', 'warehouse_location')
+UPDATED_FIELDS = ('name', 'hash_rate', 'power_consumption', 'algorithm', 'price_usd', 'efficiency_rating',
+                  'description', 'image_url', 'release_year', 'is_available', 'stock_quantity')
+TRUE_VALUES = ('1', 'true', 'yes', 'y')
+FALSE_VALUES = ('0', 'false', 'no', 'n')
+
+def _finite(value):
+    """float(value), raising ValueError for NaN and infinities"""
+    number = float(value)
+    if not math.isfinite(number):
+        raise ValueError('not a finite number')
+    return number
+
+def _shapes(rows):
+    """Rows grouped by their key set; an executemany statement needs the same keys in every row"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    return groups.values()
+
+def _iter_json(stream, chunk_size=65536):
+    """Objects from a JSON array or NDJSON text stream, decoded incrementally"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    eof = False
+    while True:
+        # Skip separators between values: whitespace, commas and the array brackets
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            position += 1
+        if position >= len(buffer) or (not eof and len(buffer) - position < chunk_size):
+            chunk = '' if eof else stream.read(chunk_size)
+            eof = eof or not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            if not buffer.strip(' \t\r\n,[]'):
+                if eof:
+                    return
+                continue
+            continue
+        try:
+            value, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError(f'Malformed JSON near: {buffer[position:position + 40]!r}')
+            # Value straddles the chunk boundary; read more and retry
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield value
+
+class CatalogImporter:
+    """Validates and upserts price-list rows into the miner catalog"""
+
+    def __init__(self, batch_size=None, dry_run=False, max_errors=None):
+        config = current_app.config
+        self.batch_size = batch_size or config.get('IMPORT_BATCH_SIZE', 2000)
+        self.max_errors = max_errors or config.get('IMPORT_MAX_ERRORS', 1000)
+        self.dry_run = dry_run
+
+    @staticmethod
+    def read(stream, fmt):
+        """(row_number, record) pairs from a text stream in 'csv' or 'json' (array or NDJSON) format"""
+        if fmt == 'csv':
+            reader = csv.DictReader(stream)
+            if reader.fieldnames is None:
+                return
+            reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+            for record in reader:
+                yield reader.line_num, record
+        elif fmt == 'json':
+            for number, record in enumerate(_iter_json(stream), start=1):
+                yield number, record
+        else:
+            raise ValueError('format must be csv or json')
+
+    @staticmethod
+    def validate(record):
+        """Column values for one row; raises ValueError naming the first problem"""
+        if not isinstance(record, dict):
+            raise ValueError('row is not an object')
+        values = {}
+        for field in REQUIRED_FIELDS:
+            value = record.get(field)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                raise ValueError(f'{field} is required')
+        values['manufacturer'] = str(record['manufacturer']).strip()[:100]
+        values['model'] = str(record['model']).strip()[:100]
+        values['algorithm'] = str(record['algorithm']).strip()[:50]
+        try:
+            values['hash_rate'] = _finite(record['hash_rate'])
+            values['price_usd'] = _finite(record['price_usd'])
+            values['power_consumption'] = int(_finite(record['power_consumption']))
+        except (TypeError, ValueError, OverflowError):
+            raise ValueError('hash_rate, power_consumption and price_usd must be finite numbers')
+        if values['hash_rate'] <= 0 or values['power_consumption'] <= 0:
+            raise ValueError('hash_rate and power_consumption must be positive')
+        if values['price_usd'] < 0:
+            raise ValueError('price_usd must be a non-negative number')
+        values['efficiency_rating'] = values['power_consumption'] / (values['hash_rate'] * 1000)
+
+        name = record.get('name')
+        values['name'] = (str(name).strip() if name else f"{values['manufacturer']} {values['model']}")[:200]
+        stock = record.get('stock_quantity')
+        if stock not in (None, ''):
+            try:
+                values['stock_quantity'] = int(_finite(stock))
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError('stock_quantity must be a whole number')
+            if values['stock_quantity'] < 0:
+                raise ValueError('stock_quantity cannot be negative')
+        year = record.get('release_year')
+        if year not in (None, ''):
+            try:
+                values['release_year'] = int(_finite(year))
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError('release_year must be a year')
+        available = record.get('is_available')
+        if available not in (None, ''):
+            text = str(available).strip().lower()
+            if text not in TRUE_VALUES + FALSE_VALUES:
+                raise ValueError('is_available must be true or false')
+            values['is_available'] = text in TRUE_VALUES
+        for field in ('description', 'image_url', 'warehouse_location'):
+            if record.get(field) not in (None, ''):
+                values[field] = str(record[field])
+        return values
+
+    def run(self, stream, fmt):
+        """Import every row of stream; returns counters and the first IMPORT_MAX_ERRORS row errors"""
+        started = time.perf_counter()
+        report = {'rows': 0, 'inserted': 0, 'updated': 0, 'invalid': 0, 'duplicates': 0,
+                  'failed': 0, 'errors': [], 'dry_run': self.dry_run}
+        stock_changed = set()
+        batch = {}  # (manufacturer, model) -> (row_number, values); a later row for the same key wins
+        try:
+            for number, record in self.read(stream, fmt):
+                report['rows'] += 1
+                try:
+                    values = self.validate(record)
+                except ValueError as e:
+                    report['invalid'] += 1
+                    self._error(report, number, str(e))
+                    continue
+                key = (values['manufacturer'], values['model'])
+                if key in batch:
+                    report['duplicates'] += 1
+                batch[key] = (number, values)
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, report, stock_changed)
+                    batch = {}
+        except (ValueError, csv.Error, UnicodeDecodeError) as e:
+            self._error(report, report['rows'] + 1, f'Could not read file: {e}')
+        if batch:
+            self._flush(batch, report, stock_changed)
+
+        if not self.dry_run and (report['inserted'] or report['updated']):
+            if stock_changed:
+                reservations.resync_shards(stock_changed, existing_only=True)
+            bump_version('catalog')
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        logger.info(f"Catalog import: {report['inserted']} inserted, {report['updated']} updated, "
+                    f"{report['invalid']} invalid, {report['failed']} failed of {report['rows']} rows")
+        return report
+
+    def _error(self, report, number, message):
+        if len(report['errors']) < self.max_errors:
+            report['errors'].append({'row': number, 'message': message})
+
+    def _flush(self, batch, report, stock_changed):
+        """Write one batch in its own transaction"""
+        if self.dry_run:
+            existing = self._existing(list(batch))
+            report['updated'] += sum(1 for key in batch if key in existing)
+            report['inserted'] += sum(1 for key in batch if key not in existing)
+            return
+        try:
+            inserted, updated, changed = self._upsert(batch)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error importing catalog batch: {e}")
+            report['failed'] += len(batch)
+            first = min(number for number, _ in batch.values())
+            self._error(report, first, f'Batch of {len(batch)} rows starting here was not saved: {e}')
+            return
+        report['inserted'] += inserted
+        report['updated'] += updated
+        stock_changed.update(changed)
+
+    @staticmethod
+    def _existing(keys):
+        return {
+            (row.manufacturer, row.model): row
+            for row in db.session.query(
+                ASICMiner.id, ASICMiner.manufacturer, ASICMiner.model, ASICMiner.price_usd, ASICMiner.stock_quantity
+            ).filter(db.tuple_(ASICMiner.manufacturer, ASICMiner.model).in_(keys))
+        }
+
+    def _upsert(self, batch):
+        """Insert or update the batch's miners and inventory; returns (inserted, updated, stock-changed ids)"""
+        existing = self._existing(list(batch))
+        table = ASICMiner.__table__
+        now = datetime.utcnow()
+        new_rows, updates = [], []
+        price_changes, stock_changed = {}, set()
+        for key, (_, values) in batch.items():
+            current = existing.get(key)
+            row = {field: values[field] for field in UPDATED_FIELDS if field in values}
+            row['updated_at'] = now
+            if current is None:
+                row.update(manufacturer=values['manufacturer'], model=values['model'], created_at=now)
+                row.setdefault('stock_quantity', 0)
+                row.setdefault('is_available', True)
+                new_rows.append(row)
+            else:
+                row['_id'] = current.id
+                updates.append(row)
+                if current.price_usd != values['price_usd']:
+                    price_changes[current.id] = values['price_usd']
+                if 'stock_quantity' in values and current.stock_quantity != values['stock_quantity']:
+                    stock_changed.add(current.id)
+
+        # Core statements on the tables: executemany without per-row ORM bookkeeping.
+        # RETURNING carries the natural key, so rows need not come back in parameter order
+        ids = {key: row.id for key, row in existing.items()}
+        for rows in _shapes(new_rows):
+            created = db.session.execute(
+                db.insert(table).returning(table.c.id, table.c.manufacturer, table.c.model), rows
+            )
+            ids.update({(row.manufacturer, row.model): row.id for row in created})
+        for rows in _shapes(updates):
+            fields = [field for field in rows[0] if field != '_id']
+            db.session.execute(
+                db.update(table).where(table.c.id == db.bindparam('_id')).values(
+                    {field: db.bindparam(field) for field in fields}
+                ),
+                rows
+            )
+        if price_changes:
+            # Bulk UPDATEs bypass the ORM price hook
+            PriceAlertEngine.evaluate(price_changes)
+
+        # Inventory follows the stock of new miners and of rows that set stock_quantity
+        inventory = []
+        for key, (_, values) in batch.items():
+            if key in existing and 'stock_quantity' not in values:
+                continue
+            row = {'miner_id': ids[key], 'quantity_available': values.get('stock_quantity', 0), 'updated_at': now}
+            if 'warehouse_location' in values:
+                row['warehouse_location'] = values['warehouse_location']
+            inventory.append(row)
+        for rows in _shapes(inventory):
+            stmt = dialect_insert(Inventory.__table__)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['miner_id'],
+                set_={field: stmt.excluded[field] for field in rows[0] if field != 'miner_id'}
+            )
+            db.session.execute(stmt, rows)
+        return len(new_rows), len(updates), stock_changed
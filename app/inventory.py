@@ -0,0 +1,86 @@
+"""
+Concurrency-safe stock accounting for checkout
+
+Stock is decremented with conditional UPDATEs (``SET stock = stock - :qty
+WHERE stock >= :qty``) instead of read-modify-write on loaded rows, so two
+concurrent checkouts can never both pass the stock check for the last units.
+Rows are always updated in miner_id order so concurrent transactions lock
+them in the same sequence and cannot deadlock.
+
+Availability for new orders is decided by the reservation shards in
+app.reservations; these on-hand decrements are the last line of defence
+against the totals going negative.
+"""
+import logging
+from app.models import db, ASICMiner, Inventory
+
+logger = logging.getLogger(__name__)
+
+class InsufficientStockError(Exception):
+    """Raised when a cart line cannot be covered by the remaining stock"""
+
+    def __init__(self, miner_id, name=None):
+        self.miner_id = miner_id
+        self.name = name
+        super().__init__(f"Insufficient stock for {name or 'item'}")
+
+class InventoryService:
+    """Batched cart loading and atomic stock decrements"""
+
+    @staticmethod
+    def aggregate_cart(cart_items):
+        """Collapse cart lines into {miner_id: quantity}; raises ValueError on bad input"""
+        quantities = {}
+        for item in cart_items:
+            try:
+                miner_id = int(item['miner_id'])
+                quantity = int(item['quantity'])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError('Invalid cart item')
+            if quantity <= 0:
+                raise ValueError('Quantity must be positive')
+            quantities[miner_id] = quantities.get(miner_id, 0) + quantity
+        return quantities
+
+    @staticmethod
+    def load_miners(miner_ids):
+        """Fetch every cart miner and its inventory row in a single query"""
+        miners = (
+            ASICMiner.query
+            .options(db.joinedload(ASICMiner.inventory))
+            .filter(ASICMiner.id.in_(list(miner_ids)))
+            .all()
+        )
+        return {miner.id: miner for miner in miners}
+
+    @staticmethod
+    def decrement_stock(quantities, miners):
+        """Atomically take quantities out of on-hand stock inside the current transaction
+
+        Raises InsufficientStockError on the first line that cannot be covered;
+        the caller must roll back so earlier decrements are undone.
+        """
+        for miner_id in sorted(quantities):
+            quantity = quantities[miner_id]
+            miner = miners.get(miner_id)
+            if miner is None:
+                raise InsufficientStockError(miner_id)
+
+            result = db.session.execute(
+                db.update(ASICMiner)
+                .where(ASICMiner.id == miner_id, ASICMiner.stock_quantity >= quantity)
+                .values(stock_quantity=ASICMiner.stock_quantity - quantity)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                raise InsufficientStockError(miner_id, miner.name)
+
+            if miner.inventory is not None:
+                result = db.session.execute(
+                    db.update(Inventory)
+                    .where(Inventory.miner_id == miner_id, Inventory.quantity_available >= quantity)
+                    .values(quantity_available=Inventory.quantity_available - quantity)
+                    .execution_options(synchronize_session=False)
+                )
+                if result.rowcount != 1:
+                    raise InsufficientStockError(miner_id, miner.name)
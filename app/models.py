@@ -2,11 +2,107 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-import random
-import string
+from app.ids import new_tracking_number
 
 db = SQLAlchemy()
 
+def dialect_insert(model):
+    """Dialect-specific INSERT construct supporting ON CONFLICT upserts"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+    return insert(model)
+
+class CacheVersion(db.Model):
+    """Change counter per cache namespace, shared by every worker through the database"""
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<CacheVersion {self.name}: {self.version}>'
+
+class ScheduledJob(db.Model):
+    """Next run time and lease for a periodic job, shared by every worker through the database"""
+    name = db.Column(db.String(100), primary_key=True)
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    locked_by = db.Column(db.String(200))  # host:pid holding the lease
+    locked_until = db.Column(db.DateTime)
+    last_status = db.Column(db.String(20))
+    last_run_at = db.Column(db.DateTime)
+    last_duration_ms = db.Column(db.Float)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ScheduledJob {self.name} next {self.next_run_at}>'
+
+class JobRun(db.Model):
+    """One execution of a scheduled job"""
+    __table_args__ = (
+        db.Index('ix_job_run_job_started', 'job_name', 'started_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_name = db.Column(db.String(100), nullable=False)
+    worker = db.Column(db.String(200))
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, success, failed, abandoned
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Float)
+    error = db.Column(db.Text)
+    
+    def __repr__(self):
+        return f'<JobRun {self.job_name} {self.status}>'
+
+class QueuedTask(db.Model):
+    """Durable background task (transactional outbox), processed by app.tasks workers"""
+    __table_args__ = (
+        db.Index('ix_queued_task_status_run_after', 'status', 'run_after'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, running, done, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    dedupe_key = db.Column(db.String(200), unique=True)  # At most one pending task per key; cleared when claimed
+    locked_by = db.Column(db.String(200))
+    locked_until = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<QueuedTask {self.id} {self.name} {self.status}>'
+
+class ScrapedPage(db.Model):
+    """HTTP validators and content hash of a fetched page, for conditional re-fetching (app/scraper.py)"""
+    url = db.Column(db.String(500), primary_key=True)
+    etag = db.Column(db.String(200))
+    last_modified = db.Column(db.String(100))
+    content_hash = db.Column(db.String(64))
+    links = db.Column(db.Text)  # JSON {"links": [...], "next": url} for listing pages
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<ScrapedPage {self.url}>'
+
+class SimulationResult(db.Model):
+    """Cached Monte Carlo ROI distribution for one miner and parameter set (app/simulation.py)"""
+    cache_key = db.Column(db.String(64), primary_key=True)  # sha256 of miner specs and simulation parameters
+    miner_id = db.Column(db.Integer, db.ForeignKey('asic_miner.id'), nullable=False, index=True)
+    result = db.Column(db.Text, nullable=False)  # JSON
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<SimulationResult {self.miner_id} {self.cache_key[:8]}>'
+
 class User(UserMixin, db.Model):
     """User model for authentication and profile management"""
     id = db.Column(db.Integer, primary_key=True)
@@ -47,6 +143,11 @@ user_favorites = db.Table(
 
 class ASICMiner(db.Model):
     """ASIC Mining hardware model"""
+    __table_args__ = (
+        # (manufacturer, model) is the natural key matched by imports and the miningnow.com sync
+        db.Index('ix_asic_miner_manufacturer_model', 'manufacturer', 'model'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False, index=True)
     manufacturer = db.Column(db.String(100), nullable=False, index=True)  # Bitmain, MicroBT, etc.
@@ -59,7 +160,14 @@ class ASICMiner(db.Model):
     image_url = db.Column(db.String(500))
     description = db.Column(db.Text)
     release_year = db.Column(db.Integer)
-    profitability_score = db.Column(db.Float, default=0.0)  # Calculated field
+    profitability_score = db.Column(db.Float, default=0.0, index=True)  # Calculated field
+    rating_count = db.Column(db.Integer, default=0, nullable=False)  # Maintained by Review events
+    rating_sum = db.Column(db.Integer, default=0, nullable=False)
+    rating_1_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_2_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_3_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_4_count = db.Column(db.Integer, default=0, nullable=False)
+    rating_5_count = db.Column(db.Integer, default=0, nullable=False)
     efficiency_rating = db.Column(db.Float, default=0.0)  # J/GH
     is_available = db.Column(db.Boolean, default=True, index=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
@@ -70,16 +178,21 @@ class ASICMiner(db.Model):
     reviews = db.relationship('Review', backref='miner', lazy=True, cascade='all, delete-orphan')
     profitability_data = db.relationship('ProfitabilityData', backref='miner', lazy=True, cascade='all, delete-orphan')
     inventory = db.relationship('Inventory', backref='asic_miner', lazy=True, uselist=False, cascade='all, delete-orphan')
+    latest_profitability = db.relationship('LatestProfitability', lazy=True, uselist=False, cascade='all, delete-orphan')
     
     def get_average_rating(self):
-        """Calculate average rating from reviews"""
-        if not self.reviews:
+        """Average rating from the stored review aggregates"""
+        if not self.rating_count:
             return 0
-        return sum(r.rating for r in self.reviews) / len(self.reviews)
+        return self.rating_sum / self.rating_count
+    
+    def get_rating_histogram(self):
+        """Number of reviews per star rating, 5 stars first"""
+        return {stars: getattr(self, f'rating_{stars}_count') or 0 for stars in range(5, 0, -1)}
     
     def get_latest_profitability(self):
-        """Get most recent profitability data"""
-        return ProfitabilityData.query.filter_by(miner_id=self.id).order_by(ProfitabilityData.timestamp.desc()).first()
+        """Get most recent profitability data (eager-load latest_profitability on listings)"""
+        return self.latest_profitability
     
     def __repr__(self):
         return f'<ASICMiner {self.name}>'
@@ -103,6 +216,35 @@ class Inventory(db.Model):
     def __repr__(self):
         return f'<Inventory {self.miner_id}: {self.quantity_available} units>'
 
+class StockShard(db.Model):
+    """Slice of a miner's unreserved stock; holds draw from a random slice so they don't contend on one row"""
+    miner_id = db.Column(db.Integer, db.ForeignKey('asic_miner.id'), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<StockShard {self.miner_id}/{self.shard}: {self.quantity}>'
+
+class StockReservation(db.Model):
+    """Time-limited hold on stock, taken on add-to-cart and converted at checkout"""
+    __table_args__ = (
+        db.Index('ix_stock_reservation_status_expires', 'status', 'expires_at'),
+        db.Index('ix_stock_reservation_user_status', 'user_id', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    miner_id = db.Column(db.Integer, db.ForeignKey('asic_miner.id'), nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    shard = db.Column(db.Integer, nullable=False)  # Units go back to this shard on release/expiry
+    quantity = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='held')  # held, converted, released, expired
+    expires_at = db.Column(db.DateTime, nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StockReservation {self.id}: {self.quantity} x {self.miner_id} {self.status}>'
+
 class Order(db.Model):
     """Customer orders"""
     id = db.Column(db.Integer, primary_key=True)
@@ -155,13 +297,17 @@ class Shipping(db.Model):
     
     def generate_tracking_number(self):
         """Generate unique tracking number"""
-        self.tracking_number = 'CMP' + ''.join(random.choices(string.ascii_uppercase + string.digits, k=10))
+        self.tracking_number = new_tracking_number()
     
     def __repr__(self):
         return f'<Shipping {self.tracking_number}>'
 
 class Review(db.Model):
     """Customer reviews for miners"""
+    __table_args__ = (
+        db.Index('ix_review_miner_created_id', 'miner_id', 'created_at', 'id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     miner_id = db.Column(db.Integer, db.ForeignKey('asic_miner.id'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
@@ -176,6 +322,39 @@ class Review(db.Model):
     def __repr__(self):
         return f'<Review {self.id}: {self.rating}★>'
 
+def _apply_rating_delta(connection, miner_id, rating, sign):
+    """Add (sign=1) or remove (sign=-1) one rating from a miner's review aggregates"""
+    values = {
+        'rating_count': ASICMiner.rating_count + sign,
+        'rating_sum': ASICMiner.rating_sum + sign * rating
+    }
+    if rating in (1, 2, 3, 4, 5):
+        column = getattr(ASICMiner, f'rating_{rating}_count')
+        values[f'rating_{rating}_count'] = column + sign
+    connection.execute(
+        db.update(ASICMiner.__table__).where(ASICMiner.id == miner_id).values(**values)
+    )
+
+@db.event.listens_for(Review, 'after_insert')
+def _review_inserted(mapper, connection, review):
+    _apply_rating_delta(connection, review.miner_id, review.rating, 1)
+
+@db.event.listens_for(Review, 'after_update')
+def _review_updated(mapper, connection, review):
+    state = db.inspect(review)
+    rating_history = state.attrs.rating.history
+    miner_history = state.attrs.miner_id.history
+    if not rating_history.has_changes() and not miner_history.has_changes():
+        return
+    old_rating = rating_history.deleted[0] if rating_history.deleted else review.rating
+    old_miner_id = miner_history.deleted[0] if miner_history.deleted else review.miner_id
+    _apply_rating_delta(connection, old_miner_id, old_rating, -1)
+    _apply_rating_delta(connection, review.miner_id, review.rating, 1)
+
+@db.event.listens_for(Review, 'after_delete')
+def _review_deleted(mapper, connection, review):
+    _apply_rating_delta(connection, review.miner_id, review.rating, -1)
+
 class ProfitabilityData(db.Model):
     """Real-time profitability data for miners"""
     id = db.Column(db.Integer, primary_key=True)
@@ -192,6 +371,44 @@ class ProfitabilityData(db.Model):
     def __repr__(self):
         return f'<ProfitabilityData {self.miner_id}: ${self.daily_profit_usd:.2f}/day>'
 
+class LatestProfitability(db.Model):
+    """Most recent profitability snapshot per miner, maintained by the refresh job"""
+    miner_id = db.Column(db.Integer, db.ForeignKey('asic_miner.id'), primary_key=True)
+    daily_profit_usd = db.Column(db.Float, default=0.0, index=True)
+    monthly_profit_usd = db.Column(db.Float, default=0.0)
+    yearly_profit_usd = db.Column(db.Float, default=0.0)
+    electricity_cost = db.Column(db.Float, default=0.12)
+    net_profit_daily = db.Column(db.Float, default=0.0)
+    roi_days = db.Column(db.Float, default=0.0)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow)
+    data_source = db.Column(db.String(100), default='internal')
+    
+    def __repr__(self):
+        return f'<LatestProfitability {self.miner_id}: ${self.daily_profit_usd:.2f}/day>'
+
+class ProfitabilityRollup(db.Model):
+    """Downsampled profitability history (hourly and daily buckets)"""
+    __table_args__ = (
+        db.UniqueConstraint('miner_id', 'resolution', 'bucket_start', name='uq_profitability_rollup_bucket'),
+        db.Index('ix_profitability_rollup_resolution_bucket', 'resolution', 'bucket_start'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    miner_id = db.Column(db.Integer, db.ForeignKey('asic_miner.id'), nullable=False, index=True)
+    resolution = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    sample_count = db.Column(db.Integer, default=0)
+    daily_profit_min = db.Column(db.Float)
+    daily_profit_avg = db.Column(db.Float)
+    daily_profit_max = db.Column(db.Float)
+    roi_days_min = db.Column(db.Float)
+    roi_days_avg = db.Column(db.Float)
+    roi_days_max = db.Column(db.Float)
+    electricity_cost_avg = db.Column(db.Float)
+    
+    def __repr__(self):
+        return f'<ProfitabilityRollup {self.miner_id} {self.resolution} {self.bucket_start}>'
+
 class Cryptocurrency(db.Model):
     """Cryptocurrency data"""
     id = db.Column(db.Integer, primary_key=True)
@@ -207,6 +424,31 @@ class Cryptocurrency(db.Model):
     def __repr__(self):
         return f'<Cryptocurrency {self.symbol}: ${self.current_price:.2f}>'
 
+class CoinPrice(db.Model):
+    """Raw coin price samples; pruned after COIN_PRICE_RAW_RETENTION_DAYS (app/prices.py)"""
+    symbol = db.Column(db.String(20), primary_key=True)
+    timestamp = db.Column(db.DateTime, primary_key=True)
+    price = db.Column(db.Float, nullable=False)
+    
+    def __repr__(self):
+        return f'<CoinPrice {self.symbol} {self.timestamp}: ${self.price:.2f}>'
+
+class CoinPriceRollup(db.Model):
+    """5-minute, hourly and daily OHLC candles per coin, maintained as samples are written"""
+    symbol = db.Column(db.String(20), primary_key=True)
+    resolution = db.Column(db.String(10), primary_key=True)  # 5min, hour, day
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    open = db.Column(db.Float, nullable=False)
+    high = db.Column(db.Float, nullable=False)
+    low = db.Column(db.Float, nullable=False)
+    close = db.Column(db.Float, nullable=False)
+    first_at = db.Column(db.DateTime, nullable=False)  # Timestamps of the open and close samples
+    last_at = db.Column(db.DateTime, nullable=False)
+    sample_count = db.Column(db.Integer, default=0)
+    
+    def __repr__(self):
+        return f'<CoinPriceRollup {self.symbol} {self.resolution} {self.bucket_start}>'
+
 class MiningAnalytics(db.Model):
     """User's mining analytics and calculations"""
     id = db.Column(db.Integer, primary_key=True)
@@ -223,6 +465,11 @@ class MiningAnalytics(db.Model):
 
 class PriceAlert(db.Model):
     """Price alerts for users"""
+    __table_args__ = (
+        # Sorted thresholds per miner and direction; see app.alerts
+        db.Index('ix_price_alert_threshold', 'miner_id', 'alert_type', 'is_active', 'target_price'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     miner_id = db.Column(db.Integer, db.ForeignKey('asic_miner.id'), nullable=False)
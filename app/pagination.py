@@ -0,0 +1,159 @@
+"""
+Keyset (cursor) pagination
+
+A cursor encodes the sort-key values of the first or last row on a page, so
+the neighbouring page is fetched with a WHERE on those values instead of an
+OFFSET scan. Totals come from a short-lived count cache rather than a
+COUNT(*) on every request.
+"""
+import base64
+import json
+import math
+from datetime import datetime
+from flask import current_app, request, url_for
+from app.models import db
+from app.cache import TTLCache
+
+# Counts are only ever loaded inside a request, so no background refresh
+count_cache = TTLCache(ttl=60, stale_ttl=0, refresh_ahead=1.0, config_prefix='PAGINATION_COUNT_CACHE')
+
+def encode_cursor(values):
+    """Encode a list of sort-key values as an opaque URL-safe token"""
+    payload = [
+        {'dt': v.isoformat()} if isinstance(v, datetime) else v
+        for v in values
+    ]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor, raising ValueError if malformed"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(payload, list):
+        raise ValueError('Invalid cursor')
+    try:
+        return [
+            datetime.fromisoformat(v['dt']) if isinstance(v, dict) and 'dt' in v else v
+            for v in payload
+        ]
+    except (TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
+def clamp_per_page(per_page, default=None):
+    """Clamp a requested page size to 1..MAX_ITEMS_PER_PAGE"""
+    if default is None:
+        default = current_app.config.get('ITEMS_PER_PAGE', 12)
+    ceiling = current_app.config.get('MAX_ITEMS_PER_PAGE', 100)
+    if not per_page:
+        per_page = default
+    return max(1, min(per_page, ceiling))
+
+def cached_count(query):
+    """COUNT(*) for a query, cached per SQL and parameters for a short TTL"""
+    compiled = query.statement.compile(dialect=db.engine.dialect)
+    key = (str(compiled), repr(sorted(compiled.params.items())))
+    return count_cache.get(key, query.order_by(None).count)
+
+def cursor_url(cursor):
+    """URL of the current listing with its query args kept and the cursor replaced"""
+    args = request.args.to_dict()
+    args.pop('page', None)
+    args['cursor'] = cursor
+    return url_for(request.endpoint, **(request.view_args or {}), **args)
+
+class KeysetPagination:
+    """One page of keyset-paginated results"""
+
+    def __init__(self, items, per_page, next_cursor, prev_cursor, total=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def _cursor_value(expr, value):
+    """value if it can be compared with expr's SQL type; raises ValueError otherwise"""
+    try:
+        expected = expr.type.python_type
+    except NotImplementedError:
+        expected = float  # Untyped expressions such as search ranks are numeric
+    if expected is bool:
+        valid = isinstance(value, bool)
+    elif expected in (int, float):
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+        valid = valid and (expected is float or isinstance(value, int))
+    else:
+        valid = isinstance(value, expected)
+    if not valid:
+        raise ValueError('Invalid cursor')
+    return value
+
+def _seek_condition(sort, values):
+    """Rows strictly after values in the given (expression, descending) order"""
+    clauses = []
+    for i, (expr, descending) in enumerate(sort):
+        step = expr < values[i] if descending else expr > values[i]
+        ties = [sort[j][0] == values[j] for j in range(i)]
+        clauses.append(db.and_(*ties, step))
+    return db.or_(*clauses)
+
+def keyset_paginate(query, sort, cursor=None, per_page=None, with_total=True):
+    """Paginate an ORM query by keyset
+
+    sort is a list of (expression, descending) pairs ending in a unique column
+    such as the primary key; expressions must not be NULL (coalesce nullable
+    columns). cursor is a token from a previous page's next_cursor or
+    prev_cursor. Raises ValueError on a malformed cursor.
+    """
+    per_page = clamp_per_page(per_page)
+    total = cached_count(query) if with_total else None
+
+    direction = 'next'
+    values = None
+    if cursor:
+        decoded = decode_cursor(cursor)
+        if len(decoded) != len(sort) + 1 or decoded[0] not in ('next', 'prev'):
+            raise ValueError('Invalid cursor')
+        direction = decoded[0]
+        values = [_cursor_value(expr, value) for (expr, _), value in zip(sort, decoded[1:])]
+
+    # Walking backwards flips every sort direction, then the page is reversed
+    backwards = direction == 'prev'
+    walk = [(expr, descending != backwards) for expr, descending in sort]
+    if values is not None:
+        query = query.filter(_seek_condition(walk, values))
+    query = query.order_by(None).order_by(*[
+        expr.desc() if descending else expr.asc() for expr, descending in walk
+    ])
+
+    # Select the sort keys alongside the entity so cursors can be built from any expression
+    rows = query.add_columns(*[expr for expr, _ in sort]).limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    items = [row[0] for row in rows]
+    if backwards:
+        has_next, has_prev = True, more
+    else:
+        has_next, has_prev = more, values is not None
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(['next'] + list(rows[-1][1:]))
+    if rows and has_prev:
+        prev_cursor = encode_cursor(['prev'] + list(rows[0][1:]))
+    return KeysetPagination(items, per_page, next_cursor, prev_cursor, total)
@@ -0,0 +1,240 @@
+"""
+Coin price history
+
+Every price sample update_crypto_data() fetches is kept as a raw CoinPrice
+row (symbol, timestamp, price) and folded into 5-minute, hourly and daily
+OHLC candles in CoinPriceRollup as it is written: samples are grouped per
+bucket in Python and each candle is upserted once per batch, keeping the
+earliest sample as open and the latest as close even when samples arrive out
+of order. Raw samples older than COIN_PRICE_RAW_RETENTION_DAYS are pruned;
+candles are kept.
+
+Chart queries read the coarsest source that still has a few samples per
+requested point, so the rows read are bounded by the point budget rather
+than the range (a year at a few hundred points reads the hourly candles, not
+half a million raw rows). Largest-Triangle-Three-Buckets then reduces them
+to the budget, keeping peaks and troughs that plain averaging or striding
+would flatten.
+"""
+import math
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from app.models import db, dialect_insert, CoinPrice, CoinPriceRollup
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = {'5min': timedelta(minutes=5), 'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+EPOCH = datetime(1970, 1, 1)
+
+def lttb(x, y, threshold):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps from (x, y), first and last included"""
+    n = len(x)
+    if threshold < 3:
+        raise ValueError('LTTB needs a threshold of at least 3 points')
+    if threshold >= n:
+        return np.arange(n)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    # Interior points split into threshold - 2 buckets of (almost) equal size
+    edges = np.floor(np.linspace(1, n - 1, threshold - 1)).astype(np.int64)
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < threshold - 1:
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        # Third vertex: average of the next bucket
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        px, py = x[previous], y[previous]
+        area = np.abs((px - avg_x) * (y[start:end] - py) - (px - x[start:end]) * (avg_y - py))
+        previous = start + int(area.argmax())
+        selected[i + 1] = previous
+    return selected
+
+class PriceHistory:
+    """Writes coin price samples and candles, and serves downsampled ranges"""
+
+    @staticmethod
+    def _truncate(moment, resolution):
+        if resolution == '5min':
+            return moment.replace(minute=moment.minute - moment.minute % 5, second=0, microsecond=0)
+        if resolution == 'hour':
+            return moment.replace(minute=0, second=0, microsecond=0)
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def record(prices, timestamp=None):
+        """Store {symbol: price} sampled at timestamp (now by default); the caller commits"""
+        timestamp = timestamp or datetime.utcnow()
+        return PriceHistory.record_many(
+            (symbol, timestamp, price) for symbol, price in prices.items() if price
+        )
+
+    @staticmethod
+    def record_many(samples, batch_size=5000):
+        """Store (symbol, timestamp, price) samples and fold them into candles; the caller commits
+
+        Re-recording a sample that is already stored is ignored for the raw
+        row but counted again in its candles.
+        """
+        written = 0
+        batch = []
+        for sample in samples:
+            batch.append(sample)
+            if len(batch) >= batch_size:
+                written += PriceHistory._write_batch(batch)
+                batch = []
+        if batch:
+            written += PriceHistory._write_batch(batch)
+        return written
+
+    @staticmethod
+    def _write_batch(batch):
+        stmt = dialect_insert(CoinPrice).on_conflict_do_nothing(index_elements=[CoinPrice.symbol, CoinPrice.timestamp])
+        db.session.execute(stmt, [{'symbol': s, 'timestamp': t, 'price': p} for s, t, p in batch])
+
+        for resolution in RESOLUTIONS:
+            candles = {}
+            for symbol, timestamp, price in batch:
+                key = (symbol, PriceHistory._truncate(timestamp, resolution))
+                candle = candles.get(key)
+                if candle is None:
+                    candles[key] = {
+                        'symbol': symbol, 'resolution': resolution, 'bucket_start': key[1],
+                        'open': price, 'high': price, 'low': price, 'close': price,
+                        'first_at': timestamp, 'last_at': timestamp, 'sample_count': 1
+                    }
+                    continue
+                candle['high'] = max(candle['high'], price)
+                candle['low'] = min(candle['low'], price)
+                if timestamp < candle['first_at']:
+                    candle['open'], candle['first_at'] = price, timestamp
+                if timestamp >= candle['last_at']:
+                    candle['close'], candle['last_at'] = price, timestamp
+                candle['sample_count'] += 1
+            PriceHistory._merge_candles(list(candles.values()))
+        return len(batch)
+
+    @staticmethod
+    def _merge_candles(candles):
+        """Upsert candles, combining with stored ones for the same bucket"""
+        table = CoinPriceRollup
+        stmt = dialect_insert(table)
+        new = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.symbol, table.resolution, table.bucket_start],
+            set_={
+                'high': db.case((new.high > table.high, new.high), else_=table.high),
+                'low': db.case((new.low < table.low, new.low), else_=table.low),
+                'open': db.case((new.first_at < table.first_at, new.open), else_=table.open),
+                'first_at': db.case((new.first_at < table.first_at, new.first_at), else_=table.first_at),
+                'close': db.case((new.last_at >= table.last_at, new.close), else_=table.close),
+                'last_at': db.case((new.last_at >= table.last_at, new.last_at), else_=table.last_at),
+                'sample_count': table.sample_count + new.sample_count
+            }
+        )
+        db.session.execute(stmt, candles)
+
+    @staticmethod
+    def prune(now=None, retention_days=None):
+        """Delete raw samples older than COIN_PRICE_RAW_RETENTION_DAYS; their candles stay"""
+        if retention_days is None:
+            retention_days = current_app.config.get('COIN_PRICE_RAW_RETENTION_DAYS', 90)
+        cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+        try:
+            result = db.session.execute(
+                db.delete(CoinPrice).where(CoinPrice.timestamp < cutoff).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error pruning coin price history: {e}")
+            db.session.rollback()
+            raise
+        logger.info(f"Pruned {result.rowcount} raw coin price samples")
+        return result.rowcount
+
+    @staticmethod
+    def _source(symbol, start, end, points):
+        """Coarsest source ('day', 'hour', '5min' or 'raw') that still gives LTTB a few samples per point
+
+        Raw samples are used only when their retention reaches back to start.
+        """
+        oversample = current_app.config.get('COIN_PRICE_OVERSAMPLE', 2)
+        per_point = (end - start) / max(points * oversample, 1)
+        for resolution in ('day', 'hour', '5min'):
+            if RESOLUTIONS[resolution] <= per_point:
+                return resolution
+        oldest = db.session.query(db.func.min(CoinPrice.timestamp)).filter(CoinPrice.symbol == symbol).scalar()
+        if oldest is not None and oldest <= start + RESOLUTIONS['5min']:
+            return 'raw'
+        return '5min'
+
+    @staticmethod
+    def _series(symbol, source, start, end):
+        if source == 'raw':
+            query = db.select(CoinPrice.timestamp, CoinPrice.price).where(
+                CoinPrice.symbol == symbol, CoinPrice.timestamp >= start, CoinPrice.timestamp <= end
+            ).order_by(CoinPrice.timestamp)
+        else:
+            query = db.select(CoinPriceRollup.bucket_start, CoinPriceRollup.close).where(
+                CoinPriceRollup.symbol == symbol,
+                CoinPriceRollup.resolution == source,
+                CoinPriceRollup.bucket_start >= PriceHistory._truncate(start, source),
+                CoinPriceRollup.bucket_start <= end
+            ).order_by(CoinPriceRollup.bucket_start)
+        rows = db.session.execute(query).all()
+        times = np.fromiter(((t - EPOCH).total_seconds() for t, _ in rows), dtype=np.float64, count=len(rows))
+        prices = np.fromiter((p for _, p in rows), dtype=np.float64, count=len(rows))
+        return times, prices
+
+    @staticmethod
+    def series(symbol, start, end, points=500):
+        """Up to points [epoch_ms, price] pairs for start..end and the source they were drawn from"""
+        source = PriceHistory._source(symbol, start, end, points)
+        times, prices = PriceHistory._series(symbol, source, start, end)
+        keep = lttb(times, prices, points)
+        return {
+            'symbol': symbol,
+            'source': source,
+            'samples': len(times),
+            'points': [[int(times[i] * 1000), float(prices[i])] for i in keep]
+        }
+
+    @staticmethod
+    def candles(symbol, resolution, start, end, limit=1000):
+        """OHLC candles for start..end, oldest first"""
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        rows = CoinPriceRollup.query.filter(
+            CoinPriceRollup.symbol == symbol,
+            CoinPriceRollup.resolution == resolution,
+            CoinPriceRollup.bucket_start >= PriceHistory._truncate(start, resolution),
+            CoinPriceRollup.bucket_start <= end
+        ).order_by(CoinPriceRollup.bucket_start).limit(limit).all()
+        return [{
+            'time': row.bucket_start.isoformat(),
+            'open': row.open,
+            'high': row.high,
+            'low': row.low,
+            'close': row.close,
+            'samples': row.sample_count
+        } for row in rows]
+
+    @staticmethod
+    def volatility(symbol, days=365, min_days=60):
+        """Annualized volatility of daily log returns over the last days, or None with too little history"""
+        since = PriceHistory._truncate(datetime.utcnow() - timedelta(days=days), 'day')
+        closes = np.array([close for (close,) in db.session.query(CoinPriceRollup.close).filter(
+            CoinPriceRollup.symbol == symbol,
+            CoinPriceRollup.resolution == 'day',
+            CoinPriceRollup.bucket_start >= since
+        ).order_by(CoinPriceRollup.bucket_start)], dtype=np.float64)
+        closes = closes[closes > 0]
+        if len(closes) < min_days:
+            return None
+        return float(np.diff(np.log(closes)).std(ddof=1) * math.sqrt(365))
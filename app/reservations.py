@@ -0,0 +1,307 @@
+"""
+Expiring stock reservations (add-to-cart holds)
+
+A miner's unreserved stock is split across RESERVATION_SHARDS StockShard rows.
+A hold takes its units from one randomly chosen shard with a conditional
+UPDATE, so thousands of concurrent holds on a hot miner spread their row
+locks over several rows instead of queuing on ASICMiner.stock_quantity.
+Released and expired holds give their units back to the shard they came
+from; only the per-miner sum of the shards matters.
+
+ASICMiner.stock_quantity and Inventory.quantity_available stay the on-hand
+totals and change only when checkout converts holds into an order.
+Inventory.reserved_quantity is refreshed from the active holds by the
+expire_reservations scheduler job (app.scheduler).
+"""
+import random
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models import db, dialect_insert, ASICMiner, Inventory, StockShard, StockReservation
+from app.inventory import InsufficientStockError
+
+logger = logging.getLogger(__name__)
+
+class ReservationService:
+    """Stock holds backed by sharded stock counters and their expiry"""
+
+    # ==================== Shards ====================
+
+    @staticmethod
+    def _shard_count():
+        return current_app.config.get('RESERVATION_SHARDS', 8)
+
+    @staticmethod
+    def _split(quantity, shards):
+        """Spread quantity as evenly as possible over shards"""
+        base, extra = divmod(max(0, quantity), shards)
+        return [base + (1 if i < extra else 0) for i in range(shards)]
+
+    @staticmethod
+    def _held_quantity(miner_id):
+        return db.session.query(db.func.coalesce(db.func.sum(StockReservation.quantity), 0)).filter(
+            StockReservation.miner_id == miner_id, StockReservation.status == 'held'
+        ).scalar()
+
+    def ensure_shards(self, miner_id):
+        """Create a miner's shards from its unreserved stock if it has none; False if the miner is unknown"""
+        if db.session.query(StockShard.miner_id).filter_by(miner_id=miner_id).first():
+            return True
+        stock = db.session.query(ASICMiner.stock_quantity).filter_by(id=miner_id).scalar()
+        if stock is None:
+            return False
+
+        levels = self._split(stock - self._held_quantity(miner_id), self._shard_count())
+        rows = [{'miner_id': miner_id, 'shard': shard, 'quantity': level} for shard, level in enumerate(levels)]
+        db.session.execute(
+            dialect_insert(StockShard).values(rows).on_conflict_do_nothing(index_elements=['miner_id', 'shard'])
+        )
+        return True
+
+    def resync_shards(self, miner_ids=None, batch_size=500, existing_only=False):
+        """Recompute shards from on-hand stock minus active holds, e.g. after a restock
+
+        Works through the miners batch_size at a time, one transaction per batch.
+        With existing_only, miners without shards are skipped; ensure_shards
+        creates theirs on the first hold.
+        """
+        shards = self._shard_count()
+        if miner_ids is None:
+            miner_ids = [miner_id for (miner_id,) in db.session.query(ASICMiner.id)]
+        miner_ids = sorted(set(miner_ids))
+
+        count = 0
+        for start in range(0, len(miner_ids), batch_size):
+            batch = miner_ids[start:start + batch_size]
+            try:
+                # Lock the existing shards so holds that commit before the lock are counted as held
+                locked = db.session.query(StockShard.miner_id).filter(StockShard.miner_id.in_(batch)).with_for_update().all()
+                if existing_only:
+                    batch = sorted({miner_id for (miner_id,) in locked})
+                stock = dict(db.session.query(ASICMiner.id, ASICMiner.stock_quantity).filter(ASICMiner.id.in_(batch)))
+                held = dict(db.session.query(StockReservation.miner_id, db.func.sum(StockReservation.quantity)).filter(
+                    StockReservation.miner_id.in_(batch), StockReservation.status == 'held'
+                ).group_by(StockReservation.miner_id))
+                rows = [
+                    {'miner_id': miner_id, 'shard': shard, 'quantity': level}
+                    for miner_id in batch if miner_id in stock
+                    for shard, level in enumerate(self._split((stock[miner_id] or 0) - (held.get(miner_id) or 0), shards))
+                ]
+                if rows:
+                    insert = dialect_insert(StockShard.__table__)
+                    db.session.execute(insert.on_conflict_do_update(
+                        index_elements=['miner_id', 'shard'], set_={'quantity': insert.excluded.quantity}
+                    ), rows)
+                StockShard.query.filter(StockShard.miner_id.in_(batch), StockShard.shard >= shards).delete(synchronize_session=False)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error resyncing stock shards: {e}")
+                db.session.rollback()
+                raise
+            count += len(stock)
+        return count
+
+    @staticmethod
+    def _decrement_shard(miner_id, shard, quantity):
+        result = db.session.execute(
+            db.update(StockShard)
+            .where(StockShard.miner_id == miner_id, StockShard.shard == shard, StockShard.quantity >= quantity)
+            .values(quantity=StockShard.quantity - quantity)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def take(self, miner_id, quantity, name=None):
+        """Remove quantity from a miner's unreserved stock; returns the shard to credit on release
+
+        Raises InsufficientStockError when the shards together cannot cover
+        quantity. Partial takes are undone by the caller's rollback.
+        """
+        start = random.randrange(self._shard_count())
+        if self._decrement_shard(miner_id, start, quantity):
+            return start
+
+        levels = dict(db.session.query(StockShard.shard, StockShard.quantity).filter_by(miner_id=miner_id).all())
+        if not levels:
+            if not self.ensure_shards(miner_id):
+                raise InsufficientStockError(miner_id, name)
+            levels = dict(db.session.query(StockShard.shard, StockShard.quantity).filter_by(miner_id=miner_id).all())
+
+        candidates = [shard for shard, level in levels.items() if level >= quantity]
+        random.shuffle(candidates)
+        for shard in candidates:
+            if self._decrement_shard(miner_id, shard, quantity):
+                return shard
+
+        # No single shard covers the hold: gather it across shards in a fixed order
+        remaining = quantity
+        credit_shard = None
+        for shard in sorted(levels):
+            part = min(levels[shard], remaining)
+            if part > 0 and self._decrement_shard(miner_id, shard, part):
+                remaining -= part
+                credit_shard = shard if credit_shard is None else credit_shard
+            if remaining == 0:
+                return credit_shard
+        raise InsufficientStockError(miner_id, name)
+
+    @staticmethod
+    def _restore(credits):
+        """Give (miner_id, shard, quantity) units back to their shards, one UPDATE per shard"""
+        totals = {}
+        for miner_id, shard, quantity in credits:
+            totals[(miner_id, shard)] = totals.get((miner_id, shard), 0) + quantity
+        if not totals:
+            return
+        table = StockShard.__table__
+        db.session.execute(
+            table.update()
+            .where(table.c.miner_id == db.bindparam('b_miner_id'), table.c.shard == db.bindparam('b_shard'))
+            .values(quantity=table.c.quantity + db.bindparam('b_quantity')),
+            [
+                {'b_miner_id': miner_id, 'b_shard': shard, 'b_quantity': quantity}
+                for (miner_id, shard), quantity in sorted(totals.items())
+            ]
+        )
+
+    # ==================== Holds ====================
+
+    def hold(self, user_id, miner_id, quantity, ttl=None):
+        """Reserve quantity units of a miner for a user until the hold expires"""
+        limit = current_app.config.get('RESERVATION_MAX_QUANTITY', 100)
+        if quantity <= 0 or quantity > limit:
+            raise ValueError(f'Quantity must be between 1 and {limit}')
+        miner = db.session.query(ASICMiner.name, ASICMiner.is_available).filter_by(id=miner_id).first()
+        if miner is None or not miner.is_available:
+            raise ValueError('Miner not available')
+        if ttl is None:
+            ttl = current_app.config.get('RESERVATION_TTL', 900)
+
+        try:
+            shard = self.take(miner_id, quantity, miner.name)
+            reservation = StockReservation(
+                miner_id=miner_id,
+                user_id=user_id,
+                shard=shard,
+                quantity=quantity,
+                status='held',
+                expires_at=datetime.utcnow() + timedelta(seconds=ttl)
+            )
+            db.session.add(reservation)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return reservation
+
+    @staticmethod
+    def _close(*criteria, status, order_id=None):
+        """Move matching held reservations to status; returns the rows that actually moved"""
+        values = {'status': status}
+        if order_id is not None:
+            values['order_id'] = order_id
+        return db.session.execute(
+            db.update(StockReservation)
+            .where(StockReservation.status == 'held', *criteria)
+            .values(**values)
+            .returning(StockReservation.miner_id, StockReservation.shard, StockReservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+
+    def release(self, reservation_id, user_id):
+        """Cancel a user's hold and return its units; False if it is no longer held"""
+        try:
+            released = self._close(
+                StockReservation.id == reservation_id, StockReservation.user_id == user_id, status='released'
+            )
+            self._restore(released)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return bool(released)
+
+    def convert(self, user_id, quantities, order_id):
+        """Turn the user's holds on the cart miners into order order_id, inside the caller's transaction
+
+        Holds cover as much of each cart line as they can; a shortfall is taken
+        from unreserved stock and a surplus goes back to its shard. Raises
+        InsufficientStockError when a shortfall cannot be covered.
+        """
+        converted = self._close(
+            StockReservation.user_id == user_id,
+            StockReservation.miner_id.in_(list(quantities)),
+            status='converted',
+            order_id=order_id
+        )
+        held = {}
+        for row in converted:
+            held.setdefault(row.miner_id, []).append(row)
+
+        # Miner order keeps shard locks in the same sequence across concurrent checkouts
+        for miner_id in sorted(quantities):
+            rows = held.get(miner_id, [])
+            covered = sum(row.quantity for row in rows)
+            wanted = quantities[miner_id]
+            if covered < wanted:
+                self.take(miner_id, wanted - covered)
+            elif covered > wanted:
+                self._restore([(miner_id, rows[0].shard, covered - wanted)])
+        return len(converted)
+
+    def expire_holds(self, now=None, batch_size=None):
+        """Expire overdue holds in batches and return their units; returns the number expired"""
+        now = now or datetime.utcnow()
+        batch_size = batch_size or current_app.config.get('RESERVATION_SWEEP_BATCH', 500)
+
+        total = 0
+        while True:
+            overdue = (
+                db.select(StockReservation.id)
+                .where(StockReservation.status == 'held', StockReservation.expires_at <= now)
+                .order_by(StockReservation.expires_at)
+                .limit(batch_size)
+            )
+            expired = self._close(StockReservation.id.in_(overdue), status='expired')
+            self._restore(expired)
+            db.session.commit()
+            total += len(expired)
+            if len(expired) < batch_size:
+                break
+
+        self.refresh_reserved()
+        db.session.commit()
+        if total:
+            logger.info(f"Expired {total} stock reservations")
+        return total
+
+    @staticmethod
+    def refresh_reserved():
+        """Set Inventory.reserved_quantity to the units currently held"""
+        held = (
+            db.select(db.func.coalesce(db.func.sum(StockReservation.quantity), 0))
+            .where(StockReservation.miner_id == Inventory.miner_id, StockReservation.status == 'held')
+            .scalar_subquery()
+        )
+        db.session.execute(
+            db.update(Inventory)
+            .where(db.func.coalesce(Inventory.reserved_quantity, -1) != held)
+            .values(reserved_quantity=held)
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def active_holds(user_id):
+        """The user's unexpired holds, soonest expiry first"""
+        return (
+            StockReservation.query
+            .filter(
+                StockReservation.user_id == user_id,
+                StockReservation.status == 'held',
+                StockReservation.expires_at > datetime.utcnow()
+            )
+            .order_by(StockReservation.expires_at)
+            .all()
+        )
+
+reservations = ReservationService()
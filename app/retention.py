@@ -0,0 +1,316 @@
+"""
+Bulk write path and retention compaction for profitability history
+
+Raw ProfitabilityData rows older than PROFITABILITY_RAW_RETENTION_DAYS are
+downsampled into hourly ProfitabilityRollup rows, and hourly rollups older than
+PROFITABILITY_HOURLY_RETENTION_DAYS into daily rollups. Daily rollups are kept.
+The LatestProfitability snapshot is upserted alongside every batch of inserts.
+"""
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models import db, dialect_insert, ProfitabilityData, ProfitabilityRollup, LatestProfitability
+
+logger = logging.getLogger(__name__)
+
+LATEST_FIELDS = [
+    'daily_profit_usd', 'monthly_profit_usd', 'yearly_profit_usd', 'electricity_cost',
+    'net_profit_daily', 'roi_days', 'timestamp', 'data_source'
+]
+
+ROLLUP_FIELDS = [
+    'sample_count',
+    'daily_profit_min', 'daily_profit_avg', 'daily_profit_max',
+    'roi_days_min', 'roi_days_avg', 'roi_days_max',
+    'electricity_cost_avg'
+]
+
+class ProfitabilityStore:
+    """Batched writes and retention compaction for ProfitabilityData"""
+
+    HOURLY_WINDOW = timedelta(days=1)  # Raw rows compacted per transaction
+    DAILY_WINDOW = timedelta(days=30)  # Hourly rollups compacted per transaction
+
+    @staticmethod
+    def bulk_insert(rows, batch_size=None, update_latest=True):
+        """Insert profitability row dicts with executemany, committing per batch"""
+        if batch_size is None:
+            batch_size = current_app.config.get('PROFITABILITY_INSERT_BATCH_SIZE', 1000)
+
+        inserted = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                inserted += ProfitabilityStore._write_batch(batch, update_latest)
+                batch = []
+        if batch:
+            inserted += ProfitabilityStore._write_batch(batch, update_latest)
+        return inserted
+
+    @staticmethod
+    def _write_batch(batch, update_latest):
+        try:
+            db.session.execute(db.insert(ProfitabilityData), batch)
+            if update_latest:
+                ProfitabilityStore.upsert_latest(batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(batch)
+
+    @staticmethod
+    def upsert_latest(rows):
+        """Upsert LatestProfitability from rows, never replacing a newer snapshot"""
+        now = datetime.utcnow()
+        newest = {}
+        for row in rows:
+            snapshot = {field: row.get(field) for field in LATEST_FIELDS}
+            snapshot['miner_id'] = row['miner_id']
+            if snapshot['timestamp'] is None:
+                snapshot['timestamp'] = now
+            if snapshot['data_source'] is None:
+                snapshot['data_source'] = 'internal'
+            current = newest.get(row['miner_id'])
+            if current is None or snapshot['timestamp'] >= current['timestamp']:
+                newest[row['miner_id']] = snapshot
+        if not newest:
+            return 0
+
+        stmt = dialect_insert(LatestProfitability)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[LatestProfitability.miner_id],
+            set_={field: stmt.excluded[field] for field in LATEST_FIELDS},
+            where=LatestProfitability.timestamp <= stmt.excluded.timestamp
+        )
+        db.session.execute(stmt, list(newest.values()))
+        return len(newest)
+
+    @staticmethod
+    def rebuild_latest():
+        """Rebuild LatestProfitability from the newest ProfitabilityData row per miner"""
+        newest = (
+            db.select(
+                ProfitabilityData.miner_id,
+                db.func.max(ProfitabilityData.timestamp).label('timestamp')
+            )
+            .group_by(ProfitabilityData.miner_id)
+            .subquery()
+        )
+        rows = (
+            db.session.query(ProfitabilityData)
+            .join(newest, db.and_(
+                ProfitabilityData.miner_id == newest.c.miner_id,
+                ProfitabilityData.timestamp == newest.c.timestamp
+            ))
+            .all()
+        )
+        try:
+            db.session.execute(db.delete(LatestProfitability))
+            count = ProfitabilityStore.upsert_latest([
+                dict({field: getattr(r, field) for field in LATEST_FIELDS}, miner_id=r.miner_id)
+                for r in rows
+            ])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return count
+
+    @staticmethod
+    def compact(now=None, raw_retention_days=None, hourly_retention_days=None):
+        """Downsample old raw rows into hourly rollups and old hourly rollups into daily ones"""
+        if now is None:
+            now = datetime.utcnow()
+        if raw_retention_days is None:
+            raw_retention_days = current_app.config.get('PROFITABILITY_RAW_RETENTION_DAYS', 7)
+        if hourly_retention_days is None:
+            hourly_retention_days = current_app.config.get('PROFITABILITY_HOURLY_RETENTION_DAYS', 90)
+
+        store = ProfitabilityStore
+        raw_cutoff = store._truncate(now - timedelta(days=raw_retention_days), 'hour')
+        hourly_cutoff = store._truncate(now - timedelta(days=hourly_retention_days), 'day')
+
+        raw_compacted, hourly_written = store._compact_resolution(
+            'hour', raw_cutoff, store.HOURLY_WINDOW,
+            ProfitabilityData.timestamp, store._raw_aggregate, store._delete_raw
+        )
+        hourly_compacted, daily_written = store._compact_resolution(
+            'day', hourly_cutoff, store.DAILY_WINDOW,
+            ProfitabilityRollup.bucket_start, store._hourly_aggregate, store._delete_hourly
+        )
+
+        stats = {
+            'raw_rows_compacted': raw_compacted,
+            'hourly_rollups_written': hourly_written,
+            'hourly_rollups_compacted': hourly_compacted,
+            'daily_rollups_written': daily_written
+        }
+        logger.info(f"Profitability compaction finished: {stats}")
+        return stats
+
+    @staticmethod
+    def _compact_resolution(resolution, cutoff, window, source_time, aggregate, delete_source):
+        """Roll source rows older than cutoff into rollups, one window per transaction"""
+        source_filter = source_time < cutoff
+        if resolution == 'day':
+            source_filter = db.and_(source_filter, ProfitabilityRollup.resolution == 'hour')
+        oldest = db.session.query(db.func.min(source_time)).filter(source_filter).scalar()
+        if oldest is None:
+            return 0, 0
+
+        compacted = written = 0
+        start = ProfitabilityStore._truncate(oldest, resolution)
+        while start < cutoff:
+            end = min(start + window, cutoff)
+            try:
+                rows = db.session.execute(aggregate(resolution, start, end)).mappings().all()
+                if rows:
+                    written += ProfitabilityStore._merge_rollups(resolution, start, end, rows)
+                    compacted += delete_source(start, end)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Error compacting profitability data into {resolution} rollups: {e}")
+                db.session.rollback()
+                raise
+            start = end
+        return compacted, written
+
+    @staticmethod
+    def _merge_rollups(resolution, start, end, rows):
+        """Insert new rollup buckets and fold late data into existing ones"""
+        existing = {
+            (r.miner_id, r.bucket_start): r
+            for r in ProfitabilityRollup.query.filter(
+                ProfitabilityRollup.resolution == resolution,
+                ProfitabilityRollup.bucket_start >= start,
+                ProfitabilityRollup.bucket_start < end
+            )
+        }
+
+        inserts = []
+        updates = []
+        for row in rows:
+            current = existing.get((row['miner_id'], row['bucket_start']))
+            if current is None:
+                inserts.append(dict(row, resolution=resolution))
+            else:
+                merged = ProfitabilityStore._combine(
+                    {field: getattr(current, field) for field in ROLLUP_FIELDS}, row
+                )
+                merged['id'] = current.id
+                updates.append(merged)
+
+        if inserts:
+            db.session.execute(db.insert(ProfitabilityRollup), inserts)
+        if updates:
+            db.session.execute(db.update(ProfitabilityRollup), updates)
+        return len(inserts)
+
+    @staticmethod
+    def _combine(a, b):
+        """Merge two rollup aggregates for the same bucket"""
+        n_a, n_b = a['sample_count'], b['sample_count']
+        total = n_a + n_b
+
+        def weighted(field):
+            return (a[field] * n_a + b[field] * n_b) / total
+
+        return {
+            'sample_count': total,
+            'daily_profit_min': min(a['daily_profit_min'], b['daily_profit_min']),
+            'daily_profit_avg': weighted('daily_profit_avg'),
+            'daily_profit_max': max(a['daily_profit_max'], b['daily_profit_max']),
+            'roi_days_min': min(a['roi_days_min'], b['roi_days_min']),
+            'roi_days_avg': weighted('roi_days_avg'),
+            'roi_days_max': max(a['roi_days_max'], b['roi_days_max']),
+            'electricity_cost_avg': weighted('electricity_cost_avg')
+        }
+
+    @staticmethod
+    def _raw_aggregate(resolution, start, end):
+        """Aggregate raw ProfitabilityData rows into buckets"""
+        bucket = ProfitabilityStore._bucket(ProfitabilityData.timestamp, resolution)
+        return (
+            db.select(
+                ProfitabilityData.miner_id,
+                bucket.label('bucket_start'),
+                db.func.count().label('sample_count'),
+                db.func.min(ProfitabilityData.daily_profit_usd).label('daily_profit_min'),
+                db.func.avg(ProfitabilityData.daily_profit_usd).label('daily_profit_avg'),
+                db.func.max(ProfitabilityData.daily_profit_usd).label('daily_profit_max'),
+                db.func.min(ProfitabilityData.roi_days).label('roi_days_min'),
+                db.func.avg(ProfitabilityData.roi_days).label('roi_days_avg'),
+                db.func.max(ProfitabilityData.roi_days).label('roi_days_max'),
+                db.func.avg(ProfitabilityData.electricity_cost).label('electricity_cost_avg')
+            )
+            .where(ProfitabilityData.timestamp >= start, ProfitabilityData.timestamp < end)
+            .group_by(ProfitabilityData.miner_id, bucket)
+        )
+
+    @staticmethod
+    def _hourly_aggregate(resolution, start, end):
+        """Aggregate hourly rollups into buckets, weighting averages by sample count"""
+        rollup = ProfitabilityRollup
+        bucket = ProfitabilityStore._bucket(rollup.bucket_start, resolution)
+        samples = db.func.sum(rollup.sample_count)
+        return (
+            db.select(
+                rollup.miner_id,
+                bucket.label('bucket_start'),
+                samples.label('sample_count'),
+                db.func.min(rollup.daily_profit_min).label('daily_profit_min'),
+                (db.func.sum(rollup.daily_profit_avg * rollup.sample_count) / samples).label('daily_profit_avg'),
+                db.func.max(rollup.daily_profit_max).label('daily_profit_max'),
+                db.func.min(rollup.roi_days_min).label('roi_days_min'),
+                (db.func.sum(rollup.roi_days_avg * rollup.sample_count) / samples).label('roi_days_avg'),
+                db.func.max(rollup.roi_days_max).label('roi_days_max'),
+                (db.func.sum(rollup.electricity_cost_avg * rollup.sample_count) / samples).label('electricity_cost_avg')
+            )
+            .where(rollup.resolution == 'hour', rollup.bucket_start >= start, rollup.bucket_start < end)
+            .group_by(rollup.miner_id, bucket)
+        )
+
+    @staticmethod
+    def _delete_raw(start, end):
+        result = db.session.execute(
+            db.delete(ProfitabilityData)
+            .where(ProfitabilityData.timestamp >= start, ProfitabilityData.timestamp < end)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    @staticmethod
+    def _delete_hourly(start, end):
+        result = db.session.execute(
+            db.delete(ProfitabilityRollup)
+            .where(
+                ProfitabilityRollup.resolution == 'hour',
+                ProfitabilityRollup.bucket_start >= start,
+                ProfitabilityRollup.bucket_start < end
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    @staticmethod
+    def _bucket(column, resolution):
+        """SQL expression truncating a timestamp column to its bucket start"""
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            expr = db.func.date_trunc(resolution, column)
+        elif dialect == 'sqlite':
+            # Match SQLAlchemy's SQLite DateTime storage format so comparisons stay lexical
+            fmt = '%Y-%m-%d %H:00:00.000000' if resolution == 'hour' else '%Y-%m-%d 00:00:00.000000'
+            expr = db.func.strftime(fmt, column)
+        else:
+            raise NotImplementedError(f"Profitability compaction is not supported on {dialect}")
+        return db.type_coerce(expr, db.DateTime)
+
+    @staticmethod
+    def _truncate(moment, resolution):
+        """Truncate a datetime to the start of its hour or day"""
+        if resolution == 'hour':
+            return moment.replace(minute=0, second=0, microsecond=0)
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
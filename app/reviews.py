@@ -0,0 +1,76 @@
+"""
+Review aggregates and keyset-paginated review listing
+
+ASICMiner.rating_count, rating_sum and the per-star counts are kept current
+by the Review mapper events in app.models. ReviewService.rebuild_stats
+recomputes them from scratch, e.g. after bulk loads that bypass the ORM.
+"""
+import logging
+from app.models import db, ASICMiner, Review
+from app.pagination import keyset_paginate
+
+logger = logging.getLogger(__name__)
+
+class ReviewService:
+    """Review aggregate maintenance and paginated review queries"""
+
+    DEFAULT_PAGE_SIZE = 10
+    MAX_PAGE_SIZE = 50
+
+    @staticmethod
+    def rebuild_stats():
+        """Recompute every miner's rating aggregates from the review table"""
+        rows = (
+            db.session.query(Review.miner_id, Review.rating, db.func.count(Review.id))
+            .group_by(Review.miner_id, Review.rating)
+            .all()
+        )
+
+        stats = {}
+        for miner_id, rating, count in rows:
+            entry = stats.setdefault(miner_id, {
+                'id': miner_id, 'rating_count': 0, 'rating_sum': 0,
+                'rating_1_count': 0, 'rating_2_count': 0, 'rating_3_count': 0,
+                'rating_4_count': 0, 'rating_5_count': 0
+            })
+            entry['rating_count'] += count
+            entry['rating_sum'] += rating * count
+            if rating in (1, 2, 3, 4, 5):
+                entry[f'rating_{rating}_count'] += count
+
+        try:
+            db.session.execute(
+                db.update(ASICMiner.__table__).values(
+                    rating_count=0, rating_sum=0, rating_1_count=0, rating_2_count=0,
+                    rating_3_count=0, rating_4_count=0, rating_5_count=0
+                )
+            )
+            if stats:
+                db.session.execute(db.update(ASICMiner), list(stats.values()))
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error rebuilding review stats: {e}")
+            db.session.rollback()
+            raise
+        return len(stats)
+
+    @staticmethod
+    def get_page(miner_id, cursor=None, limit=None):
+        """Return one page of reviews (newest first) and the cursor for the next page"""
+        if limit is None:
+            limit = ReviewService.DEFAULT_PAGE_SIZE
+        limit = min(limit, ReviewService.MAX_PAGE_SIZE)
+
+        query = (
+            Review.query
+            .options(db.joinedload(Review.author))
+            .filter(Review.miner_id == miner_id)
+        )
+        page = keyset_paginate(
+            query,
+            [(Review.created_at, True), (Review.id, True)],
+            cursor=cursor,
+            per_page=limit,
+            with_total=False
+        )
+        return page.items, page.next_cursor
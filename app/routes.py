@@ -1,15 +1,33 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, current_app, Response, abort
 from flask_login import login_required, current_user, login_user, logout_user
 from werkzeug.security import check_password_hash, generate_password_hash
-from datetime import datetime
-import random
-import string
+from datetime import datetime, timedelta
+import io
+import math
+import numpy as np
 
 from app.models import (
-    db, User, ASICMiner, Order, OrderItem, Shipping, Review, 
-    ProfitabilityData, MiningAnalytics, Inventory, PriceAlert
+    db, User, ASICMiner, Order, OrderItem, Review, user_favorites,
+    ProfitabilityData, LatestProfitability, MiningAnalytics, Inventory, PriceAlert
 )
-from app.services import ProfitabilityCalculator, CryptoPriceAPI
+from app.services import ProfitabilityCalculator, BatchProfitabilityEngine, CryptoPriceAPI, price_cache
+from app.coins import coin_registry
+from app.simulation import RoiSimulator
+from app.prices import PriceHistory
+from app.stream import broadcaster, StreamFull
+from app.reviews import ReviewService
+from app.inventory import InventoryService, InsufficientStockError
+from app.alerts import PriceAlertEngine
+from app.reservations import reservations
+from app.ids import new_order_number
+from app.scheduler import scheduler
+from app.tasks import enqueue, get_stats as get_task_stats
+from app.search import catalog_search
+from app.catalog import catalog_index, PRICE_RANGES
+from app.exports import Exporter
+from app.imports import CatalogImporter
+from app.pagination import keyset_paginate, clamp_per_page, count_cache
+from app.cache import response_cache, bump_version
 
 # Create blueprints
 main_bp = Blueprint('main', __name__)
@@ -19,16 +37,129 @@ dashboard_bp = Blueprint('dashboard', __name__, url_prefix='/dashboard')
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+def _miner_sort(sort_by, rank=None):
+    """Keyset sort for a listing sort mode; every mode ends with the primary key"""
+    if sort_by == 'price_low':
+        return [(ASICMiner.price_usd, False), (ASICMiner.id, False)]
+    if sort_by == 'price_high':
+        return [(ASICMiner.price_usd, True), (ASICMiner.id, True)]
+    if sort_by == 'profitability':
+        # Unscored miners rank as 0, as in the catalog snapshot; a NULL key would break the seek
+        return [(db.func.coalesce(ASICMiner.profitability_score, 0.0), True), (ASICMiner.id, True)]
+    if sort_by == 'relevance' and rank is not None:
+        return [(rank, False), (ASICMiner.id, True)]
+    return [(ASICMiner.created_at, True), (ASICMiner.id, True)]
+
+def _keyset_page(query, sort, per_page=None, with_total=True):
+    """keyset_paginate with the request's cursor, restarting at page one if it is invalid"""
+    try:
+        return keyset_paginate(query, sort, request.args.get('cursor'), per_page, with_total)
+    except ValueError:
+        return keyset_paginate(query, sort, None, per_page, with_total)
+
+def _snapshot_page(snapshot, mask, sort_by, per_page=None, with_total=True):
+    """Catalog snapshot page with the request's cursor, restarting at page one if it is invalid"""
+    try:
+        return snapshot.page(mask, sort_by, request.args.get('cursor'), per_page, with_total)
+    except ValueError:
+        return snapshot.page(mask, sort_by, None, per_page, with_total)
+
+def _listing_filters():
+    """Marketplace filter values from the query args, as CatalogSnapshot.mask() takes them"""
+    price_range = request.args.get('price_range', '')
+    return {
+        'algorithm': request.args.get('algorithm', ''),
+        'manufacturer': request.args.get('manufacturer', ''),
+        'min_price': request.args.get('min_price', '', type=float),
+        'max_price': request.args.get('max_price', '', type=float),
+        'release_year': request.args.get('release_year', None, type=int),
+        'price_range': price_range if price_range in PRICE_RANGES else ''
+    }
+
+def _search_mask(snapshot, query):
+    """Snapshot rows matched by a catalog search query"""
+    matched = [miner_id for (miner_id,) in query.order_by(None).with_entities(ASICMiner.id)]
+    return np.isin(snapshot.id, np.array(matched, dtype=np.int64))
+
+def _grid_axis(name, default_min, default_max, default_steps):
+    """Evenly spaced values from the <name>_min, <name>_max and <name>_steps query args; raises ValueError"""
+    low = request.args.get(f'{name}_min', default_min, type=float)
+    high = request.args.get(f'{name}_max', default_max, type=float)
+    steps = request.args.get(f'{name}_steps', default_steps, type=int)
+    max_steps = current_app.config.get('PROFITABILITY_GRID_MAX_STEPS', 101)
+    if not (math.isfinite(low) and math.isfinite(high)) or low < 0 or high < low:
+        raise ValueError(f'{name} range must be finite and satisfy 0 <= min <= max')
+    if not 1 <= steps <= max_steps:
+        raise ValueError(f'{name}_steps must be between 1 and {max_steps}')
+    return np.round(np.linspace(low, high, steps), 6)
+
+def _json_array(values, decimals=2):
+    """Rounded nested list with infinities (e.g. ROI of an unprofitable scenario) as null"""
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, decimals).astype(object)
+    rounded[~np.isfinite(values)] = None
+    return rounded.tolist()
+
+def _time_range(default_days):
+    """(start, end) UTC datetimes from ISO start/end query args, ending now by default; raises ValueError"""
+    end = request.args.get('end')
+    end = datetime.fromisoformat(end) if end else datetime.utcnow()
+    start = request.args.get('start')
+    start = datetime.fromisoformat(start) if start else end - timedelta(days=default_days)
+    if start.tzinfo is not None or end.tzinfo is not None:
+        raise ValueError('start and end must be UTC timestamps without an offset')
+    if start >= end:
+        raise ValueError('start must be before end')
+    return start, end
+
+def _optional_time(name):
+    """UTC datetime from an optional ISO query arg; raises ValueError"""
+    value = request.args.get(name)
+    if not value:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is not None:
+        raise ValueError(f'{name} must be a UTC timestamp without an offset')
+    return moment
+
+def _export_response(name, query):
+    """Streaming export in the requested format (ndjson or csv), gzipped with gzip=1"""
+    return Exporter.response(
+        name, query,
+        fmt=request.args.get('format', 'ndjson'),
+        compress=request.args.get('gzip', 'false').lower() in ('1', 'true', 'yes')
+    )
+
+def _alert_dict(alert):
+    """JSON view of a PriceAlert"""
+    return {
+        'id': alert.id,
+        'miner_id': alert.miner_id,
+        'target_price': alert.target_price,
+        'alert_type': alert.alert_type,
+        'is_active': alert.is_active,
+        'triggered': alert.triggered,
+        'triggered_at': alert.triggered_at.isoformat() if alert.triggered_at else None
+    }
+
 # ==================== MAIN ROUTES ====================
 @main_bp.route('/')
+@response_cache.cached('catalog')
 def index():
     """Homepage"""
-    featured_miners = ASICMiner.query.filter_by(is_available=True).limit(6).all()
+    featured_miners = (
+        ASICMiner.query
+        .options(db.joinedload(ASICMiner.latest_profitability))
+        .filter_by(is_available=True)
+        .limit(6)
+        .all()
+    )
     top_profitable = (
         db.session.query(ASICMiner)
-        .join(ProfitabilityData)
+        .join(ASICMiner.latest_profitability)
+        .options(db.contains_eager(ASICMiner.latest_profitability))
         .filter(ASICMiner.is_available == True)
-        .order_by(ProfitabilityData.daily_profit_usd.desc())
+        .order_by(LatestProfitability.daily_profit_usd.desc())
         .limit(4)
         .all()
     )
@@ -125,58 +256,58 @@ def logout():
 
 # ==================== MARKETPLACE ROUTES ====================
 @marketplace_bp.route('/')
+@response_cache.cached('catalog')
 def browse():
     """Browse miners marketplace"""
-    page = request.args.get('page', 1, type=int)
-    
-    # Get filters
-    algorithm = request.args.get('algorithm', '')
-    manufacturer = request.args.get('manufacturer', '')
-    min_price = request.args.get('min_price', '', type=float)
-    max_price = request.args.get('max_price', '', type=float)
-    sort_by = request.args.get('sort', 'newest')
-    
-    query = ASICMiner.query.filter_by(is_available=True)
-    
-    if algorithm:
-        query = query.filter(ASICMiner.algorithm.ilike(f'%{algorithm}%'))
-    if manufacturer:
-        query = query.filter(ASICMiner.manufacturer.ilike(f'%{manufacturer}%'))
-    if min_price:
-        query = query.filter(ASICMiner.price_usd >= min_price)
-    if max_price:
-        query = query.filter(ASICMiner.price_usd <= max_price)
-    
-    # Sorting
-    if sort_by == 'price_low':
-        query = query.order_by(ASICMiner.price_usd.asc())
-    elif sort_by == 'price_high':
-        query = query.order_by(ASICMiner.price_usd.desc())
-    elif sort_by == 'profitability':
-        query = query.order_by(ASICMiner.profitability_score.desc())
-    else:
-        query = query.order_by(ASICMiner.created_at.desc())
+    q = request.args.get('q', '').strip()
+    filters = _listing_filters()
+    sort_by = request.args.get('sort', 'relevance' if q else 'newest')
+    per_page = current_app.config['ITEMS_PER_PAGE']
+    snapshot = catalog_index.snapshot()
     
-    miners = query.paginate(page=page, per_page=12)
-    
-    algorithms = db.session.query(ASICMiner.algorithm).distinct().all()
-    manufacturers = db.session.query(ASICMiner.manufacturer).distinct().all()
+    if not q and catalog_index.enabled:
+        # Listing without search is served from the in-memory snapshot
+        miners = _snapshot_page(snapshot, snapshot.mask(**filters), sort_by, per_page=per_page)
+        facets = snapshot.facets(filters)
+    else:
+        query = (
+            ASICMiner.query
+            .options(db.joinedload(ASICMiner.latest_profitability))
+            .filter_by(is_available=True)
+        )
+        query, rank = catalog_search.search(query, q)
+        # Facets count only search matches
+        facets = snapshot.facets(filters, base=_search_mask(snapshot, query) if q else None)
+        
+        # Facet values come from the filter dropdowns, so match exactly (index-friendly)
+        if filters['algorithm']:
+            query = query.filter(ASICMiner.algorithm == filters['algorithm'])
+        if filters['manufacturer']:
+            query = query.filter(ASICMiner.manufacturer == filters['manufacturer'])
+        if filters['release_year']:
+            query = query.filter(ASICMiner.release_year == filters['release_year'])
+        if filters['min_price']:
+            query = query.filter(ASICMiner.price_usd >= filters['min_price'])
+        if filters['max_price']:
+            query = query.filter(ASICMiner.price_usd <= filters['max_price'])
+        if filters['price_range']:
+            _, low, high = PRICE_RANGES[filters['price_range']]
+            query = query.filter(ASICMiner.price_usd >= low, ASICMiner.price_usd < high)
+        
+        miners = _keyset_page(query, _miner_sort(sort_by, rank), per_page=per_page)
     
-    return render_template(
-        'marketplace/browse.html',
-        miners=miners,
-        algorithms=[a[0] for a in algorithms],
-        manufacturers=[m[0] for m in manufacturers]
-    )
+    return render_template('marketplace/browse.html', miners=miners, facets=facets)
 
 @marketplace_bp.route('/miner/<int:miner_id>')
+@response_cache.cached('catalog')
 def miner_detail(miner_id):
     """Miner detail page"""
     miner = ASICMiner.query.get_or_404(miner_id)
     profitability = miner.get_latest_profitability()
-    reviews = Review.query.filter_by(miner_id=miner_id).order_by(Review.created_at.desc()).all()
+    reviews, next_review_cursor = ReviewService.get_page(miner_id)
     related_miners = (
         ASICMiner.query
+        .options(db.joinedload(ASICMiner.latest_profitability))
         .filter(ASICMiner.algorithm == miner.algorithm)
         .filter(ASICMiner.id != miner_id)
         .filter_by(is_available=True)
@@ -189,6 +320,7 @@ def miner_detail(miner_id):
         miner=miner,
         profitability=profitability,
         reviews=reviews,
+        next_review_cursor=next_review_cursor,
         related_miners=related_miners
     )
 
@@ -218,10 +350,11 @@ def overview():
 @login_required
 def my_orders():
     """View user orders"""
-    page = request.args.get('page', 1, type=int)
-    orders = Order.query.filter_by(user_id=current_user.id).order_by(
-        Order.created_at.desc()
-    ).paginate(page=page, per_page=10)
+    orders = _keyset_page(
+        Order.query.filter_by(user_id=current_user.id),
+        [(Order.created_at, True), (Order.id, True)],
+        per_page=10
+    )
     
     return render_template('dashboard/orders.html', orders=orders)
 
@@ -230,7 +363,9 @@ def my_orders():
 def profitability_calculator():
     """Profitability calculator"""
     miners = ASICMiner.query.filter_by(is_available=True).all()
-    return render_template('dashboard/calculator.html', miners=miners)
+    # Registry algorithm names, which the live stream topics and events use
+    algorithms = {miner.algorithm: coin_registry.resolve(miner.algorithm) for miner in miners}
+    return render_template('dashboard/calculator.html', miners=miners, algorithms=algorithms)
 
 @dashboard_bp.route('/profile')
 @login_required
@@ -254,8 +389,12 @@ def edit_profile():
 @login_required
 def favorites():
     """User favorite miners"""
-    page = request.args.get('page', 1, type=int)
-    favorites = current_user.favorites.paginate(page=page, per_page=12)
+    query = (
+        ASICMiner.query
+        .join(user_favorites, user_favorites.c.miner_id == ASICMiner.id)
+        .filter(user_favorites.c.user_id == current_user.id)
+    )
+    favorites = _keyset_page(query, [(ASICMiner.id, True)], per_page=12)
     return render_template('dashboard/favorites.html', favorites=favorites)
 
 # ==================== ADMIN ROUTES ====================
@@ -288,8 +427,7 @@ def manage_miners():
         flash('You do not have permission to access this page', 'error')
         return redirect(url_for('main.index'))
     
-    page = request.args.get('page', 1, type=int)
-    miners = ASICMiner.query.paginate(page=page, per_page=20)
+    miners = _keyset_page(ASICMiner.query, [(ASICMiner.id, False)], per_page=20)
     return render_template('admin/miners.html', miners=miners)
 
 @admin_bp.route('/miners/add', methods=['GET', 'POST'])
@@ -323,26 +461,126 @@ def add_miner():
         )
         db.session.add(inventory)
         db.session.commit()
+        bump_version('catalog')
         
         flash('Miner added successfully', 'success')
         return redirect(url_for('admin.manage_miners'))
     
     return render_template('admin/add_miner.html')
 
+@admin_bp.route('/miners/import', methods=['GET', 'POST'])
+@login_required
+def import_miners():
+    """Bulk import miners from a CSV or JSON price list"""
+    if not current_user.is_admin:
+        flash('You do not have permission to access this page', 'error')
+        return redirect(url_for('main.index'))
+    
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash('Choose a CSV or JSON file to import', 'error')
+            return redirect(url_for('admin.import_miners'))
+        fmt = request.form.get('format') or ('json' if upload.filename.lower().endswith(('.json', '.ndjson')) else 'csv')
+        try:
+            # Decoded as it is read so the upload is never held in memory whole
+            stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+            report = CatalogImporter(dry_run=bool(request.form.get('dry_run'))).run(stream, fmt)
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Import failed: {e}', 'error')
+            return redirect(url_for('admin.import_miners'))
+        flash(f"{'Checked' if report['dry_run'] else 'Imported'} {report['rows']} rows: {report['inserted']} new, "
+              f"{report['updated']} updated, {report['invalid'] + report['failed']} skipped",
+              'warning' if report['errors'] else 'success')
+    
+    return render_template('admin/import_miners.html', report=report)
+
 # ==================== API ROUTES ====================
 @api_bp.route('/miners')
+@response_cache.cached('catalog')
 def api_miners():
-    """API endpoint for miners"""
-    page = request.args.get('page', 1, type=int)
-    per_page = request.args.get('per_page', 12, type=int)
-    
-    query = ASICMiner.query.filter_by(is_available=True)
-    
+    """API endpoint for miners
+
+    Pass cursor= (empty for the first page) to use keyset pagination;
+    page= keeps the legacy OFFSET mode. per_page is capped at MAX_ITEMS_PER_PAGE.
+    """
+    per_page = clamp_per_page(request.args.get('per_page', 12, type=int))
+    q = request.args.get('q', '')
     algorithm = request.args.get('algorithm')
-    if algorithm:
-        query = query.filter(ASICMiner.algorithm.ilike(f'%{algorithm}%'))
+    manufacturer = request.args.get('manufacturer')
     
-    miners_page = query.paginate(page=page, per_page=per_page)
+    if not q and catalog_index.enabled:
+        # Listing without search is served from the in-memory snapshot
+        snapshot = catalog_index.snapshot()
+        mask = snapshot.mask(algorithm, manufacturer)
+        sort_by = request.args.get('sort', 'newest')
+        if 'cursor' in request.args:
+            try:
+                miners_page = snapshot.page(
+                    mask, sort_by,
+                    cursor=request.args.get('cursor'),
+                    per_page=per_page,
+                    with_total=request.args.get('total', 'true') != 'false'
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+            items = miners_page.items
+            pagination = {
+                'per_page': miners_page.per_page,
+                'total': miners_page.total,
+                'next_cursor': miners_page.next_cursor,
+                'prev_cursor': miners_page.prev_cursor
+            }
+        else:
+            page = request.args.get('page', 1, type=int)
+            items, total = snapshot.offset_page(mask, sort_by, page=page, per_page=per_page)
+            if page < 1 or (not items and page != 1):
+                abort(404)  # Same as paginate() on the SQL path
+            pagination = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': -(-total // per_page)
+            }
+    else:
+        query = ASICMiner.query.filter_by(is_available=True)
+        query, rank = catalog_search.search(query, q)
+        
+        if algorithm:
+            query = query.filter(ASICMiner.algorithm == algorithm)
+        if manufacturer:
+            query = query.filter(ASICMiner.manufacturer == manufacturer)
+        sort = _miner_sort(request.args.get('sort', 'relevance' if rank is not None else 'newest'), rank)
+        
+        if 'cursor' in request.args:
+            try:
+                miners_page = keyset_paginate(
+                    query, sort,
+                    cursor=request.args.get('cursor'),
+                    per_page=per_page,
+                    with_total=request.args.get('total', 'true') != 'false'
+                )
+            except ValueError as e:
+                return jsonify({'success': False, 'message': str(e)}), 400
+            pagination = {
+                'per_page': miners_page.per_page,
+                'total': miners_page.total,
+                'next_cursor': miners_page.next_cursor,
+                'prev_cursor': miners_page.prev_cursor
+            }
+        else:
+            page = request.args.get('page', 1, type=int)
+            query = query.order_by(*[expr.desc() if descending else expr.asc() for expr, descending in sort])
+            miners_page = query.paginate(page=page, per_page=per_page)
+            pagination = {
+                'page': miners_page.page,
+                'per_page': miners_page.per_page,
+                'total': miners_page.total,
+                'pages': miners_page.pages
+            }
+        items = miners_page.items
     
     return jsonify({
         'success': True,
@@ -355,15 +593,22 @@ def api_miners():
             'algorithm': m.algorithm,
             'price_usd': m.price_usd,
             'profitability_score': m.profitability_score
-        } for m in miners_page.items],
-        'pagination': {
-            'page': miners_page.page,
-            'per_page': miners_page.per_page,
-            'total': miners_page.total,
-            'pages': miners_page.pages
-        }
+        } for m in items],
+        'pagination': pagination
     })
 
+@api_bp.route('/miners/facets')
+@response_cache.cached('catalog')
+def api_miner_facets():
+    """Available-miner counts per algorithm, manufacturer, release year and price range for the applied filters"""
+    q = request.args.get('q', '').strip()
+    snapshot = catalog_index.snapshot()
+    base = None
+    if q:
+        query, _ = catalog_search.search(ASICMiner.query.filter_by(is_available=True), q)
+        base = _search_mask(snapshot, query)
+    return jsonify({'success': True, 'data': snapshot.facets(_listing_filters(), base=base)})
+
 @api_bp.route('/miner/<int:miner_id>/profitability')
 def api_miner_profitability(miner_id):
     """Get miner profitability data"""
@@ -375,9 +620,143 @@ def api_miner_profitability(miner_id):
     profitability = ProfitabilityCalculator.calculate_miner_profitability(
         miner, electricity_cost, pool_fee
     )
+    if not np.isfinite(profitability['roi_days']):
+        profitability['roi_days'] = None  # Never pays back; Infinity is not valid JSON
     
     return jsonify({'success': True, 'data': profitability})
 
+@api_bp.route('/miner/<int:miner_id>/profitability/grid')
+def api_miner_profitability_grid(miner_id):
+    """Net profit and ROI across electricity cost, pool fee and coin price ranges in one response"""
+    miner = ASICMiner.query.get_or_404(miner_id)
+    engine = BatchProfitabilityEngine()
+    current_price = coin_registry.coefficient(miner.algorithm, coefficients=engine.coefficients).price
+    
+    try:
+        electricity_costs = _grid_axis('electricity_cost', 0.02, 0.20, 19)
+        pool_fees = _grid_axis('pool_fee', 0.0, 0.03, 4)
+        coin_prices = _grid_axis('coin_price', current_price * 0.5, current_price * 1.5, 21)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    cells = len(electricity_costs) * len(pool_fees) * len(coin_prices)
+    if cells > current_app.config.get('PROFITABILITY_GRID_MAX_CELLS', 50000):
+        return jsonify({'success': False, 'message': f'Grid too large ({cells} cells)'}), 400
+    
+    grid = engine.sensitivity_grid(miner, electricity_costs, pool_fees, coin_prices)
+    return jsonify({
+        'success': True,
+        'data': {
+            'miner_id': miner.id,
+            'coin_symbol': grid['coin_symbol'],
+            'current_coin_price': grid['current_coin_price'],
+            'electricity_cost': _json_array(grid['electricity_cost'], 6),
+            'pool_fee': _json_array(grid['pool_fee'], 6),
+            'coin_price': _json_array(grid['coin_price'], 6),
+            'daily_revenue': _json_array(grid['daily_revenue']),
+            'daily_net_profit': _json_array(grid['daily_net_profit']),
+            'roi_days': _json_array(grid['roi_days'], 0),
+            'break_even_electricity_cost': _json_array(grid['break_even_electricity_cost'], 4)
+        }
+    })
+
+@api_bp.route('/miner/<int:miner_id>/roi-simulation')
+def api_miner_roi_simulation(miner_id):
+    """Break-even day percentiles from Monte Carlo price, difficulty and halving paths
+
+    Anonymous callers are limited to the default path count and horizon.
+    """
+    miner = ASICMiner.query.get_or_404(miner_id)
+    overrides = {
+        name: request.args.get(name, type=float)
+        for name in ('price_drift', 'price_volatility', 'difficulty_growth', 'difficulty_volatility',
+                     'electricity_cost', 'pool_fee')
+    }
+    overrides['paths'] = request.args.get('paths', type=int)
+    overrides['horizon_days'] = request.args.get('horizon_days', type=int)
+    overrides['seed'] = request.args.get('seed', type=int)
+    if 'shutdown_when_unprofitable' in request.args:
+        overrides['shutdown_when_unprofitable'] = request.args['shutdown_when_unprofitable'].lower() in ('1', 'true', 'yes')
+    
+    limits = {}
+    if not current_user.is_authenticated:
+        limits = {
+            'max_paths': current_app.config.get('SIMULATION_ANONYMOUS_MAX_PATHS', 10000),
+            'max_horizon': current_app.config.get('SIMULATION_ANONYMOUS_MAX_HORIZON_DAYS', 1095)
+        }
+    try:
+        result, cached = RoiSimulator(processes=1, **limits).for_miner(miner, overrides)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({'success': True, 'data': result, 'cached': cached})
+
+@api_bp.route('/fleet/profitability', methods=['POST'])
+def api_fleet_profitability():
+    """Per-line and aggregate profitability for a fleet of miners, optionally saved to the user's analytics"""
+    data = request.get_json() or {}
+    try:
+        fleet = BatchProfitabilityEngine.normalize_fleet(
+            data.get('lines'), current_app.config.get('FLEET_MAX_LINES', 200)
+        )
+        electricity_cost = float(data.get('electricity_cost', current_app.config.get('DEFAULT_ELECTRICITY_COST', 0.12)))
+        pool_fee = float(data.get('pool_fee', current_app.config.get('DEFAULT_POOL_FEE', 0.01)))
+        if not (math.isfinite(electricity_cost) and electricity_cost >= 0) or not 0 <= pool_fee < 1:
+            raise ValueError('electricity_cost must be finite and not negative and pool_fee must be in [0, 1)')
+        result = BatchProfitabilityEngine(electricity_cost=electricity_cost, pool_fee=pool_fee).fleet(fleet)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    for values in result['lines'] + [result['totals']]:
+        if not np.isfinite(values['roi_days']):
+            values['roi_days'] = None  # Never pays back
+    
+    saved = 0
+    if data.get('save'):
+        if not current_user.is_authenticated:
+            return jsonify({'success': False, 'message': 'Login required to save analytics'}), 401
+        try:
+            saved = BatchProfitabilityEngine.record_analytics(current_user.id, result)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'message': str(e)}), 500
+    
+    return jsonify({'success': True, 'data': result, 'saved': saved})
+
+@api_bp.route('/miner/<int:miner_id>/reviews')
+def api_miner_reviews(miner_id):
+    """Keyset-paginated reviews for a miner, newest first"""
+    miner = ASICMiner.query.get_or_404(miner_id)
+    
+    try:
+        reviews, next_cursor = ReviewService.get_page(
+            miner_id,
+            cursor=request.args.get('cursor'),
+            limit=request.args.get('limit', ReviewService.DEFAULT_PAGE_SIZE, type=int)
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({
+        'success': True,
+        'data': [{
+            'id': r.id,
+            'rating': r.rating,
+            'title': r.title,
+            'content': r.content,
+            'author': r.author.username,
+            'verified_purchase': r.verified_purchase,
+            'created_at': r.created_at.isoformat()
+        } for r in reviews],
+        'summary': {
+            'count': miner.rating_count,
+            'average': miner.get_average_rating(),
+            'histogram': miner.get_rating_histogram()
+        },
+        'next_cursor': next_cursor
+    })
+
 @api_bp.route('/miner/<int:miner_id>/add-to-favorites', methods=['POST'])
 @login_required
 def api_add_favorite(miner_id):
@@ -406,6 +785,104 @@ def api_remove_favorite(miner_id):
     
     return jsonify({'success': True, 'message': 'Removed from favorites'})
 
+@api_bp.route('/miner/<int:miner_id>/alerts', methods=['POST'])
+@login_required
+def api_create_alert(miner_id):
+    """Alert the current user when a miner's price crosses a target"""
+    miner = ASICMiner.query.get_or_404(miner_id)
+    data = request.get_json() or {}
+    try:
+        target_price = float(data.get('target_price'))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid target price'}), 400
+    
+    try:
+        alert = PriceAlertEngine.create(current_user.id, miner, target_price, data.get('alert_type', 'drops_to'))
+        db.session.commit()
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Error creating price alert: {e}")
+        return jsonify({'success': False, 'message': 'Could not create alert'}), 500
+    
+    return jsonify({'success': True, 'alert': _alert_dict(alert)})
+
+@api_bp.route('/alerts')
+@login_required
+def api_alerts():
+    """Current user's price alerts, newest first"""
+    alerts = PriceAlert.query.filter_by(user_id=current_user.id).order_by(PriceAlert.created_at.desc()).limit(200).all()
+    return jsonify({'success': True, 'data': [_alert_dict(alert) for alert in alerts]})
+
+@api_bp.route('/alerts/<int:alert_id>/cancel', methods=['POST'])
+@login_required
+def api_cancel_alert(alert_id):
+    """Deactivate one of the current user's pending alerts"""
+    updated = PriceAlert.query.filter_by(id=alert_id, user_id=current_user.id, is_active=True).update(
+        {'is_active': False}, synchronize_session=False
+    )
+    db.session.commit()
+    if not updated:
+        return jsonify({'success': False, 'message': 'Alert not found or no longer active'}), 404
+    return jsonify({'success': True})
+
+@api_bp.route('/cart/hold', methods=['POST'])
+@login_required
+def api_cart_hold():
+    """Reserve stock for a cart line until the hold expires"""
+    data = request.get_json() or {}
+    try:
+        miner_id = int(data.get('miner_id'))
+        quantity = int(data.get('quantity', 1))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'Invalid cart item'}), 400
+    
+    try:
+        reservation = reservations.hold(current_user.id, miner_id, quantity)
+    except (ValueError, InsufficientStockError) as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    return jsonify({
+        'success': True,
+        'reservation': {
+            'id': reservation.id,
+            'miner_id': reservation.miner_id,
+            'quantity': reservation.quantity,
+            'expires_at': reservation.expires_at.isoformat()
+        }
+    })
+
+@api_bp.route('/cart/hold/<int:reservation_id>/release', methods=['POST'])
+@login_required
+def api_cart_release(reservation_id):
+    """Release a hold before it expires"""
+    try:
+        released = reservations.release(reservation_id, current_user.id)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    if not released:
+        return jsonify({'success': False, 'message': 'Reservation not found or no longer held'}), 404
+    return jsonify({'success': True})
+
+@api_bp.route('/cart/holds')
+@login_required
+def api_cart_holds():
+    """Current user's active holds"""
+    return jsonify({
+        'success': True,
+        'data': [{
+            'id': reservation.id,
+            'miner_id': reservation.miner_id,
+            'quantity': reservation.quantity,
+            'expires_at': reservation.expires_at.isoformat()
+        } for reservation in reservations.active_holds(current_user.id)]
+    })
+
 @api_bp.route('/cart/checkout', methods=['POST'])
 @login_required
 def api_checkout():
@@ -418,12 +895,21 @@ def api_checkout():
         return jsonify({'success': False, 'message': 'Cart is empty'}), 400
     
     try:
-        order_number = f"ORD-{datetime.now().strftime('%Y%m%d')}-{random.randint(10000,99999)}"
+        quantities = InventoryService.aggregate_cart(cart_items)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    try:
+        miners = InventoryService.load_miners(quantities)
+        missing = set(quantities) - set(miners)
+        if missing:
+            return jsonify({'success': False, 'message': 'Insufficient stock for item'}), 400
         
-        total_amount = 0
+        total_amount = sum(miners[miner_id].price_usd * quantity for miner_id, quantity in quantities.items())
         order = Order(
-            order_number=order_number,
+            order_number=new_order_number(),
             user_id=current_user.id,
+            total_amount=total_amount,
             shipping_address=shipping_info.get('address', ''),
             billing_address=shipping_info.get('billing_address', shipping_info.get('address', '')),
             payment_method='credit_card'
@@ -431,32 +917,24 @@ def api_checkout():
         db.session.add(order)
         db.session.flush()
         
-        for item in cart_items:
-            miner = ASICMiner.query.get(item['miner_id'])
-            quantity = int(item['quantity'])
-            
-            if not miner or miner.stock_quantity < quantity:
-                return jsonify({'success': False, 'message': f'Insufficient stock for {miner.name if miner else "item"}'}), 400
-            
-            item_total = miner.price_usd * quantity
-            total_amount += item_total
-            
-            order_item = OrderItem(
+        # Holds already set the stock aside; lines without one draw from the unreserved shards
+        reservations.convert(current_user.id, quantities, order.id)
+        InventoryService.decrement_stock(quantities, miners)
+        
+        db.session.add_all([
+            OrderItem(
                 order_id=order.id,
-                miner_id=miner.id,
+                miner_id=miner_id,
                 quantity=quantity,
-                unit_price=miner.price_usd,
-                total_price=item_total
+                unit_price=miners[miner_id].price_usd,
+                total_price=miners[miner_id].price_usd * quantity
             )
-            db.session.add(order_item)
-            miner.stock_quantity -= quantity
+            for miner_id, quantity in quantities.items()
+        ])
         
-        order.total_amount = total_amount
-        
-        # Create shipping record
-        shipping = Shipping(order_id=order.id)
-        shipping.generate_tracking_number()
-        db.session.add(shipping)
+        # Side effects run on the task workers; the outbox rows commit with the order
+        enqueue('orders.create_shipping', {'order_id': order.id})
+        enqueue('catalog.invalidate', dedupe_key='catalog.invalidate')  # Stock levels changed
         
         db.session.commit()
         
@@ -466,6 +944,9 @@ def api_checkout():
             'order_number': order.order_number,
             'total_amount': total_amount
         })
+    except InsufficientStockError as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -477,3 +958,178 @@ def api_crypto_prices():
     prices = api.get_crypto_prices(['bitcoin', 'ethereum', 'litecoin', 'dogecoin'])
     
     return jsonify({'success': True, 'data': prices})
+
+@api_bp.route('/coins')
+def api_coin_models():
+    """Revenue per TH/s per day for each supported mining algorithm"""
+    return jsonify({
+        'success': True,
+        'data': [{
+            'algorithm': algorithm,
+            'coin_symbol': coefficient.symbol,
+            'crypto_price': coefficient.price,
+            'revenue_per_th_day': coefficient.revenue_per_th,
+            'output_per_th_day': coefficient.output_per_th
+        } for algorithm, coefficient in coin_registry.coefficients().items()]
+    })
+
+@api_bp.route('/coins/<symbol>/history')
+def api_coin_price_history(symbol):
+    """Coin price series for a time range, downsampled to at most points with LTTB"""
+    try:
+        start, end = _time_range(default_days=30)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    points = request.args.get('points', 500, type=int)
+    max_points = current_app.config.get('COIN_PRICE_MAX_POINTS', 5000)
+    if not 3 <= points <= max_points:
+        return jsonify({'success': False, 'message': f'points must be between 3 and {max_points}'}), 400
+    
+    return jsonify({'success': True, 'data': PriceHistory.series(symbol.upper(), start, end, points)})
+
+@api_bp.route('/coins/<symbol>/candles')
+def api_coin_price_candles(symbol):
+    """Hourly or daily OHLC candles for a coin"""
+    try:
+        start, end = _time_range(default_days=7)
+        candles = PriceHistory.candles(
+            symbol.upper(),
+            request.args.get('resolution', 'hour'),
+            start,
+            end,
+            min(request.args.get('limit', 1000, type=int), 5000)
+        )
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    
+    return jsonify({'success': True, 'data': candles})
+
+@api_bp.route('/export/miners')
+@login_required
+def api_export_miners():
+    """Stream the whole miner catalog as NDJSON or CSV (admin only)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    query = Exporter.miners(
+        algorithm=request.args.get('algorithm'),
+        manufacturer=request.args.get('manufacturer'),
+        available_only=request.args.get('available', 'false').lower() in ('1', 'true', 'yes')
+    )
+    try:
+        return _export_response('miners', query)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@api_bp.route('/export/profitability')
+@login_required
+def api_export_profitability():
+    """Stream profitability history (raw, hour or day resolution) as NDJSON or CSV (admin only)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    try:
+        query = Exporter.profitability(
+            resolution=request.args.get('resolution', 'raw'),
+            miner_id=request.args.get('miner_id', type=int),
+            start=_optional_time('start'),
+            end=_optional_time('end')
+        )
+        return _export_response('profitability', query)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@api_bp.route('/export/orders')
+@login_required
+def api_export_orders():
+    """Stream order lines as NDJSON or CSV (admin only)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    try:
+        query = Exporter.order_lines(
+            status=request.args.get('status'),
+            start=_optional_time('start'),
+            end=_optional_time('end')
+        )
+        return _export_response('orders', query)
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+@api_bp.route('/import/miners', methods=['POST'])
+@login_required
+def api_import_miners():
+    """Bulk import miners from an uploaded file or a CSV/JSON/NDJSON request body (admin only)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    upload = request.files.get('file')
+    if upload:
+        source, name = upload.stream, upload.filename or ''
+    else:
+        source, name = request.stream, ''
+    fmt = request.args.get('format')
+    if not fmt:
+        json_body = request.mimetype in ('application/json', 'application/x-ndjson')
+        fmt = 'json' if json_body or name.lower().endswith(('.json', '.ndjson')) else 'csv'
+    if fmt not in ('csv', 'json'):
+        return jsonify({'success': False, 'message': 'format must be csv or json'}), 400
+    try:
+        stream = io.TextIOWrapper(source, encoding='utf-8-sig', newline='')
+        dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+        report = CatalogImporter(dry_run=dry_run).run(stream, fmt)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+    
+    return jsonify({'success': not report['failed'], 'data': report})
+
+@api_bp.route('/stream')
+def api_stream():
+    """Server-Sent Events with coin price and per-algorithm profitability updates (?topics=prices,SHA-256)"""
+    try:
+        subscription = broadcaster.subscribe(broadcaster.parse_topics(request.args.get('topics')))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except StreamFull as e:
+        return jsonify({'success': False, 'message': str(e)}), 503, {'Retry-After': '30'}
+    
+    response = Response(broadcaster.events(subscription), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Stop nginx-style proxies from buffering the stream
+    return response
+
+@api_bp.route('/stream/stats')
+def api_stream_stats():
+    """Live stream connection and publication counters for monitoring"""
+    return jsonify({'success': True, 'data': broadcaster.get_stats()})
+
+@api_bp.route('/crypto-prices/cache-stats')
+def api_price_cache_stats():
+    """Price cache hit/miss/stale counters for monitoring"""
+    return jsonify({'success': True, 'data': price_cache.get_stats()})
+
+@api_bp.route('/scheduler/status')
+@login_required
+def api_scheduler_status():
+    """Schedule, lease holder and recent run history of background jobs (admin only)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    return jsonify({'success': True, 'data': scheduler.get_status()})
+
+@api_bp.route('/tasks/status')
+@login_required
+def api_task_status():
+    """Background task queue depth per status (admin only)"""
+    if not current_user.is_admin:
+        return jsonify({'success': False, 'message': 'Admin access required'}), 403
+    return jsonify({'success': True, 'data': get_task_stats()})
+
+@api_bp.route('/cache-stats')
+def api_cache_stats():
+    """Hit ratios for the response, price and listing-count caches"""
+    return jsonify({
+        'success': True,
+        'data': {
+            'responses': response_cache.get_stats(),
+            'prices': price_cache.get_stats(),
+            'counts': count_cache.get_stats(),
+            'catalog_snapshot': catalog_index.get_stats()
+        }
+    })
@@ -0,0 +1,251 @@
+"""
+In-process periodic scheduler for data refresh jobs
+
+Every gunicorn worker runs a scheduler thread, but each job is claimed through
+a lease on its ScheduledJob row: a conditional UPDATE succeeds for exactly one
+worker (on any node) once the job is due and no unexpired lease is held. The
+winner runs the job, records a JobRun with duration and error, and schedules
+the next run with jitter. A worker that dies mid-run simply lets its lease
+expire; the next claimant marks the orphaned run as abandoned.
+
+The thread is started only by the web server entry points (wsgi.py and the
+dev servers in run.py, backend.py and start.py), not by create_app, so CLI
+commands and task worker processes never claim a lease and exit mid-run.
+"""
+import os
+import time
+import random
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from app.models import db, dialect_insert, ScheduledJob, JobRun
+
+logger = logging.getLogger(__name__)
+
+class Job:
+    """A named periodic callable"""
+
+    def __init__(self, name, func, interval, jitter=0.1, timeout=900):
+        self.name = name
+        self.func = func
+        self.interval = interval  # Seconds between runs
+        self.jitter = jitter  # +/- fraction of interval added to each next run
+        self.timeout = timeout  # Lease length; must exceed the longest expected run
+
+    def next_delay(self):
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+class JobScheduler:
+    """Runs registered jobs on their intervals with one runner per job across all workers"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.history_days = 30
+        self._thread = None
+        self._stop = threading.Event()
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+
+    def init_app(self, app):
+        """Register the built-in refresh jobs; the thread is started by autostart()"""
+        self.history_days = app.config.get('SCHEDULER_HISTORY_DAYS', 30)
+        self._register_defaults(app)
+
+    def autostart(self, app):
+        """Start the scheduler thread in a web server process unless SCHEDULER_ENABLED is off"""
+        if app.config.get('SCHEDULER_ENABLED') and not app.config.get('TESTING'):
+            self.start(app)
+
+    def _register_defaults(self, app):
+        from app.services import CryptoPriceAPI, ProfitabilityCalculator
+        from app.retention import ProfitabilityStore
+        from app.reservations import reservations
+        from app.tasks import TaskWorker, prune_finished
+        from app.scraper import MiningNowScraper
+        from app.simulation import RoiSimulator
+        from app.prices import PriceHistory
+
+        config = app.config
+        self.add_job(
+            'update_crypto_prices',
+            lambda: CryptoPriceAPI().update_crypto_data(raise_errors=True),
+            config.get('CRYPTO_PRICE_UPDATE_INTERVAL', 600)
+        )
+        self.add_job(
+            'update_profitability',
+            lambda: ProfitabilityCalculator.update_all_profitability_data(raise_errors=True),
+            config.get('PROFITABILITY_UPDATE_INTERVAL', 3600)
+        )
+        self.add_job('compact_profitability', ProfitabilityStore.compact, config.get('PROFITABILITY_COMPACT_INTERVAL', 86400))
+        self.add_job('expire_reservations', reservations.expire_holds, config.get('RESERVATION_SWEEP_INTERVAL', 30), timeout=300)
+        self.add_job('prune_tasks', prune_finished, config.get('TASK_PRUNE_INTERVAL', 86400))
+        self.add_job('sync_miningnow', lambda: MiningNowScraper().run(), config.get('MININGNOW_SCRAPE_INTERVAL', 0), timeout=1800)
+        self.add_job('simulate_roi', lambda: RoiSimulator().simulate_catalog(), config.get('ROI_SIMULATION_INTERVAL', 0), timeout=3600)
+        self.add_job('prune_coin_prices', PriceHistory.prune, config.get('COIN_PRICE_PRUNE_INTERVAL', 86400))
+        self.add_job('prune_simulations', lambda: RoiSimulator().prune(), config.get('SIMULATION_PRUNE_INTERVAL', 3600))
+        self.add_job(
+            'process_tasks',
+            lambda: TaskWorker().work(burst=True),
+            config.get('TASK_INPROCESS_INTERVAL', 0),
+            jitter=0.5
+        )
+
+    def add_job(self, name, func, interval, jitter=0.1, timeout=900):
+        """Register a job; an interval of 0 disables it"""
+        if not interval:
+            self.jobs.pop(name, None)
+            return None
+        job = Job(name, func, interval, jitter, timeout)
+        self.jobs[name] = job
+        return job
+
+    def start(self, app):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, args=(app, app.config.get('SCHEDULER_TICK', 15)), name='job-scheduler', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, app, tick):
+        # Spread the first check so workers booted together don't poll in lockstep
+        delay = random.uniform(0, tick)
+        while not self._stop.wait(delay):
+            with app.app_context():
+                self.run_pending()
+            delay = tick * random.uniform(0.8, 1.2)
+
+    def run_pending(self):
+        """Run every due job this worker manages to claim; returns the names that ran"""
+        ran = []
+        for job in list(self.jobs.values()):
+            try:
+                if self._claim(job):
+                    self._execute(job)
+                    ran.append(job.name)
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Scheduler error for {job.name}: {e}")
+        return ran
+
+    def run_now(self, name):
+        """Run a job immediately under its lease, ignoring its schedule; False if another worker holds it"""
+        job = self.jobs[name]
+        if not self._claim(job, force=True):
+            return False
+        self._execute(job)
+        return True
+
+    def _claim(self, job, force=False):
+        """Take the job's lease if it is due and free; True when this worker won it"""
+        now = datetime.utcnow()
+        db.session.execute(
+            dialect_insert(ScheduledJob)
+            .values(name=job.name, next_run_at=now)
+            .on_conflict_do_nothing(index_elements=['name'])
+        )
+        conditions = [
+            ScheduledJob.name == job.name,
+            db.or_(ScheduledJob.locked_until.is_(None), ScheduledJob.locked_until < now)
+        ]
+        if not force:
+            conditions.append(ScheduledJob.next_run_at <= now)
+        claimed = db.session.execute(
+            db.update(ScheduledJob)
+            .where(*conditions)
+            .values(locked_by=self.worker, locked_until=now + timedelta(seconds=job.timeout))
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        if claimed:
+            # Runs still marked running belonged to a worker whose lease lapsed
+            db.session.execute(
+                db.update(JobRun)
+                .where(JobRun.job_name == job.name, JobRun.status == 'running')
+                .values(status='abandoned', finished_at=now)
+                .execution_options(synchronize_session=False)
+            )
+        db.session.commit()
+        return claimed
+
+    def _execute(self, job):
+        run = JobRun(job_name=job.name, worker=self.worker, status='running', started_at=datetime.utcnow())
+        db.session.add(run)
+        db.session.commit()
+        run_id = run.id
+
+        start = time.perf_counter()
+        status, error = 'success', None
+        try:
+            job.func()
+        except Exception as e:
+            db.session.rollback()
+            status, error = 'failed', f'{type(e).__name__}: {e}'
+            logger.error(f"Scheduled job {job.name} failed: {e}")
+        duration_ms = (time.perf_counter() - start) * 1000
+        finished = datetime.utcnow()
+
+        db.session.execute(
+            db.update(JobRun)
+            .where(JobRun.id == run_id)
+            .values(status=status, finished_at=finished, duration_ms=duration_ms, error=error)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            db.update(ScheduledJob)
+            .where(ScheduledJob.name == job.name, ScheduledJob.locked_by == self.worker)
+            .values(
+                locked_by=None,
+                locked_until=None,
+                last_status=status,
+                last_run_at=finished,
+                last_duration_ms=duration_ms,
+                next_run_at=finished + timedelta(seconds=job.next_delay())
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self._prune_history(job.name, finished)
+        db.session.commit()
+        return status
+
+    def _prune_history(self, name, now):
+        db.session.execute(
+            db.delete(JobRun)
+            .where(JobRun.job_name == name, JobRun.started_at < now - timedelta(days=self.history_days))
+            .execution_options(synchronize_session=False)
+        )
+
+    def get_status(self, history=5):
+        """Schedule, lease and recent runs of every registered job"""
+        rows = {row.name: row for row in ScheduledJob.query.filter(ScheduledJob.name.in_(list(self.jobs))).all()}
+        status = {}
+        for name, job in self.jobs.items():
+            row = rows.get(name)
+            runs = (
+                JobRun.query.filter_by(job_name=name)
+                .order_by(JobRun.started_at.desc())
+                .limit(history)
+                .all()
+            )
+            status[name] = {
+                'interval': job.interval,
+                'next_run_at': row.next_run_at.isoformat() if row and row.next_run_at else None,
+                'locked_by': row.locked_by if row else None,
+                'last_status': row.last_status if row else None,
+                'last_run_at': row.last_run_at.isoformat() if row and row.last_run_at else None,
+                'last_duration_ms': row.last_duration_ms if row else None,
+                'recent_runs': [{
+                    'status': run.status,
+                    'worker': run.worker,
+                    'started_at': run.started_at.isoformat(),
+                    'duration_ms': run.duration_ms,
+                    'error': run.error
+                } for run in runs]
+            }
+        return status
+
+scheduler = JobScheduler()
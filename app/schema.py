@@ -0,0 +1,71 @@
+"""
+In-place schema upgrades for existing databases
+
+The app has no migration tool; db.create_all() creates missing tables but
+never alters existing ones, so a column or index added to a model would be
+missing on a database created before it. upgrade_schema() runs create_all,
+then adds every missing column (ALTER TABLE ... ADD COLUMN, using the
+column's scalar default as the server default so NOT NULL columns can be
+added to populated tables) and every missing index, and finally backfills
+derived data for what it added: review aggregates on asic_miner and the
+latest-profitability snapshot. It is idempotent and runs on every release
+(Procfile) or by hand with flask upgrade-db.
+"""
+import logging
+from app.models import db, ASICMiner, LatestProfitability
+
+logger = logging.getLogger(__name__)
+
+def _default_sql(column, dialect):
+    """SQL literal of a column's scalar Python default, or None"""
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+    literal = db.literal(default.arg, column.type)
+    return str(literal.compile(dialect=dialect, compile_kwargs={'literal_binds': True}))
+
+def _add_column(connection, table, column):
+    dialect = connection.dialect
+    preparer = dialect.identifier_preparer
+    ddl = f'{preparer.quote(column.name)} {column.type.compile(dialect=dialect)}'
+    default = _default_sql(column, dialect)
+    if default is not None:
+        ddl += f' DEFAULT {default}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+    connection.exec_driver_sql(f'ALTER TABLE {preparer.format_table(table)} ADD COLUMN {ddl}')
+
+def upgrade_schema():
+    """Bring the database schema up to the models; returns a list of the changes made"""
+    existing_tables = set(db.inspect(db.engine).get_table_names())
+    db.create_all()
+    changes = [f'created table {name}' for name in db.metadata.tables if name not in existing_tables]
+
+    with db.engine.begin() as connection:
+        inspector = db.inspect(connection)
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    _add_column(connection, table, column)
+                    changes.append(f'added column {table.name}.{column.name}')
+            indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(connection)
+                    changes.append(f'created index {index.name}')
+
+    # Backfill data the new schema objects derive from existing rows
+    from app.reviews import ReviewService
+    from app.retention import ProfitabilityStore
+    if any(change.startswith(f'added column {ASICMiner.__tablename__}.rating_') for change in changes):
+        ReviewService.rebuild_stats()
+        changes.append('rebuilt review stats')
+    if f'created table {LatestProfitability.__tablename__}' in changes and existing_tables:
+        ProfitabilityStore.rebuild_latest()
+        changes.append('rebuilt latest profitability')
+    for change in changes:
+        logger.info(f"Schema upgrade: {change}")
+    return changes
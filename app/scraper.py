@@ -0,0 +1,411 @@
+"""
+miningnow.com catalog ingestion
+
+Listing pages are walked through their rel="next" links and every miner page
+they link to is fetched concurrently on a bounded thread pool that shares one
+pooled HTTP session (SCRAPER_CONCURRENCY requests and connections at most).
+Each response is streamed through an incremental HTML parser, so pages are
+never held in memory whole. Pages are re-fetched conditionally with the
+stored ETag/Last-Modified validators; a 304, or a 200 whose body hashes the
+same as last time, costs no parsing or database work.
+
+Miner pages are read from their schema.org Product JSON-LD and spec tables
+(th/td or dt/dd rows). Miners are upserted on (manufacturer, model) and a
+ProfitabilityData point with data_source='miningnow.com' is written per
+miner, SCRAPER_BATCH_SIZE miners per transaction. Database work stays on the
+calling thread; fetch threads only do HTTP and parsing.
+"""
+import re
+import json
+import codecs
+import hashlib
+import logging
+from datetime import datetime
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from app.models import db, dialect_insert, ASICMiner, Inventory, ProfitabilityData, ScrapedPage
+from app.retention import ProfitabilityStore
+from app.alerts import PriceAlertEngine
+from app.cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+DATA_SOURCE = 'miningnow.com'
+
+HASH_RATE_SCALE = {'': 1e-12, 'k': 1e-9, 'm': 1e-6, 'g': 1e-3, 't': 1.0, 'p': 1e3, 'e': 1e6}  # to TH/s
+HASH_RATE_RE = re.compile(r'([\d.,]+)\s*([kmgtpe]?)\s*(?:h|sol)(?:/s|s)?\b', re.IGNORECASE)
+NUMBER_RE = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+
+SPEC_ALIASES = {
+    'hash_rate': ('hashrate', 'hash rate', 'hash_rate'),
+    'power': ('power', 'power consumption', 'power draw', 'wattage'),
+    'algorithm': ('algorithm', 'algo'),
+    'manufacturer': ('manufacturer', 'brand', 'vendor'),
+    'model': ('model',),
+    'price': ('price',),
+    'profitability': ('profitability', 'daily profit', 'profit per day', 'income per day', 'daily income')
+}
+
+def parse_number(text):
+    """First number in text ('$6,500.00' -> 6500.0), or None"""
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = NUMBER_RE.search(str(text))
+    return float(match.group().replace(',', '')) if match else None
+
+def parse_hash_rate(text):
+    """Hash rate text ('110 TH/s', '9.5 GH/s', '140 ksol/s') in TH/s, or None"""
+    if text is None:
+        return None
+    match = HASH_RATE_RE.search(str(text))
+    if not match:
+        return parse_number(text)
+    return float(match.group(1).replace(',', '')) * HASH_RATE_SCALE[match.group(2).lower()]
+
+class PageParser(HTMLParser):
+    """Incremental parser collecting detail links, rel=next, JSON-LD blocks and spec rows"""
+
+    def __init__(self, detail_prefix):
+        super().__init__(convert_charrefs=True)
+        self.detail_prefix = detail_prefix
+        self.links = []
+        self.next_url = None
+        self.json_ld = []
+        self.specs = {}
+        self._script = None  # Text chunks while inside an ld+json script
+        self._cell = None  # 'label' or 'value' while inside a spec cell
+        self._text = []
+        self._label = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag in ('a', 'link') and attrs.get('href'):
+            href = attrs['href']
+            if 'next' in (attrs.get('rel') or '').lower().split():
+                self.next_url = href
+            elif tag == 'a' and urlparse(href).path.startswith(self.detail_prefix):
+                self.links.append(href)
+        elif tag == 'script' and (attrs.get('type') or '').lower() == 'application/ld+json':
+            self._script = []
+        elif tag in ('th', 'dt'):
+            self._cell, self._text = 'label', []
+        elif tag in ('td', 'dd'):
+            self._cell, self._text = 'value', []
+
+    def handle_data(self, data):
+        if self._script is not None:
+            self._script.append(data)
+        elif self._cell is not None:
+            self._text.append(data)
+
+    def handle_endtag(self, tag):
+        if tag == 'script' and self._script is not None:
+            try:
+                self.json_ld.append(json.loads(''.join(self._script)))
+            except ValueError:
+                pass
+            self._script = None
+        elif tag in ('th', 'dt') and self._cell == 'label':
+            self._label = ' '.join(''.join(self._text).split()).rstrip(':').lower()
+            self._cell = None
+        elif tag in ('td', 'dd') and self._cell == 'value':
+            if self._label:
+                self.specs.setdefault(self._label, ' '.join(''.join(self._text).split()))
+            self._label = self._cell = None
+
+    def product(self):
+        """The first schema.org Product in the page's JSON-LD, or {}"""
+        items = []
+        for block in self.json_ld:
+            if isinstance(block, dict) and '@graph' in block:
+                block = block['@graph']
+            items.extend(block if isinstance(block, list) else [block])
+        for item in items:
+            kind = item.get('@type') if isinstance(item, dict) else None
+            if kind == 'Product' or (isinstance(kind, list) and 'Product' in kind):
+                return item
+        return {}
+
+def extract_miner(parser):
+    """Miner fields from a parsed detail page, or None when required fields are missing"""
+    product = parser.product()
+    specs = dict(parser.specs)
+    for prop in product.get('additionalProperty') or []:
+        if isinstance(prop, dict) and prop.get('name'):
+            specs.setdefault(str(prop['name']).strip().lower(), prop.get('value'))
+
+    def spec(field):
+        for alias in SPEC_ALIASES[field]:
+            if specs.get(alias) not in (None, ''):
+                return specs[alias]
+        return None
+
+    brand = product.get('brand')
+    offers = product.get('offers')
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    name = product.get('name') or specs.get('name')
+    manufacturer = (brand.get('name') if isinstance(brand, dict) else brand) or spec('manufacturer')
+    price = parse_number(offers.get('price') if isinstance(offers, dict) else None) or parse_number(spec('price'))
+    record = {
+        'name': name,
+        'manufacturer': manufacturer,
+        'model': product.get('model') or spec('model') or name,
+        'hash_rate': parse_hash_rate(spec('hash_rate')),
+        'power_consumption': parse_number(spec('power')),
+        'algorithm': spec('algorithm'),
+        'price_usd': price,
+        'description': product.get('description'),
+        'image_url': product.get('image') if isinstance(product.get('image'), str) else None,
+        'profitability_daily': parse_number(spec('profitability'))
+    }
+    required = ('name', 'manufacturer', 'model', 'hash_rate', 'power_consumption', 'algorithm', 'price_usd')
+    if any(record[field] in (None, '') for field in required):
+        return None
+    record['power_consumption'] = int(round(record['power_consumption']))
+    return record
+
+class PageResult:
+    """Outcome of fetching one page on a worker thread"""
+
+    def __init__(self, url, kind, status=None, etag=None, last_modified=None, content_hash=None,
+                 links=None, next_url=None, record=None, error=None):
+        self.url = url
+        self.kind = kind
+        self.status = status
+        self.etag = etag
+        self.last_modified = last_modified
+        self.content_hash = content_hash
+        self.links = links or []
+        self.next_url = next_url
+        self.record = record
+        self.error = error
+
+class MiningNowScraper:
+    """Concurrent, conditional catalog sync from miningnow.com"""
+
+    def __init__(self, base_url=None, concurrency=None, batch_size=None):
+        config = current_app.config
+        self.base_url = (base_url or config.get('MININGNOW_BASE_URL', 'https://miningnow.com')).rstrip('/')
+        self.listing_path = config.get('SCRAPER_LISTING_PATH', '/asic-miners/')
+        self.detail_prefix = config.get('SCRAPER_DETAIL_PREFIX', '/asic-miner/')
+        self.concurrency = concurrency or config.get('SCRAPER_CONCURRENCY', 8)
+        self.batch_size = batch_size or config.get('SCRAPER_BATCH_SIZE', 100)
+        self.timeout = config.get('SCRAPER_TIMEOUT', 10)
+        self.max_pages = config.get('SCRAPER_MAX_PAGES', 50)
+        self.max_bytes = config.get('SCRAPER_MAX_PAGE_BYTES', 2 * 1024 * 1024)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'User-Agent': config.get('SCRAPER_USER_AGENT', 'CryptoMinerPro catalog sync'),
+            'Accept-Encoding': 'gzip, deflate'
+        })
+
+    def fetch(self, url, kind, known=None):
+        """Conditionally fetch and stream-parse one page; never raises"""
+        headers = {}
+        if known is not None:
+            if known.etag:
+                headers['If-None-Match'] = known.etag
+            if known.last_modified:
+                headers['If-Modified-Since'] = known.last_modified
+        try:
+            with self.session.get(url, headers=headers, timeout=self.timeout, stream=True) as response:
+                if response.status_code == 304:
+                    return PageResult(url, kind, 304)
+                response.raise_for_status()
+                charset = response.encoding if 'charset' in response.headers.get('Content-Type', '') else 'utf-8'
+                decoder = codecs.getincrementaldecoder(charset or 'utf-8')(errors='replace')
+                parser = PageParser(self.detail_prefix)
+                digest = hashlib.sha256()
+                size = 0
+                for chunk in response.iter_content(chunk_size=16384):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise ValueError(f"Page larger than {self.max_bytes} bytes")
+                    digest.update(chunk)
+                    parser.feed(decoder.decode(chunk))
+                parser.feed(decoder.decode(b'', final=True))
+                parser.close()
+                return PageResult(
+                    url, kind, response.status_code,
+                    etag=response.headers.get('ETag'),
+                    last_modified=response.headers.get('Last-Modified'),
+                    content_hash=digest.hexdigest(),
+                    links=[urljoin(url, link) for link in parser.links],
+                    next_url=urljoin(url, parser.next_url) if parser.next_url else None,
+                    record=extract_miner(parser) if kind == 'detail' else None
+                )
+        except Exception as e:
+            return PageResult(url, kind, error=str(e))
+
+    def run(self):
+        """Sync the catalog; returns counters for pages fetched, skipped and miners written"""
+        stats = {
+            'pages': 0, 'not_modified': 0, 'unchanged': 0, 'errors': 0,
+            'miners_inserted': 0, 'miners_updated': 0, 'skipped': 0
+        }
+        known = {
+            page.url: page for page in db.session.query(
+                ScrapedPage.url, ScrapedPage.etag, ScrapedPage.last_modified, ScrapedPage.content_hash, ScrapedPage.links
+            )
+        }
+        seen = set()
+        pending = set()
+        records, pages = [], []
+        listing_pages = 0
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='scraper') as pool:
+            def submit(url, kind):
+                if url not in seen:
+                    seen.add(url)
+                    pending.add(pool.submit(self.fetch, url, kind, known.get(url)))
+
+            submit(self.base_url + self.listing_path, 'listing')
+            listing_pages += 1
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.discard(future)
+                    result = future.result()
+                    stats['pages'] += 1
+                    if result.error:
+                        stats['errors'] += 1
+                        logger.warning(f"Scrape failed for {result.url}: {result.error}")
+                        continue
+
+                    previous = known.get(result.url)
+                    if result.status == 304 or (previous is not None and previous.content_hash == result.content_hash):
+                        stats['not_modified' if result.status == 304 else 'unchanged'] += 1
+                        if result.kind == 'listing' and previous is not None and previous.links:
+                            stored = json.loads(previous.links)
+                            result.links, result.next_url = stored.get('links', []), stored.get('next')
+                        changed = False
+                    else:
+                        changed = True
+                        pages.append(result)
+
+                    if result.kind == 'listing':
+                        for link in result.links:
+                            submit(link, 'detail')
+                        if result.next_url and listing_pages < self.max_pages:
+                            listing_pages += 1
+                            submit(result.next_url, 'listing')
+                    elif changed:
+                        if result.record is None:
+                            stats['skipped'] += 1
+                            logger.warning(f"No miner data found on {result.url}")
+                        else:
+                            records.append(result.record)
+
+                    if len(records) >= self.batch_size:
+                        self._save(records, pages, stats)
+                        records, pages = [], []
+        self._save(records, pages, stats)
+
+        if stats['miners_inserted'] or stats['miners_updated']:
+            bump_version('catalog')
+        logger.info(f"miningnow.com sync: {stats}")
+        return stats
+
+    def _save(self, records, pages, stats):
+        """Upsert a batch of miners, their profitability points and the pages' validators in one transaction"""
+        if not records and not pages:
+            return
+        try:
+            inserted, updated = self._upsert_miners(records)
+            if pages:
+                stmt = dialect_insert(ScrapedPage)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[ScrapedPage.url],
+                    set_={field: stmt.excluded[field] for field in ('etag', 'last_modified', 'content_hash', 'links', 'fetched_at')}
+                )
+                now = datetime.utcnow()
+                db.session.execute(stmt, [{
+                    'url': page.url,
+                    'etag': page.etag,
+                    'last_modified': page.last_modified,
+                    'content_hash': page.content_hash,
+                    'links': json.dumps({'links': page.links, 'next': page.next_url}) if page.kind == 'listing' else None,
+                    'fetched_at': now
+                } for page in pages])
+            db.session.commit()
+            stats['miners_inserted'] += inserted
+            stats['miners_updated'] += updated
+        except Exception as e:
+            db.session.rollback()
+            stats['errors'] += len(pages)
+            logger.error(f"Error saving scraped miners: {e}")
+
+    def _upsert_miners(self, records):
+        """Insert new miners and update known ones, matched on (manufacturer, model)"""
+        if not records:
+            return 0, 0
+        by_key = {(record['manufacturer'], record['model']): record for record in records}
+        existing = {
+            (row.manufacturer, row.model): row
+            for row in db.session.query(ASICMiner.id, ASICMiner.manufacturer, ASICMiner.model, ASICMiner.price_usd)
+            .filter(db.tuple_(ASICMiner.manufacturer, ASICMiner.model).in_(list(by_key)))
+        }
+
+        now = datetime.utcnow()
+        fields = ('name', 'hash_rate', 'power_consumption', 'algorithm', 'price_usd')
+        updates, new_rows, price_changes = [], [], {}
+        for key, record in by_key.items():
+            values = {field: record[field] for field in fields}
+            values['efficiency_rating'] = record['power_consumption'] / (record['hash_rate'] * 1000) if record['hash_rate'] else 0.0
+            values['updated_at'] = now
+            current = existing.get(key)
+            if current is None:
+                values.update(
+                    manufacturer=record['manufacturer'], model=record['model'], description=record['description'],
+                    image_url=record['image_url'], stock_quantity=0, created_at=now
+                )
+                new_rows.append(values)
+            else:
+                values['id'] = current.id
+                updates.append(values)
+                if current.price_usd != record['price_usd']:
+                    price_changes[current.id] = record['price_usd']
+
+        ids = {key: row.id for key, row in existing.items()}
+        if new_rows:
+            created = db.session.execute(
+                db.insert(ASICMiner).returning(ASICMiner.id, ASICMiner.manufacturer, ASICMiner.model, sort_by_parameter_order=True),
+                new_rows
+            ).all()
+            db.session.execute(db.insert(Inventory), [{'miner_id': row.id, 'quantity_available': 0, 'reserved_quantity': 0} for row in created])
+            ids.update({(row.manufacturer, row.model): row.id for row in created})
+        if updates:
+            db.session.execute(db.update(ASICMiner), updates)
+        if price_changes:
+            # Bulk UPDATEs bypass the ORM price hook
+            PriceAlertEngine.evaluate(price_changes)
+
+        profitability = []
+        for key, record in by_key.items():
+            daily = record['profitability_daily']
+            if daily is None:
+                continue
+            profitability.append({
+                'miner_id': ids[key],
+                'daily_profit_usd': daily,
+                'monthly_profit_usd': daily * 30,
+                'yearly_profit_usd': daily * 365,
+                'net_profit_daily': daily,
+                'roi_days': record['price_usd'] / daily if daily > 0 else None,
+                'timestamp': now,
+                'data_source': DATA_SOURCE
+            })
+        if profitability:
+            db.session.execute(db.insert(ProfitabilityData), profitability)
+            ProfitabilityStore.upsert_latest(profitability)
+        return len(new_rows), len(updates)
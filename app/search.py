@@ -0,0 +1,158 @@
+"""
+Full-text catalog search over ASICMiner name, manufacturer, model, algorithm
+and description
+
+Uses an external-content FTS5 table kept in sync by triggers on SQLite, and a
+GIN index over a weighted tsvector expression on PostgreSQL. Other databases
+fall back to ILIKE matching.
+"""
+import re
+import logging
+from app.models import db, ASICMiner
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = 'asic_miner_fts'
+SEARCH_COLUMNS = ['name', 'manufacturer', 'model', 'algorithm', 'description']
+SQLITE_WEIGHTS = [10.0, 5.0, 5.0, 2.0, 1.0]  # bm25 weights, same order as SEARCH_COLUMNS
+
+class CatalogSearch:
+    """Ranked free-text search for the miner catalog"""
+
+    def __init__(self):
+        self.backend = None
+
+    def init_app(self, app):
+        """Create the search index for the configured database"""
+        with app.app_context():
+            try:
+                self.ensure_index()
+            except Exception as e:
+                logger.error(f"Catalog search index unavailable, using ILIKE fallback: {e}")
+                db.session.rollback()
+                self.backend = 'like'
+
+    def ensure_index(self):
+        """Create index structures if missing; returns the backend in use"""
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            self._ensure_sqlite_index()
+            self.backend = 'fts5'
+        elif dialect == 'postgresql':
+            self._ensure_postgres_index()
+            self.backend = 'tsvector'
+        else:
+            self.backend = 'like'
+        return self.backend
+
+    def rebuild(self):
+        """Rebuild the search index from the asic_miner table"""
+        backend = self.ensure_index()
+        if backend == 'fts5':
+            db.session.execute(db.text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')"))
+        elif backend == 'tsvector':
+            db.session.execute(db.text('REINDEX INDEX ix_asic_miner_search'))
+        db.session.commit()
+        return backend
+
+    def _ensure_sqlite_index(self):
+        exists = db.session.execute(
+            db.text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': FTS_TABLE}
+        ).first()
+        columns = ', '.join(SEARCH_COLUMNS)
+        new_columns = ', '.join(f'new.{c}' for c in SEARCH_COLUMNS)
+        old_columns = ', '.join(f'old.{c}' for c in SEARCH_COLUMNS)
+        statements = [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{columns}, content='asic_miner', content_rowid='id', prefix='2 3')",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON asic_miner BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_columns}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON asic_miner BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_columns}); END",
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {columns} ON asic_miner BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_columns}); "
+            f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_columns}); END",
+        ]
+        for statement in statements:
+            db.session.execute(db.text(statement))
+        if not exists:
+            db.session.execute(db.text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')"))
+        db.session.commit()
+
+    def _ensure_postgres_index(self):
+        document = self._postgres_document().compile(
+            dialect=db.engine.dialect, compile_kwargs={'literal_binds': True}
+        )
+        db.session.execute(db.text(
+            f"CREATE INDEX IF NOT EXISTS ix_asic_miner_search ON asic_miner USING GIN (({document}))"
+        ))
+        db.session.commit()
+
+    @staticmethod
+    def _postgres_document():
+        """Weighted tsvector expression; must match the GIN index definition exactly"""
+        def weighted(column, weight):
+            return db.func.setweight(
+                db.func.to_tsvector(db.literal_column("'simple'::regconfig"), db.func.coalesce(column, '')),
+                db.literal_column(f"'{weight}'::\"char\"")
+            )
+        return (
+            weighted(ASICMiner.name, 'A')
+            .op('||')(weighted(ASICMiner.manufacturer, 'B'))
+            .op('||')(weighted(ASICMiner.model, 'B'))
+            .op('||')(weighted(ASICMiner.algorithm, 'C'))
+            .op('||')(weighted(ASICMiner.description, 'D'))
+        )
+
+    @staticmethod
+    def tokenize(text):
+        """Split a user query into lowercase word tokens"""
+        return re.findall(r'\w+', (text or '').lower())
+
+    def search(self, query, text):
+        """Restrict an ASICMiner query to rows matching text; returns (query, rank)
+
+        Every token must match in one of the indexed columns; the last token
+        also matches as a prefix so partially typed words still find results.
+        Lower rank values are better matches; rank is None when text is blank.
+        """
+        tokens = self.tokenize(text)
+        if not tokens:
+            return query, None
+
+        if self.backend == 'fts5':
+            match = ' AND '.join(f'"{token}"' for token in tokens) + '*'
+            fts = db.table(FTS_TABLE, db.column('rowid'))
+            fts_ref = db.literal_column(FTS_TABLE)
+            weights = ', '.join(str(w) for w in SQLITE_WEIGHTS)
+            # Materialize the match set so SQLite runs MATCH once instead of per catalog row
+            matches = (
+                db.select(
+                    fts.c.rowid.label('miner_id'),
+                    db.literal_column(f'bm25({FTS_TABLE}, {weights})').label('rank')
+                )
+                .select_from(fts)
+                .where(fts_ref.op('MATCH')(match))
+                .cte(name='fts_matches')
+                .prefix_with('MATERIALIZED')
+            )
+            return query.join(matches, matches.c.miner_id == ASICMiner.id), matches.c.rank
+
+        if self.backend == 'tsvector':
+            tsquery = db.func.to_tsquery(
+                db.literal_column("'simple'::regconfig"),
+                ' & '.join(tokens) + ':*'
+            )
+            document = self._postgres_document()
+            query = query.filter(document.op('@@')(tsquery))
+            return query, -db.func.ts_rank_cd(document, tsquery)
+
+        for token in tokens:
+            pattern = f'%{token}%'
+            query = query.filter(db.or_(*[
+                getattr(ASICMiner, column).ilike(pattern) for column in SEARCH_COLUMNS
+            ]))
+        return query, None
+
+catalog_search = CatalogSearch()
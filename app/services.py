@@ -1,43 +1,57 @@
+import math
 import requests
 import logging
+import numpy as np
 from datetime import datetime
-from app.models import db, ProfitabilityData, Cryptocurrency, ASICMiner
-from bs4 import BeautifulSoup
+from app.models import db, Cryptocurrency, ASICMiner, MiningAnalytics
+from app.retention import ProfitabilityStore
+from app.cache import TTLCache, bump_version
+from app.alerts import PriceAlertEngine
+from app.coins import coin_registry
+from app.prices import PriceHistory
 
 logger = logging.getLogger(__name__)
 
+price_cache = TTLCache(config_prefix='PRICE_CACHE')
+
 class CryptoPriceAPI:
     """Fetch cryptocurrency prices from CoinGecko API"""
     
-    def __init__(self):
+    def __init__(self, cache=None):
         self.coingecko_url = "https://api.coingecko.com/api/v3"
+        self.cache = cache if cache is not None else price_cache
     
     def get_crypto_prices(self, coins=['bitcoin', 'ethereum', 'litecoin']):
-        """Get current cryptocurrency prices"""
+        """Get current cryptocurrency prices (served from the shared price cache)"""
+        key = tuple(sorted(set(coins)))
         try:
-            response = requests.get(
-                f"{self.coingecko_url}/simple/price",
-                params={
-                    'ids': ','.join(coins),
-                    'vs_currencies': 'usd',
-                    'include_market_cap': 'true',
-                    'include_24hr_vol': 'true'
-                },
-                timeout=10
-            )
-            response.raise_for_status()
-            return response.json()
+            return dict(self.cache.get(key, lambda: self._fetch_prices(key)))
         except Exception as e:
             logger.error(f"Error fetching crypto prices: {e}")
             return self._get_cached_prices(coins)
     
+    def _fetch_prices(self, coins):
+        """Fetch prices directly from CoinGecko"""
+        response = requests.get(
+            f"{self.coingecko_url}/simple/price",
+            params={
+                'ids': ','.join(coins),
+                'vs_currencies': 'usd',
+                'include_market_cap': 'true',
+                'include_24hr_vol': 'true'
+            },
+            timeout=10
+        )
+        response.raise_for_status()
+        return response.json()
+    
     def _get_cached_prices(self, coins):
-        """Get cached prices from database"""
+        """Get cached prices from database (marked stale so they are not recorded as new history)"""
         prices = {}
         for coin in coins:
             crypto = Cryptocurrency.query.filter_by(name=coin.lower()).first()
             if crypto:
-                prices[coin] = {'usd': crypto.current_price}
+                prices[coin] = {'usd': crypto.current_price, 'stale': True}
             else:
                 # Default fallback prices
                 fallback = {
@@ -45,23 +59,22 @@ class CryptoPriceAPI:
                     'ethereum': 3000,
                     'litecoin': 200,
                     'dogecoin': 0.15,
-                    'monero': 150
+                    'monero': 150,
+                    'ethereum-classic': 20,
+                    'kaspa': 0.1
                 }
-                prices[coin] = {'usd': fallback.get(coin, 0)}
+                prices[coin] = {'usd': fallback.get(coin, 0), 'stale': True}
         return prices
     
-    def update_crypto_data(self):
-        """Update cryptocurrency data in database"""
-        coins_config = {
-            'bitcoin': ('SHA-256', 'BTC'),
-            'ethereum': ('Ethash', 'ETH'),
-            'litecoin': ('Scrypt', 'LTC'),
-            'dogecoin': ('Scrypt', 'DOGE'),
-            'monero': ('RandomX', 'XMR')
-        }
+    def update_crypto_data(self, raise_errors=False):
+        """Update cryptocurrency prices and network parameters in database; raise_errors re-raises after logging (scheduled runs)"""
+        models = {model.coin_id: model for model in coin_registry.coins()}
+        coins_config = {model.coin_id: (model.algorithm, model.symbol) for model in models.values()}
+        coins_config.setdefault('ethereum', ('Ethash', 'ETH'))  # Price only; no longer minable
         
         try:
             prices = self.get_crypto_prices(list(coins_config.keys()))
+            coin_registry.refresh_network(commit=False)
             
             for coin_name, (algorithm, symbol) in coins_config.items():
                 if coin_name in prices:
@@ -78,56 +91,55 @@ class CryptoPriceAPI:
                     
                     crypto.current_price = price_data.get('usd', 0)
                     crypto.last_updated = datetime.utcnow()
+                    # Seed network parameters so the table is the one place to adjust them
+                    model = models.get(coin_name)
+                    if model is not None:
+                        crypto.network_difficulty = crypto.network_difficulty or model.difficulty
+                        crypto.block_reward = crypto.block_reward if crypto.block_reward is not None else model.block_reward
+            
+            PriceHistory.record({
+                symbol: prices[coin_name].get('usd') for coin_name, (_, symbol) in coins_config.items()
+                if coin_name in prices and not prices[coin_name].get('stale')
+            })
             
             db.session.commit()
+            bump_version('coins')
+            coin_registry.coefficients()  # Precompute here rather than on the next request
             logger.info("Cryptocurrency data updated successfully")
         except Exception as e:
             logger.error(f"Error updating crypto data: {e}")
+            db.session.rollback()
+            if raise_errors:
+                raise
 
 class ProfitabilityCalculator:
     """Calculate mining profitability based on miner specs and current conditions"""
     
     DEFAULT_ELECTRICITY_COST = 0.12  # $/kWh
     DEFAULT_POOL_FEE = 0.01  # 1%
-    BTC_BLOCKS_PER_DAY = 144
-    LTC_BLOCKS_PER_DAY = 576
     
     @staticmethod
-    def calculate_miner_profitability(miner, electricity_cost=None, pool_fee=None):
-        """Calculate comprehensive profitability metrics"""
+    def calculate_miner_profitability(miner, electricity_cost=None, pool_fee=None, prices=None, coefficients=None):
+        """Calculate comprehensive profitability metrics
+        
+        Revenue comes from the per-algorithm coin_registry coefficient, so a
+        miner costs one multiply-add; prices ({coin_id: {'usd': x}}) overrides
+        the stored coin prices.
+        """
         if electricity_cost is None:
             electricity_cost = ProfitabilityCalculator.DEFAULT_ELECTRICITY_COST
         if pool_fee is None:
             pool_fee = ProfitabilityCalculator.DEFAULT_POOL_FEE
         
         try:
-            # Get current crypto price
-            api = CryptoPriceAPI()
-            prices = api.get_crypto_prices(['bitcoin', 'litecoin'])
-            
-            # Determine coin based on algorithm
-            if 'SHA-256' in miner.algorithm or 'Bitcoin' in miner.algorithm:
-                crypto_price = prices.get('bitcoin', {}).get('usd', 50000)
-                daily_blocks = ProfitabilityCalculator.BTC_BLOCKS_PER_DAY
-                coin_symbol = 'BTC'
-            elif 'Scrypt' in miner.algorithm:
-                crypto_price = prices.get('litecoin', {}).get('usd', 200)
-                daily_blocks = ProfitabilityCalculator.LTC_BLOCKS_PER_DAY
-                coin_symbol = 'LTC'
-            else:
-                crypto_price = 50000
-                daily_blocks = 144
-                coin_symbol = 'BTC'
+            coefficient = coin_registry.coefficient(miner.algorithm, prices, coefficients)
             
-            # Calculate daily mining output
-            daily_output = ProfitabilityCalculator._calculate_daily_output(
-                miner.hash_rate,
-                miner.algorithm
-            )
+            # Daily mining output and revenue per TH/s
+            daily_output = miner.hash_rate * coefficient.output_per_th
+            daily_revenue = miner.hash_rate * coefficient.revenue_per_th
             
             # Calculate costs
             daily_electricity_cost = (miner.power_consumption * 24 / 1000) * electricity_cost
-            daily_revenue = daily_output * crypto_price
             daily_pool_fee = daily_revenue * pool_fee
             
             # Calculate net profit
@@ -145,8 +157,8 @@ class ProfitabilityCalculator:
                 'monthly_net_profit': daily_net_profit * 30,
                 'yearly_net_profit': daily_net_profit * 365,
                 'roi_days': roi_days,
-                'crypto_price': crypto_price,
-                'coin_symbol': coin_symbol,
+                'crypto_price': coefficient.price,
+                'coin_symbol': coefficient.symbol,
                 'electricity_cost': electricity_cost,
                 'pool_fee': pool_fee
             }
@@ -154,25 +166,6 @@ class ProfitabilityCalculator:
             logger.error(f"Error calculating profitability: {e}")
             return ProfitabilityCalculator._get_fallback_profitability(miner, electricity_cost)
     
-    @staticmethod
-    def _calculate_daily_output(hash_rate_th, algorithm):
-        """Calculate daily cryptocurrency output based on hash rate"""
-        # Simplified calculation - in production, use actual network data
-        # Hash rate is in TH/s (tera-hashes per second)
-        
-        if 'SHA-256' in algorithm or 'Bitcoin' in algorithm:
-            # Bitcoin network difficulty ~80T, block reward ~6.25 BTC, 144 blocks/day
-            network_difficulty = 80000000000000
-            daily_output = (hash_rate_th * 1e12) / network_difficulty * 6.25 * 144 / (24 * 3600)
-        elif 'Scrypt' in algorithm:
-            # Litecoin network difficulty ~20M, block reward ~12.5 LTC, 576 blocks/day
-            network_difficulty = 20000000
-            daily_output = (hash_rate_th * 1e12) / network_difficulty * 12.5 * 576 / (24 * 3600)
-        else:
-            daily_output = hash_rate_th * 0.0001  # Fallback
-        
-        return max(0, daily_output)
-    
     @staticmethod
     def _get_fallback_profitability(miner, electricity_cost):
         """Return fallback profitability if calculation fails"""
@@ -195,92 +188,314 @@ class ProfitabilityCalculator:
         }
     
     @staticmethod
-    def update_all_profitability_data():
-        """Update profitability data for all miners in database"""
+    def update_all_profitability_data(raise_errors=False):
+        """Update profitability data for all miners in database; raise_errors re-raises after logging"""
         try:
-            miners = ASICMiner.query.filter_by(is_available=True).all()
+            engine = BatchProfitabilityEngine()
+            catalog = engine.load_catalog()
+            results = engine.calculate(
+                catalog['hash_rate'],
+                catalog['power_consumption'],
+                catalog['price_usd'],
+                catalog['algorithm']
+            )
             
-            for miner in miners:
-                profitability = ProfitabilityCalculator.calculate_miner_profitability(miner)
-                
-                # Create new profitability record
-                profit_record = ProfitabilityData(
-                    miner_id=miner.id,
-                    daily_profit_usd=profitability['daily_net_profit'],
-                    monthly_profit_usd=profitability['monthly_net_profit'],
-                    yearly_profit_usd=profitability['yearly_net_profit'],
-                    electricity_cost=profitability['electricity_cost'],
-                    net_profit_daily=profitability['daily_net_profit'],
-                    roi_days=profitability['roi_days'],
-                    data_source='internal'
+            miner_ids = catalog['id'].tolist()
+            daily_net = results['daily_net_profit'].tolist()
+            monthly_net = results['monthly_net_profit'].tolist()
+            yearly_net = results['yearly_net_profit'].tolist()
+            roi_days = results['roi_days'].tolist()
+            
+            # Update miner profitability scores (bulk UPDATE by primary key)
+            if miner_ids:
+                db.session.execute(
+                    db.update(ASICMiner),
+                    [{'id': miner_ids[i], 'profitability_score': daily_net[i]} for i in range(len(miner_ids))]
                 )
-                db.session.add(profit_record)
-                
-                # Update miner profitability score
-                miner.profitability_score = profitability['daily_net_profit']
+                db.session.commit()
             
-            db.session.commit()
-            logger.info(f"Updated profitability data for {len(miners)} miners")
+            # Write new profitability records in batched executemany inserts
+            timestamp = datetime.utcnow()
+            ProfitabilityStore.bulk_insert(
+                {
+                    'miner_id': miner_ids[i],
+                    'daily_profit_usd': daily_net[i],
+                    'monthly_profit_usd': monthly_net[i],
+                    'yearly_profit_usd': yearly_net[i],
+                    'electricity_cost': engine.electricity_cost,
+                    'net_profit_daily': daily_net[i],
+                    'roi_days': roi_days[i],
+                    'timestamp': timestamp,
+                    'data_source': 'internal'
+                }
+                for i in range(len(miner_ids))
+            )
+            
+            bump_version('catalog')
+            PriceAlertEngine.evaluate_all()
+            logger.info(f"Updated profitability data for {len(miner_ids)} miners")
         except Exception as e:
             logger.error(f"Error updating profitability data: {e}")
             db.session.rollback()
+            if raise_errors:
+                raise
 
-class MiningNowScraper:
-    """Scrape mining data from miningnow.com"""
+class BatchProfitabilityEngine:
+    """Vectorized profitability calculation for a whole miner catalog
     
-    def __init__(self):
-        self.base_url = "https://miningnow.com"
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        })
+    Takes one snapshot of the coin_registry coefficients and evaluates every
+    miner in one NumPy pass.
+    Results match ProfitabilityCalculator.calculate_miner_profitability
+    for the same prices, electricity cost and pool fee.
+    """
     
-    def get_top_miners(self, limit=10):
-        """Scrape top miners - returns sample data due to site structure variations"""
-        logger.info(f"Attempting to scrape top {limit} miners from {self.base_url}")
-        try:
-            response = self.session.get(f"{self.base_url}/miners", timeout=10)
-            response.raise_for_status()
-            
-            soup = BeautifulSoup(response.content, 'html.parser')
-            miners_data = []
-            
-            # This is a fallback - actual scraping depends on site structure
-            # In production, you'd parse the actual HTML structure
-            return self._get_sample_miners_data()
-        except Exception as e:
-            logger.error(f"Error scraping miningnow.com: {e}")
-            return self._get_sample_miners_data()
+    def __init__(self, prices=None, electricity_cost=None, pool_fee=None):
+        if electricity_cost is None:
+            electricity_cost = ProfitabilityCalculator.DEFAULT_ELECTRICITY_COST
+        if pool_fee is None:
+            pool_fee = ProfitabilityCalculator.DEFAULT_POOL_FEE
+        
+        self.prices = prices
+        self.electricity_cost = electricity_cost
+        self.pool_fee = pool_fee
+        self.coefficients = coin_registry.coefficients(prices)
     
     @staticmethod
-    def _get_sample_miners_data():
-        """Return sample miners data for demonstration"""
-        return [
-            {
-                'name': 'Antminer S19 Pro',
-                'manufacturer': 'Bitmain',
-                'algorithm': 'SHA-256',
-                'hash_rate': 110.0,  # TH/s
-                'power_consumption': 1450,  # Watts
-                'price': 6500,
-                'profitability_daily': 8.5
-            },
-            {
-                'name': 'Antminer S19j Pro',
-                'manufacturer': 'Bitmain',
-                'algorithm': 'SHA-256',
-                'hash_rate': 100.0,
-                'power_consumption': 1320,
-                'price': 5500,
-                'profitability_daily': 7.8
+    def load_catalog(available_only=True):
+        """Load the listing columns needed for profitability as NumPy arrays"""
+        query = db.session.query(
+            ASICMiner.id,
+            ASICMiner.hash_rate,
+            ASICMiner.power_consumption,
+            ASICMiner.price_usd,
+            ASICMiner.algorithm
+        )
+        if available_only:
+            query = query.filter(ASICMiner.is_available == True)
+        rows = query.order_by(ASICMiner.id).all()
+        
+        return {
+            'id': np.fromiter((r[0] for r in rows), dtype=np.int64, count=len(rows)),
+            'hash_rate': np.fromiter((r[1] for r in rows), dtype=np.float64, count=len(rows)),
+            'power_consumption': np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows)),
+            'price_usd': np.fromiter((r[3] for r in rows), dtype=np.float64, count=len(rows)),
+            'algorithm': np.array([r[4] for r in rows], dtype=object)
+        }
+    
+    def _coefficient_arrays(self, algorithms):
+        """Per-miner revenue and output coefficients, symbols and coin prices"""
+        # Only a handful of distinct algorithms exist, so resolve each once
+        distinct = {}
+        for algorithm in set(algorithms):
+            distinct[algorithm] = len(distinct)
+        table = [coin_registry.coefficient(algorithm, coefficients=self.coefficients) for algorithm in distinct]
+        codes = np.fromiter((distinct[a] for a in algorithms), dtype=np.int64, count=len(algorithms))
+        return (
+            np.array([c.revenue_per_th for c in table], dtype=np.float64)[codes],
+            np.array([c.output_per_th for c in table], dtype=np.float64)[codes],
+            np.array([c.symbol for c in table], dtype=object)[codes],
+            np.array([c.price for c in table], dtype=np.float64)[codes]
+        )
+    
+    def calculate(self, hash_rate, power_consumption, price_usd, algorithms, electricity_cost=None, pool_fee=None):
+        """Compute profitability metrics for every miner at once
+        
+        electricity_cost and pool_fee default to the engine's and may be
+        per-miner arrays.
+        """
+        electricity_cost = self.electricity_cost if electricity_cost is None else np.asarray(electricity_cost, dtype=np.float64)
+        pool_fee = self.pool_fee if pool_fee is None else np.asarray(pool_fee, dtype=np.float64)
+        hash_rate = np.asarray(hash_rate, dtype=np.float64)
+        power_consumption = np.asarray(power_consumption, dtype=np.float64)
+        price_usd = np.asarray(price_usd, dtype=np.float64)
+        revenue_per_th, output_per_th, coin_symbol, crypto_price = self._coefficient_arrays(algorithms)
+        
+        # Same operation order as the scalar path
+        daily_output = hash_rate * output_per_th
+        daily_revenue = hash_rate * revenue_per_th
+        daily_electricity_cost = (power_consumption * 24 / 1000) * electricity_cost
+        daily_pool_fee = daily_revenue * pool_fee
+        daily_net_profit = daily_revenue - daily_electricity_cost - daily_pool_fee
+        
+        profitable = daily_net_profit > 0
+        roi_days = np.full(daily_net_profit.shape, np.inf)
+        np.divide(price_usd, daily_net_profit, out=roi_days, where=profitable)
+        
+        return {
+            'daily_output': daily_output,
+            'daily_revenue': daily_revenue,
+            'daily_electricity_cost': daily_electricity_cost,
+            'daily_pool_fee': daily_pool_fee,
+            'daily_net_profit': daily_net_profit,
+            'monthly_net_profit': daily_net_profit * 30,
+            'yearly_net_profit': daily_net_profit * 365,
+            'roi_days': roi_days,
+            'crypto_price': crypto_price,
+            'coin_symbol': coin_symbol
+        }
+    
+    def sensitivity_grid(self, miner, electricity_costs, pool_fees, coin_prices=None):
+        """Net profit and ROI for every pool fee x coin price x electricity cost combination in one pass
+        
+        coin_prices are prices of the algorithm's primary coin; revenue from
+        merge-mined coins is assumed to move with it. Result arrays are indexed
+        [pool_fee][coin_price][electricity_cost].
+        """
+        coefficient = coin_registry.coefficient(miner.algorithm, coefficients=self.coefficients)
+        electricity_costs = np.asarray(electricity_costs, dtype=np.float64)
+        pool_fees = np.asarray(pool_fees, dtype=np.float64)
+        coin_prices = np.asarray([coefficient.price] if coin_prices is None else coin_prices, dtype=np.float64)
+        scale = coin_prices / coefficient.price if coefficient.price else np.zeros_like(coin_prices)
+        
+        daily_revenue = miner.hash_rate * coefficient.revenue_per_th * scale
+        daily_kwh = miner.power_consumption * 24 / 1000
+        revenue = daily_revenue[np.newaxis, :, np.newaxis]
+        daily_pool_fee = revenue * pool_fees[:, np.newaxis, np.newaxis]
+        daily_net_profit = revenue - (daily_kwh * electricity_costs)[np.newaxis, np.newaxis, :] - daily_pool_fee
+        
+        profitable = daily_net_profit > 0
+        roi_days = np.full(daily_net_profit.shape, np.inf)
+        np.divide(miner.price_usd, daily_net_profit, out=roi_days, where=profitable)
+        
+        # Electricity price at which each fee/price scenario stops earning
+        after_fees = daily_revenue[np.newaxis, :] - daily_revenue[np.newaxis, :] * pool_fees[:, np.newaxis]
+        break_even = after_fees / daily_kwh if daily_kwh else np.full(after_fees.shape, np.inf)
+        
+        return {
+            'electricity_cost': electricity_costs,
+            'pool_fee': pool_fees,
+            'coin_price': coin_prices,
+            'daily_revenue': daily_revenue,
+            'daily_net_profit': daily_net_profit,
+            'roi_days': roi_days,
+            'break_even_electricity_cost': break_even,
+            'coin_symbol': coefficient.symbol,
+            'current_coin_price': coefficient.price
+        }
+    
+    def calculate_miners(self, miners):
+        """Compute profitability for a list of ASICMiner objects"""
+        return self.calculate(
+            [m.hash_rate for m in miners],
+            [m.power_consumption for m in miners],
+            [m.price_usd for m in miners],
+            [m.algorithm for m in miners]
+        )
+    
+    @staticmethod
+    def normalize_fleet(lines, max_lines=None):
+        """Validate fleet lines into dicts of miner_id, quantity and optional electricity_cost/pool_fee; raises ValueError"""
+        if not isinstance(lines, list) or not lines:
+            raise ValueError('Fleet must be a non-empty list of lines')
+        if max_lines and len(lines) > max_lines:
+            raise ValueError(f'Fleet has more than {max_lines} lines')
+        fleet = []
+        for item in lines:
+            try:
+                line = {'miner_id': int(item['miner_id']), 'quantity': int(item.get('quantity', 1))}
+                for name in ('electricity_cost', 'pool_fee'):
+                    if item.get(name) is not None:
+                        line[name] = float(item[name])
+            except (KeyError, TypeError, ValueError, OverflowError, AttributeError):
+                raise ValueError('Invalid fleet line')
+            if line['quantity'] <= 0:
+                raise ValueError('Quantity must be positive')
+            electricity_cost, pool_fee = line.get('electricity_cost', 0), line.get('pool_fee', 0)
+            if not (math.isfinite(electricity_cost) and electricity_cost >= 0) or not 0 <= pool_fee < 1:
+                raise ValueError('electricity_cost must be finite and not negative and pool_fee must be in [0, 1)')
+            fleet.append(line)
+        return fleet
+    
+    def fleet(self, lines):
+        """Per-line and total profitability for normalized fleet lines
+        
+        All referenced miners are loaded in one query and priced against this
+        engine's coefficient snapshot; lines without their own electricity
+        cost or pool fee use the engine's. Raises ValueError for unknown miners.
+        """
+        ids = {line['miner_id'] for line in lines}
+        rows = {
+            row.id: row for row in db.session.query(
+                ASICMiner.id, ASICMiner.name, ASICMiner.hash_rate, ASICMiner.power_consumption,
+                ASICMiner.price_usd, ASICMiner.algorithm
+            ).filter(ASICMiner.id.in_(ids))
+        }
+        missing = sorted(ids - set(rows))
+        if missing:
+            raise ValueError(f"Unknown miner ids: {', '.join(map(str, missing))}")
+        
+        miners = [rows[line['miner_id']] for line in lines]
+        quantity = np.array([line['quantity'] for line in lines], dtype=np.float64)
+        electricity_cost = np.array([line.get('electricity_cost', self.electricity_cost) for line in lines], dtype=np.float64)
+        pool_fee = np.array([line.get('pool_fee', self.pool_fee) for line in lines], dtype=np.float64)
+        unit = self.calculate(
+            [m.hash_rate for m in miners],
+            [m.power_consumption for m in miners],
+            [m.price_usd for m in miners],
+            [m.algorithm for m in miners],
+            electricity_cost,
+            pool_fee
+        )
+        
+        capital_cost = np.array([m.price_usd for m in miners], dtype=np.float64) * quantity
+        power_kw = np.array([m.power_consumption for m in miners], dtype=np.float64) * quantity / 1000
+        totals = {
+            name: unit[name] * quantity
+            for name in ('daily_revenue', 'daily_electricity_cost', 'daily_pool_fee', 'daily_net_profit')
+        }
+        
+        result_lines = [{
+            'miner_id': m.id,
+            'name': m.name,
+            'quantity': int(quantity[i]),
+            'electricity_cost': float(electricity_cost[i]),
+            'pool_fee': float(pool_fee[i]),
+            'coin_symbol': unit['coin_symbol'][i],
+            'unit_daily_net_profit': float(unit['daily_net_profit'][i]),
+            'capital_cost': float(capital_cost[i]),
+            'daily_revenue': float(totals['daily_revenue'][i]),
+            'daily_electricity_cost': float(totals['daily_electricity_cost'][i]),
+            'daily_pool_fee': float(totals['daily_pool_fee'][i]),
+            'daily_net_profit': float(totals['daily_net_profit'][i]),
+            'monthly_net_profit': float(totals['daily_net_profit'][i] * 30),
+            'yearly_net_profit': float(totals['daily_net_profit'][i] * 365),
+            'roi_days': float(unit['roi_days'][i]),
+            'power_draw_kw': float(power_kw[i])
+        } for i, m in enumerate(miners)]
+        
+        daily_net_profit = float(totals['daily_net_profit'].sum())
+        total_capital = float(capital_cost.sum())
+        return {
+            'lines': result_lines,
+            'totals': {
+                'units': int(quantity.sum()),
+                'capital_cost': total_capital,
+                'daily_revenue': float(totals['daily_revenue'].sum()),
+                'daily_electricity_cost': float(totals['daily_electricity_cost'].sum()),
+                'daily_pool_fee': float(totals['daily_pool_fee'].sum()),
+                'daily_net_profit': daily_net_profit,
+                'monthly_net_profit': daily_net_profit * 30,
+                'yearly_net_profit': daily_net_profit * 365,
+                'roi_days': total_capital / daily_net_profit if daily_net_profit > 0 else float('inf'),
+                'power_draw_kw': float(power_kw.sum()),
+                'daily_energy_kwh': float(power_kw.sum() * 24)
             },
-            {
-                'name': 'MicroBT Whatsminer M50S',
-                'manufacturer': 'MicroBT',
-                'algorithm': 'SHA-256',
-                'hash_rate': 126.0,
-                'power_consumption': 1632,
-                'price': 7200,
-                'profitability_daily': 9.2
+            'coin_prices': {
+                c.symbol: c.price for c in self.coefficients.values() if c.symbol
             }
-        ]
+        }
+    
+    @staticmethod
+    def record_analytics(user_id, fleet_result):
+        """Bulk insert one MiningAnalytics row per fleet line; the caller commits"""
+        now = datetime.utcnow()
+        db.session.execute(db.insert(MiningAnalytics), [{
+            'user_id': user_id,
+            'miner_id': line['miner_id'],
+            'electricity_rate': line['electricity_cost'],
+            'mining_pool_fee': line['pool_fee'],
+            'calculated_profitability': line['unit_daily_net_profit'],
+            'last_calculated': now,
+            'created_at': now
+        } for line in fleet_result['lines']])
+        return len(fleet_result['lines'])
@@ -0,0 +1,345 @@
+"""
+Monte Carlo ROI simulation
+
+The static ROI in calculate_miner_profitability() assumes today's coin price
+and difficulty hold forever. Here a miner's revenue is instead driven by
+simulated paths: coin price follows a geometric Brownian motion, network
+difficulty grows log-normally, and block rewards halve on the coin model's
+schedule. Price and difficulty only enter revenue through their ratio, so one
+normal draw per path and day gives the daily revenue multiplier
+
+    log(R_t / R_0) = sum of N(((mu - sp^2/2) - (g - sd^2/2)) / 365, (sp^2 + sd^2) / 365)
+
+Miners of the same algorithm share the paths (common random numbers), so a
+catalog-wide run draws each algorithm's paths once per chunk and every miner
+costs one multiply-add, cumsum and comparison over the (paths, days) block.
+Break-even is the first day cumulative net profit covers the purchase price;
+results are reported as P10/P50/P90 over paths.
+
+Paths are generated in fixed-size chunks, each with its own child of the
+seed's SeedSequence, so a seeded run gives the same numbers whether it runs
+inline or across a process pool. Default-seed distributions are cached in
+the SimulationResult table per miner and parameter set for
+SIMULATION_CACHE_TTL seconds (expired rows are pruned hourly); market inputs
+(coin price, difficulty) are read at simulation time and are deliberately not
+part of the key, the paths already cover far larger moves than a few hours of
+market drift. Once a coin has enough recorded price
+history (app/prices.py) its realized volatility replaces the default.
+"""
+import json
+import math
+import zlib
+import time
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, date
+import numpy as np
+from flask import current_app
+from app.models import db, dialect_insert, ASICMiner, SimulationResult
+from app.coins import coin_registry
+from app.prices import PriceHistory
+
+logger = logging.getLogger(__name__)
+
+CHUNK_PATHS = 2000  # Paths per work unit; fixed so seeded results do not depend on the process count
+MODEL_VERSION = 1  # Part of the cache key; bump when the simulation model changes
+PERCENTILES = (10, 50, 90)
+
+# Annualized defaults per algorithm: price volatility and expected difficulty growth
+ALGORITHM_DEFAULTS = {
+    'SHA-256': {'price_volatility': 0.55, 'difficulty_growth': 0.35},
+    'Scrypt': {'price_volatility': 0.75, 'difficulty_growth': 0.20},
+    'Etchash': {'price_volatility': 0.85, 'difficulty_growth': 0.10},
+    'RandomX': {'price_volatility': 0.70, 'difficulty_growth': 0.10},
+    'kHeavyHash': {'price_volatility': 1.00, 'difficulty_growth': 0.60},
+}
+
+BASE_PARAMS = {
+    'price_drift': 0.0,
+    'price_volatility': 0.70,
+    'difficulty_growth': 0.25,
+    'difficulty_volatility': 0.10,
+    'electricity_cost': 0.12,
+    'pool_fee': 0.01,
+    'shutdown_when_unprofitable': True,  # Switch off on days that lose money instead of mining at a loss
+    'seed': 0,
+}
+
+def _simulate_chunk(task):
+    """Break-even day (0 = not within the horizon) and final profit per miner for one chunk of paths
+
+    task is (seed, paths, horizon, drift, volatility, reward_schedule, scale,
+    cost, price, shutdown) with per-miner numpy arrays scale (revenue at the
+    day-0 market, after pool fee), cost (electricity) and price (purchase).
+    Runs in pool workers, so it only touches numpy.
+    """
+    seed, paths, horizon, drift, volatility, reward_schedule, scale, cost, price, shutdown = task
+    rng = np.random.default_rng(seed)
+    factors = rng.standard_normal((paths, horizon), dtype=np.float32)
+    factors *= np.float32(volatility)
+    factors += np.float32(drift)
+    np.cumsum(factors, axis=1, out=factors)
+    np.exp(factors, out=factors)
+    factors *= reward_schedule
+
+    break_even = np.zeros((len(scale), paths), dtype=np.int32)
+    final_profit = np.zeros((len(scale), paths), dtype=np.float32)
+    profit = np.empty_like(factors)
+    for m in range(len(scale)):
+        np.multiply(factors, np.float32(scale[m]), out=profit)
+        profit -= np.float32(cost[m])
+        if shutdown:
+            np.maximum(profit, 0, out=profit)
+        np.cumsum(profit, axis=1, out=profit)
+        reached = profit >= price[m]
+        # Cumulative profit never falls when the miner shuts down, so the last day decides
+        hit = reached[:, -1] if shutdown else reached.any(axis=1)
+        break_even[m] = np.where(hit, reached.argmax(axis=1) + 1, 0)
+        final_profit[m] = profit[:, -1] - price[m]
+    return break_even, final_profit
+
+def _reward_schedule(coefficient, horizon, today=None):
+    """Revenue multiplier per day from scheduled block reward halvings of the algorithm's primary coin"""
+    schedule = np.ones(horizon, dtype=np.float32)
+    models = coin_registry.models.get(coefficient.algorithm)
+    if not models or not models[0].next_halving or not coefficient.revenue_per_th:
+        return schedule
+    primary = models[0]
+    # Merge-mined coins keep their reward, so only the primary coin's share halves
+    share = coefficient.output_per_th * coefficient.price / coefficient.revenue_per_th
+    interval = primary.halving_interval_days
+    day = (primary.next_halving - (today or date.today())).days
+    while day < 0 and interval:
+        day += interval
+    halvings = np.zeros(horizon, dtype=np.float32)
+    while 0 <= day < horizon:
+        halvings[day:] += 1  # Index t is day t + 1, the first full day after the halving
+        if not interval:
+            break
+        day += interval
+    return (share * 0.5 ** halvings + (1 - share)).astype(np.float32)
+
+def _percentiles(values, decimals):
+    """{'p10', 'p50', 'p90'} of values with non-finite percentiles (never breaking even) as None"""
+    points = np.percentile(values, PERCENTILES, method='higher')
+    return {
+        f'p{q}': (round(float(v), decimals) if np.isfinite(v) else None)
+        for q, v in zip(PERCENTILES, points)
+    }
+
+class RoiSimulator:
+    """Runs ROI simulations for miners and caches the distributions"""
+
+    def __init__(self, processes=None, chunk_paths=CHUNK_PATHS, max_paths=None, max_horizon=None):
+        config = current_app.config
+        self.processes = processes if processes is not None else config.get('SIMULATION_PROCESSES', 1)
+        self.chunk_paths = chunk_paths
+        self.default_paths = config.get('SIMULATION_PATHS', 10000)
+        self.max_paths = max_paths or config.get('SIMULATION_MAX_PATHS', 100000)
+        self.default_horizon = config.get('SIMULATION_HORIZON_DAYS', 1095)
+        self.max_horizon = max_horizon or config.get('SIMULATION_MAX_HORIZON_DAYS', 1825)
+        self.cache_ttl = config.get('SIMULATION_CACHE_TTL', 21600)
+        self._history_volatility = {}
+
+    def resolve_params(self, algorithm, overrides=None):
+        """Full parameter set for an algorithm: overrides over per-algorithm defaults; raises ValueError"""
+        params = dict(BASE_PARAMS)
+        params['electricity_cost'] = current_app.config.get('DEFAULT_ELECTRICITY_COST', params['electricity_cost'])
+        params['pool_fee'] = current_app.config.get('DEFAULT_POOL_FEE', params['pool_fee'])
+        params.update(ALGORITHM_DEFAULTS.get(coin_registry.resolve(algorithm), {}))
+        volatility = self._price_volatility(algorithm)
+        if volatility is not None:
+            params['price_volatility'] = round(volatility, 4)
+        params['paths'] = self.default_paths
+        params['horizon_days'] = self.default_horizon
+        params.update({name: value for name, value in (overrides or {}).items() if value is not None})
+
+        params['paths'] = int(params['paths'])
+        params['horizon_days'] = int(params['horizon_days'])
+        params['seed'] = int(params['seed'])
+        params['shutdown_when_unprofitable'] = bool(params['shutdown_when_unprofitable'])
+        for name in ('price_drift', 'price_volatility', 'difficulty_growth', 'difficulty_volatility',
+                     'electricity_cost', 'pool_fee'):
+            params[name] = float(params[name])
+            if not math.isfinite(params[name]):
+                raise ValueError(f'{name} must be a finite number')
+        if not 1 <= params['paths'] <= self.max_paths:
+            raise ValueError(f'paths must be between 1 and {self.max_paths}')
+        if not 1 <= params['horizon_days'] <= self.max_horizon:
+            raise ValueError(f'horizon_days must be between 1 and {self.max_horizon}')
+        if params['price_volatility'] < 0 or params['difficulty_volatility'] < 0:
+            raise ValueError('Volatilities must not be negative')
+        if params['electricity_cost'] < 0 or not 0 <= params['pool_fee'] < 1:
+            raise ValueError('electricity_cost must not be negative and pool_fee must be in [0, 1)')
+        if params['seed'] < 0:
+            raise ValueError('seed must not be negative')
+        return params
+
+    def _price_volatility(self, algorithm):
+        """Realized volatility of the algorithm's primary coin from recorded price history, if long enough"""
+        resolved = coin_registry.resolve(algorithm)
+        if resolved not in self._history_volatility:
+            models = coin_registry.models.get(resolved)
+            self._history_volatility[resolved] = PriceHistory.volatility(models[0].symbol) if models else None
+        return self._history_volatility[resolved]
+
+    @staticmethod
+    def cache_key(miner, params):
+        """Stable key for a miner's specs and a resolved parameter set"""
+        payload = json.dumps({
+            'v': MODEL_VERSION,
+            'miner': [miner.id, miner.hash_rate, miner.power_consumption, miner.price_usd, miner.algorithm],
+            'params': params
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _tasks(self, algorithm, miners, params, coefficients):
+        """Chunk tasks for miners that share an algorithm and parameter set"""
+        coefficient = coin_registry.coefficient(algorithm, coefficients=coefficients)
+        scale = np.array([m.hash_rate * coefficient.revenue_per_th * (1 - params['pool_fee']) for m in miners])
+        cost = np.array([m.power_consumption * 24 / 1000 * params['electricity_cost'] for m in miners])
+        price = np.array([m.price_usd for m in miners], dtype=np.float64)
+
+        horizon = params['horizon_days']
+        sp, sd = params['price_volatility'], params['difficulty_volatility']
+        drift = ((params['price_drift'] - sp ** 2 / 2) - (params['difficulty_growth'] - sd ** 2 / 2)) / 365
+        volatility = np.sqrt((sp ** 2 + sd ** 2) / 365)
+        schedule = _reward_schedule(coefficient, horizon)
+
+        chunks = -(-params['paths'] // self.chunk_paths)
+        root = np.random.SeedSequence([params['seed'], zlib.crc32((coefficient.algorithm or '').encode())])
+        return coefficient, scale, cost, price, [
+            (seed, min(self.chunk_paths, params['paths'] - i * self.chunk_paths), horizon, drift, volatility,
+             schedule, scale, cost, price, params['shutdown_when_unprofitable'])
+            for i, seed in enumerate(root.spawn(chunks))
+        ]
+
+    def simulate(self, miners, overrides=None, coefficients=None):
+        """{miner_id: result} for miners, sharing paths between miners with the same algorithm and parameters"""
+        if coefficients is None:
+            coefficients = coin_registry.coefficients()
+        groups = {}
+        for miner in miners:
+            params = self.resolve_params(miner.algorithm, overrides)
+            key = (coin_registry.resolve(miner.algorithm), json.dumps(params, sort_keys=True))
+            groups.setdefault(key, (miner.algorithm, params, []))[2].append(miner)
+
+        plans = []
+        for algorithm, params, group in groups.values():
+            coefficient, scale, cost, price, tasks = self._tasks(algorithm, group, params, coefficients)
+            plans.append((params, group, coefficient, scale, cost, price, tasks))
+        all_tasks = [task for plan in plans for task in plan[6]]
+
+        if self.processes > 1 and len(all_tasks) > 1:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=min(self.processes, len(all_tasks)), mp_context=context) as pool:
+                outputs = list(pool.map(_simulate_chunk, all_tasks))
+        else:
+            outputs = [_simulate_chunk(task) for task in all_tasks]
+
+        results = {}
+        offset = 0
+        for params, group, coefficient, scale, cost, price, tasks in plans:
+            chunk_outputs = outputs[offset:offset + len(tasks)]
+            offset += len(tasks)
+            break_even = np.concatenate([output[0] for output in chunk_outputs], axis=1)
+            final_profit = np.concatenate([output[1] for output in chunk_outputs], axis=1)
+            for m, miner in enumerate(group):
+                days = break_even[m].astype(np.float64)
+                days[days == 0] = np.inf
+                daily_net = scale[m] - cost[m]
+                results[miner.id] = {
+                    'miner_id': miner.id,
+                    'coin_symbol': coefficient.symbol,
+                    'paths': params['paths'],
+                    'horizon_days': params['horizon_days'],
+                    'break_even_day': _percentiles(days, 0),
+                    'probability_break_even': round(float(np.isfinite(days).mean()), 4),
+                    'profit_at_horizon': _percentiles(final_profit[m], 2),
+                    'static_roi_days': round(price[m] / daily_net, 1) if daily_net > 0 else None,
+                    'params': params,
+                    'simulated_at': datetime.utcnow().isoformat()
+                }
+        return results
+
+    def _store(self, miners, results):
+        """Upsert results into the cache table; the caller commits"""
+        rows = []
+        for miner in miners:
+            params = results[miner.id]['params']
+            rows.append({
+                'cache_key': self.cache_key(miner, params),
+                'miner_id': miner.id,
+                'result': json.dumps(results[miner.id]),
+                'created_at': datetime.utcnow()
+            })
+        for start in range(0, len(rows), 500):
+            stmt = dialect_insert(SimulationResult).values(rows[start:start + 500])
+            db.session.execute(stmt.on_conflict_do_update(
+                index_elements=[SimulationResult.cache_key],
+                set_={'result': stmt.excluded.result, 'created_at': stmt.excluded.created_at}
+            ))
+
+    def for_miner(self, miner, overrides=None):
+        """(result, cached) for one miner, simulating and storing it unless a fresh result is cached
+
+        Only default-seed runs are cached; any other seed is computed each time,
+        so callers cannot fill the table by cycling seeds.
+        """
+        params = self.resolve_params(miner.algorithm, overrides)
+        if params['seed'] != BASE_PARAMS['seed']:
+            return self.simulate([miner], overrides)[miner.id], False
+        key = self.cache_key(miner, params)
+        cutoff = datetime.utcnow() - timedelta(seconds=self.cache_ttl)
+        cached = db.session.query(SimulationResult.result).filter(
+            SimulationResult.cache_key == key, SimulationResult.created_at >= cutoff
+        ).scalar()
+        if cached is not None:
+            return json.loads(cached), True
+
+        result = self.simulate([miner], overrides)[miner.id]
+        try:
+            self._store([miner], {miner.id: result})
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error caching ROI simulation for miner {miner.id}: {e}")
+            db.session.rollback()
+        return result, False
+
+    def simulate_catalog(self, overrides=None):
+        """Simulate every available miner with the default (or given) parameters and cache the results"""
+        started = time.perf_counter()
+        try:
+            miners = ASICMiner.query.filter_by(is_available=True).order_by(ASICMiner.id).all()
+            results = self.simulate(miners, overrides)
+            self._store(miners, results)
+            self._delete_expired()
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error running catalog ROI simulation: {e}")
+            db.session.rollback()
+            raise
+        elapsed = time.perf_counter() - started
+        paths = sum(result['paths'] for result in results.values())
+        logger.info(f"Simulated ROI for {len(miners)} miners ({paths} miner-paths) in {elapsed:.1f}s")
+        return {'miners': len(miners), 'paths': paths, 'seconds': round(elapsed, 2)}
+
+    def _delete_expired(self):
+        """Delete cached results older than SIMULATION_CACHE_TTL; the caller commits"""
+        return db.session.execute(db.delete(SimulationResult).where(
+            SimulationResult.created_at < datetime.utcnow() - timedelta(seconds=self.cache_ttl)
+        ).execution_options(synchronize_session=False)).rowcount
+
+    def prune(self):
+        """Delete expired cached results; returns the number removed"""
+        try:
+            count = self._delete_expired()
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Error pruning ROI simulation cache: {e}")
+            db.session.rollback()
+            raise
+        logger.info(f"Pruned {count} expired ROI simulations")
+        return count
@@ -28,19 +28,53 @@ async function fetchCryptoPrices() {
     }
 }
 
-// Add to cart functionality
-function addToCart(minerId, quantity = 1) {
-    const cart = JSON.parse(localStorage.getItem('cart') || '[]');
-    const existingItem = cart.find(item => item.minerId === minerId);
-    
-    if (existingItem) {
-        existingItem.quantity += quantity;
-    } else {
-        cart.push({ minerId, quantity });
+// Live prices and profitability pushed over Server-Sent Events; topics are 'prices' and algorithm names
+function subscribeLiveData(topics, handlers) {
+    if (!window.EventSource) return null;
+    const query = topics && topics.length ? '?topics=' + encodeURIComponent(topics.join(',')) : '';
+    const source = new EventSource('/api/stream' + query);
+    Object.entries(handlers).forEach(([eventName, handler]) => {
+        source.addEventListener(eventName, event => handler(JSON.parse(event.data)));
+    });
+    return source;
+}
+
+// Add to cart functionality: reserves stock on the server, then records the line locally
+async function addToCart(minerId, quantity = 1) {
+    try {
+        const response = await fetch('/api/cart/hold', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ miner_id: minerId, quantity: quantity })
+        });
+        if (response.redirected) {
+            window.location = response.url;  // Not logged in
+            return;
+        }
+        const data = await response.json();
+        if (!data.success) {
+            alert(data.message || 'Could not add item to cart');
+            return;
+        }
+        
+        const cart = JSON.parse(localStorage.getItem('cart') || '[]');
+        const existingItem = cart.find(item => item.minerId === minerId);
+        
+        if (existingItem) {
+            existingItem.quantity += quantity;
+            existingItem.reservationIds = (existingItem.reservationIds || []).concat(data.reservation.id);
+        } else {
+            cart.push({ minerId, quantity, reservationIds: [data.reservation.id] });
+        }
+        
+        localStorage.setItem('cart', JSON.stringify(cart));
+        const expires = new Date(data.reservation.expires_at + 'Z').toLocaleTimeString();
+        alert(`Added ${quantity} item(s) to cart, reserved until ${expires}`);
+    } catch (error) {
+        console.error('Error:', error);
     }
-    
-    localStorage.setItem('cart', JSON.stringify(cart));
-    alert(`Added ${quantity} item(s) to cart`);
 }
 
 // Get cart from localStorage
@@ -80,6 +114,7 @@ async function toggleFavorite(minerId) {
 // Export functions for use in templates
 window.formatCurrency = formatCurrency;
 window.fetchCryptoPrices = fetchCryptoPrices;
+window.subscribeLiveData = subscribeLiveData;
 window.addToCart = addToCart;
 window.getCart = getCart;
 window.clearCart = clearCart;
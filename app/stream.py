@@ -0,0 +1,258 @@
+"""
+Server-Sent Events push channel for live prices and profitability
+
+One producer thread per process watches the 'coins' cache version (bumped
+by update_crypto_data() and network refreshes) and, when it moves, reads the
+coin prices and per-algorithm revenue coefficients once and publishes only
+the topics that changed:
+
+    prices              {coin_id: {'usd': price}} for every coin in the table
+    algorithm:<name>    revenue per TH/s per day and primary coin price
+
+Clients hold a Subscription whose mailbox keeps the latest event per topic
+rather than a queue, so a slow client never buffers more than one event per
+topic and simply receives the newest state when it catches up (superseded
+events are counted as coalesced). Idle connections get a comment heartbeat
+every STREAM_HEARTBEAT seconds, which is also how closed connections are
+noticed, and are closed after STREAM_MAX_DURATION so EventSource reconnects
+to a fresh worker. The number of viewers does not change the upstream cost:
+prices are still fetched by the scheduled update_crypto_prices job, and each
+process does one version check per STREAM_POLL_INTERVAL.
+
+Every connection holds a server thread, so run the web server with threaded
+or async workers (see Procfile) and keep STREAM_MAX_CONNECTIONS below the
+thread count.
+"""
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from app.models import db, Cryptocurrency
+from app.cache import get_version
+from app.coins import coin_registry
+
+logger = logging.getLogger(__name__)
+
+class StreamFull(Exception):
+    """Raised when a process already serves STREAM_MAX_CONNECTIONS streams"""
+
+class Subscription:
+    """One client's topics and its latest-event-per-topic mailbox"""
+
+    def __init__(self, topics):
+        self.topics = topics  # None means every topic
+        self._pending = OrderedDict()  # topic -> (event_id, event_name, data)
+        self._condition = threading.Condition()
+        self.closed = False
+        self.coalesced = 0
+
+    def wants(self, topic):
+        return self.topics is None or topic in self.topics
+
+    def deliver(self, topic, event):
+        with self._condition:
+            if topic in self._pending:
+                self.coalesced += 1
+                del self._pending[topic]
+            self._pending[topic] = event
+            self._condition.notify()
+
+    def receive(self, timeout):
+        """Pending events in publication order, waiting up to timeout; empty list on timeout or close"""
+        with self._condition:
+            if not self._pending and not self.closed:
+                self._condition.wait(timeout)
+            events = list(self._pending.values())
+            self._pending.clear()
+            return events
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify()
+
+class Broadcaster:
+    """Shared producer and subscriber registry for the live stream"""
+
+    def __init__(self):
+        self.app = None
+        self.poll_interval = 2
+        self.heartbeat = 15
+        self.max_duration = 3600
+        self.max_connections = 48
+        self._subscriptions = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()  # One refresh at a time: producer or first subscriber
+        self._snapshot = {}  # topic -> (event_id, event_name, data)
+        self._version = None
+        self._sequence = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._stats = {'connections_total': 0, 'rejected': 0, 'refreshes': 0, 'published': 0}
+
+    def init_app(self, app):
+        """Read STREAM_POLL_INTERVAL, STREAM_HEARTBEAT, STREAM_MAX_DURATION and STREAM_MAX_CONNECTIONS"""
+        self.app = app
+        self.poll_interval = app.config.get('STREAM_POLL_INTERVAL', self.poll_interval)
+        self.heartbeat = app.config.get('STREAM_HEARTBEAT', self.heartbeat)
+        self.max_duration = app.config.get('STREAM_MAX_DURATION', self.max_duration)
+        self.max_connections = app.config.get('STREAM_MAX_CONNECTIONS', self.max_connections)
+
+    def _ensure_producer(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='stream-producer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the producer thread and close every subscription"""
+        self._stop.set()
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            subscription.close()
+
+    def _run(self):
+        while not self._stop.wait(self.poll_interval):
+            with self._lock:
+                idle = not self._subscriptions
+            if idle:
+                continue
+            with self.app.app_context():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Error refreshing live stream data: {e}")
+                finally:
+                    db.session.remove()
+
+    def _build(self):
+        """{topic: (event_name, data)} for the current prices and coefficients"""
+        topics = {
+            'prices': ('prices', {
+                name: {'usd': price} for name, price in
+                db.session.query(Cryptocurrency.name, Cryptocurrency.current_price).order_by(Cryptocurrency.name)
+            })
+        }
+        for algorithm, coefficient in coin_registry.coefficients().items():
+            topics[f'algorithm:{algorithm}'] = ('profitability', {
+                'algorithm': algorithm,
+                'coin_symbol': coefficient.symbol,
+                'crypto_price': coefficient.price,
+                'revenue_per_th_day': coefficient.revenue_per_th,
+                'output_per_th_day': coefficient.output_per_th
+            })
+        return topics
+
+    def refresh(self, force=False):
+        """Publish the topics that changed since the last refresh; returns how many deliveries were made"""
+        with self._refresh_lock:
+            return self._refresh(force)
+
+    def _refresh(self, force):
+        version = get_version('coins')
+        if version == self._version and self._snapshot and not force:
+            return 0
+        topics = self._build()
+        self._stats['refreshes'] += 1
+
+        published = 0
+        with self._lock:
+            self._version = version
+            subscriptions = list(self._subscriptions)
+            changes = []
+            for topic, (name, data) in topics.items():
+                current = self._snapshot.get(topic)
+                if current is not None and current[1] == name and current[2] == data:
+                    continue
+                self._sequence += 1
+                event = (self._sequence, name, data)
+                self._snapshot[topic] = event
+                changes.append((topic, event))
+        for topic, event in changes:
+            for subscription in subscriptions:
+                if subscription.wants(topic):
+                    subscription.deliver(topic, event)
+                    published += 1
+        self._stats['published'] += published
+        return published
+
+    def topics(self):
+        """Every topic a client can subscribe to"""
+        return ['prices'] + [f'algorithm:{algorithm}' for algorithm in coin_registry.models]
+
+    def parse_topics(self, value):
+        """Topic set from a comma-separated list of 'prices' and algorithm names; None for all; raises ValueError"""
+        if not value:
+            return None
+        topics = set()
+        for name in value.split(','):
+            name = name.strip()
+            if not name:
+                continue
+            if name == 'prices':
+                topics.add(name)
+                continue
+            algorithm = coin_registry.resolve(name.split(':', 1)[-1])
+            if algorithm is None:
+                raise ValueError(f"Unknown topic {name}; available: {', '.join(self.topics())}")
+            topics.add(f'algorithm:{algorithm}')
+        return topics or None
+
+    def subscribe(self, topics=None):
+        """Register a subscription primed with the current state of its topics; raises StreamFull"""
+        subscription = Subscription(topics)
+        with self._lock:
+            if len(self._subscriptions) >= self.max_connections:
+                self._stats['rejected'] += 1
+                raise StreamFull(f'Live stream is at capacity ({self.max_connections} connections)')
+            self._subscriptions.add(subscription)
+            self._stats['connections_total'] += 1
+            needs_snapshot = not self._snapshot
+        self._ensure_producer()
+        if needs_snapshot:
+            self.refresh(force=True)
+        with self._lock:
+            snapshot = sorted(
+                ((topic, event) for topic, event in self._snapshot.items() if subscription.wants(topic)),
+                key=lambda item: item[1][0]
+            )
+        for topic, event in snapshot:
+            subscription.deliver(topic, event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        subscription.close()
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def events(self, subscription):
+        """SSE text chunks for a subscription until it closes, the client leaves or max_duration passes"""
+        deadline = time.monotonic() + self.max_duration
+        try:
+            yield f'retry: {int(self.poll_interval * 1000) + 1000}\n\n'
+            while not subscription.closed and time.monotonic() < deadline:
+                events = subscription.receive(min(self.heartbeat, max(deadline - time.monotonic(), 0)))
+                if not events:
+                    yield ': heartbeat\n\n'  # Comment line; keeps proxies open and surfaces dead connections
+                    continue
+                yield ''.join(
+                    f'id: {event_id}\nevent: {name}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+                    for event_id, name, data in events
+                )
+        finally:
+            self.unsubscribe(subscription)
+
+    def get_stats(self):
+        """Connection and publication counters for monitoring"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['connections'] = len(self._subscriptions)
+            stats['coalesced'] = sum(subscription.coalesced for subscription in self._subscriptions)
+            stats['producer_running'] = self._thread is not None and self._thread.is_alive()
+        return stats
+
+broadcaster = Broadcaster()
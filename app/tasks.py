@@ -0,0 +1,259 @@
+"""
+Durable background task queue backed by the application database
+
+enqueue() adds a QueuedTask row to the current session, so a task commits
+atomically with the request's own writes (transactional outbox) and is never
+lost or run for a rolled-back order. Worker processes (flask run-worker, or
+python -m app.tasks worker) claim due tasks in batches with a single
+UPDATE ... RETURNING, using FOR UPDATE SKIP LOCKED on PostgreSQL so workers
+never block on each other. Each handler runs in its own transaction together
+with marking its task done; failures are retried with exponential backoff and
+jitter until max_attempts, then parked as dead. A worker that dies mid-task
+leaves a lease that expires, after which the task is claimed again, so
+handlers must be idempotent. Needs no Redis or Celery. Web processes also
+drain the queue through the process_tasks scheduler job every
+TASK_INPROCESS_INTERVAL seconds, unless TASK_EXTERNAL_WORKER says a dedicated
+worker is deployed, so tasks run even where only the web process starts.
+"""
+import os
+import json
+import time
+import random
+import socket
+import logging
+import argparse
+import multiprocessing
+from datetime import datetime, timedelta
+from flask import current_app
+from app.models import db, dialect_insert, QueuedTask, Order, Shipping
+from app.cache import bump_version
+
+logger = logging.getLogger(__name__)
+
+REGISTRY = {}
+
+def task(name, max_attempts=None):
+    """Register a function as the handler for tasks called name"""
+    def decorator(func):
+        REGISTRY[name] = (func, max_attempts)
+        return func
+    return decorator
+
+def enqueue(name, payload=None, delay=0, dedupe_key=None):
+    """Queue a task in the current transaction; workers see it once the caller commits
+
+    With dedupe_key, at most one pending task per key is kept, so bursts of
+    identical requests (e.g. cache invalidation after many checkouts)
+    collapse into one run.
+    """
+    if name not in REGISTRY:
+        raise ValueError(f"Unknown task {name}")
+    max_attempts = REGISTRY[name][1] or current_app.config.get('TASK_MAX_ATTEMPTS', 5)
+    values = {
+        'name': name,
+        'payload': json.dumps(payload or {}),
+        'status': 'pending',
+        'attempts': 0,
+        'max_attempts': max_attempts,
+        'run_after': datetime.utcnow() + timedelta(seconds=delay),
+        'dedupe_key': dedupe_key,
+        'created_at': datetime.utcnow()
+    }
+    if dedupe_key is None:
+        db.session.add(QueuedTask(**values))
+    else:
+        db.session.execute(
+            dialect_insert(QueuedTask).values(**values).on_conflict_do_nothing(index_elements=['dedupe_key'])
+        )
+
+# ==================== Workers ====================
+
+class TaskWorker:
+    """Claims and runs queued tasks; one per worker process"""
+
+    def __init__(self, batch_size=None, poll_interval=None, lease=None):
+        config = current_app.config
+        self.batch_size = batch_size or config.get('TASK_BATCH_SIZE', 50)
+        self.poll_interval = poll_interval or config.get('TASK_POLL_INTERVAL', 1.0)
+        self.lease = lease or config.get('TASK_LEASE', 300)
+        self.retry_base = config.get('TASK_RETRY_BASE', 5)
+        self.retry_max = config.get('TASK_RETRY_MAX', 3600)
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.processed = 0
+        self.failed = 0
+
+    def claim(self):
+        """Lease up to batch_size due tasks (including ones whose lease lapsed)"""
+        now = datetime.utcnow()
+        due = (
+            db.select(QueuedTask.id)
+            .where(db.or_(
+                db.and_(QueuedTask.status == 'pending', QueuedTask.run_after <= now),
+                db.and_(QueuedTask.status == 'running', QueuedTask.locked_until < now)
+            ))
+            .order_by(QueuedTask.run_after, QueuedTask.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        rows = db.session.execute(
+            db.update(QueuedTask)
+            .where(QueuedTask.id.in_(due))
+            .values(
+                status='running',
+                locked_by=self.worker,
+                locked_until=now + timedelta(seconds=self.lease),
+                attempts=QueuedTask.attempts + 1,
+                dedupe_key=None
+            )
+            .returning(QueuedTask.id, QueuedTask.name, QueuedTask.payload, QueuedTask.attempts, QueuedTask.max_attempts)
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.session.commit()
+        return sorted(rows, key=lambda row: row.id)
+
+    def run(self, row):
+        """Run one claimed task; returns True on success"""
+        try:
+            handler = REGISTRY.get(row.name)
+            if handler is None:
+                raise LookupError(f"No handler registered for task {row.name}")
+            handler[0](**json.loads(row.payload))
+            db.session.execute(
+                db.update(QueuedTask)
+                .where(QueuedTask.id == row.id, QueuedTask.locked_by == self.worker)
+                .values(status='done', finished_at=datetime.utcnow(), locked_until=None, last_error=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            self.processed += 1
+            return True
+        except Exception as e:
+            db.session.rollback()
+            self._fail(row, e)
+            self.failed += 1
+            return False
+
+    def _fail(self, row, error):
+        dead = row.attempts >= row.max_attempts
+        # Full jitter keeps a burst of failing tasks from retrying in lockstep
+        delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** (row.attempts - 1)))
+        values = {
+            'status': 'dead' if dead else 'pending',
+            'last_error': f'{type(error).__name__}: {error}'[:2000],
+            'locked_by': None,
+            'locked_until': None
+        }
+        if dead:
+            values['finished_at'] = datetime.utcnow()
+            logger.error(f"Task {row.name} #{row.id} failed permanently after {row.attempts} attempts: {error}")
+        else:
+            values['run_after'] = datetime.utcnow() + timedelta(seconds=delay)
+            logger.warning(f"Task {row.name} #{row.id} failed (attempt {row.attempts}), retrying in {delay:.0f}s: {error}")
+        try:
+            db.session.execute(
+                db.update(QueuedTask)
+                .where(QueuedTask.id == row.id, QueuedTask.locked_by == self.worker)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Could not record failure of task #{row.id}; it will be retried when its lease lapses: {e}")
+
+    def run_batch(self):
+        """Claim and run one batch; returns the number of tasks claimed"""
+        rows = self.claim()
+        for row in rows:
+            self.run(row)
+        return len(rows)
+
+    def work(self, burst=False, stop=None):
+        """Process tasks until stopped; with burst, return once the queue is empty"""
+        while stop is None or not stop.is_set():
+            try:
+                claimed = self.run_batch()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Task worker error: {e}")
+                claimed = 0
+            if claimed:
+                continue
+            if burst:
+                break
+            time.sleep(self.poll_interval * random.uniform(0.5, 1.5))
+        return self.processed
+
+def _worker_main(config_name, options):
+    from app import create_app
+    app = create_app(config_name)
+    with app.app_context():
+        TaskWorker(**options).work()
+
+def run_workers(app, processes=1, **options):
+    """Run task workers in the foreground; processes > 1 spawns separate worker processes"""
+    if processes <= 1:
+        with app.app_context():
+            TaskWorker(**options).work()
+        return
+
+    config_name = os.environ.get('FLASK_ENV', 'development')
+    context = multiprocessing.get_context('spawn')
+    children = [context.Process(target=_worker_main, args=(config_name, options), daemon=True) for _ in range(processes)]
+    for child in children:
+        child.start()
+    try:
+        for child in children:
+            child.join()
+    except KeyboardInterrupt:
+        for child in children:
+            child.terminate()
+
+def prune_finished(days=None):
+    """Delete done and dead tasks older than TASK_RETENTION_DAYS; returns the number deleted"""
+    days = days if days is not None else current_app.config.get('TASK_RETENTION_DAYS', 7)
+    result = db.session.execute(
+        db.delete(QueuedTask)
+        .where(QueuedTask.status.in_(['done', 'dead']), QueuedTask.finished_at < datetime.utcnow() - timedelta(days=days))
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+def get_stats():
+    """Task counts per status and age of the oldest due task, for monitoring"""
+    counts = dict(db.session.query(QueuedTask.status, db.func.count(QueuedTask.id)).group_by(QueuedTask.status).all())
+    oldest = db.session.query(db.func.min(QueuedTask.run_after)).filter(
+        QueuedTask.status == 'pending', QueuedTask.run_after <= datetime.utcnow()
+    ).scalar()
+    return {
+        'counts': counts,
+        'oldest_due_age_seconds': (datetime.utcnow() - oldest).total_seconds() if oldest else 0
+    }
+
+# ==================== Task handlers ====================
+
+@task('orders.create_shipping')
+def create_shipping(order_id):
+    """Create the shipping record and tracking number for a new order"""
+    if Shipping.query.filter_by(order_id=order_id).first() or db.session.get(Order, order_id) is None:
+        return
+    shipping = Shipping(order_id=order_id)
+    shipping.generate_tracking_number()
+    db.session.add(shipping)
+
+@task('catalog.invalidate')
+def invalidate_catalog():
+    """Invalidate cached catalog pages after stock changes"""
+    bump_version('catalog')
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Task queue worker')
+    parser.add_argument('command', choices=['worker'])
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--batch-size', type=int)
+    args = parser.parse_args()
+    # Import through the package so handlers registered by other modules share one registry
+    from app import create_app
+    from app.tasks import run_workers as run
+    run(create_app(os.environ.get('FLASK_ENV', 'development')), args.processes, batch_size=args.batch_size)
@@ -6,6 +6,7 @@ Access from: http://your-pc-ip:5000
 import os
 from app import create_app, db
 from app.models import User, ASICMiner
+from app.scheduler import scheduler
 
 # Create complete app (with frontend + backend)
 app = create_app(os.environ.get('FLASK_ENV', 'development'))
@@ -15,6 +16,7 @@ def make_shell_context():
     return {'db': db, 'User': User, 'ASICMiner': ASICMiner}
 
 if __name__ == '__main__':
+    scheduler.autostart(app)
     # Run on port 5000, accessible from everywhere on your network
     # Your PC will be accessible at: http://<YOUR_PC_IP>:5000
     # Find your IP: run "ipconfig" in PowerShell
@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""
+Benchmark: price alert evaluation latency per price update
+
+Loads a large number of active alerts spread over a set of miners, then
+applies a random walk of price updates and times PriceAlertEngine.evaluate()
+(plus commit) for each one. For comparison it times a few evaluations done
+the naive way: load every active alert and test each threshold in Python.
+Afterwards it checks that exactly the alerts crossed by some price in the
+walk were triggered.
+
+Usage: python benchmarks/bench_alerts.py [--alerts 1000000] [--miners 50] [--updates 500]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+import numpy as np
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--alerts', type=int, default=1000000)
+parser.add_argument('--miners', type=int, default=50)
+parser.add_argument('--updates', type=int, default=500)
+parser.add_argument('--database-url')
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_alerts.db')
+os.environ['DEV_DATABASE_URL'] = args.database_url or f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from app.models import db, User, ASICMiner, PriceAlert
+from app.alerts import PriceAlertEngine
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+def main():
+    rng = np.random.default_rng(7)
+    app = create_app('development')
+    with app.app_context():
+        user_id = User.query.first().id
+        base_price = 5000.0
+        db.session.execute(db.insert(ASICMiner), [{
+            'name': f'Alert Miner {i}', 'manufacturer': 'Bench', 'model': f'A{i}', 'hash_rate': 100,
+            'power_consumption': 3000, 'algorithm': 'SHA-256', 'price_usd': base_price, 'stock_quantity': 10
+        } for i in range(args.miners)])
+        db.session.commit()
+        miner_ids = [m for (m,) in db.session.query(ASICMiner.id).filter(ASICMiner.manufacturer == 'Bench').all()]
+
+        # Every alert starts on the untriggered side of the current price
+        alert_miner = rng.choice(np.array(miner_ids), size=args.alerts)
+        drops = rng.random(args.alerts) < 0.5
+        distance = rng.uniform(1, 0.4 * base_price, size=args.alerts).round(2)
+        target = np.where(drops, base_price - distance, base_price + distance)
+        start = time.perf_counter()
+        chunk = 50000
+        for offset in range(0, args.alerts, chunk):
+            db.session.execute(db.insert(PriceAlert), [{
+                'user_id': user_id, 'miner_id': int(alert_miner[i]), 'target_price': float(target[i]),
+                'alert_type': 'drops_to' if drops[i] else 'rises_to', 'is_active': True, 'triggered': False
+            } for i in range(offset, min(offset + chunk, args.alerts))])
+            db.session.commit()
+        print(f'loaded {args.alerts:,} alerts over {len(miner_ids)} miners in {time.perf_counter() - start:.1f}s')
+
+        if PriceAlertEngine.evaluate_all():
+            print('FAILED: alerts triggered before any price moved')
+            sys.exit(1)
+
+        prices = {miner_id: base_price for miner_id in miner_ids}
+        low, high = dict(prices), dict(prices)
+        latencies, fired = [], 0
+        for _ in range(args.updates):
+            miner_id = random.choice(miner_ids)
+            prices[miner_id] = round(prices[miner_id] * random.uniform(0.97, 1.03), 2)
+            low[miner_id] = min(low[miner_id], prices[miner_id])
+            high[miner_id] = max(high[miner_id], prices[miner_id])
+            start = time.perf_counter()
+            db.session.execute(db.update(ASICMiner).where(ASICMiner.id == miner_id).values(price_usd=prices[miner_id]))
+            fired += len(PriceAlertEngine.evaluate({miner_id: prices[miner_id]}))
+            db.session.commit()
+            latencies.append(time.perf_counter() - start)
+        print(f'indexed: {args.updates} price updates, {fired:,} alerts triggered   '
+              f'p50 {percentile(latencies, 0.5):.2f} ms   p99 {percentile(latencies, 0.99):.2f} ms   '
+              f'max {max(latencies) * 1000:.2f} ms')
+
+        scan = []
+        for miner_id in random.sample(miner_ids, min(5, len(miner_ids))):
+            start = time.perf_counter()
+            price = prices[miner_id]
+            [
+                alert_id for alert_id, alert_miner_id, alert_type, target_price in db.session.query(
+                    PriceAlert.id, PriceAlert.miner_id, PriceAlert.alert_type, PriceAlert.target_price
+                ).filter(PriceAlert.is_active == True, PriceAlert.triggered == False)
+                if alert_miner_id == miner_id and (target_price >= price if alert_type == 'drops_to' else target_price <= price)
+            ]
+            scan.append(time.perf_counter() - start)
+        print(f'full scan of active alerts (detection only): p50 {percentile(scan, 0.5):.1f} ms per update')
+
+        expected = 0
+        for miner_id in miner_ids:
+            mask = alert_miner == miner_id
+            expected += int(np.count_nonzero(mask & drops & (target >= low[miner_id])))
+            expected += int(np.count_nonzero(mask & ~drops & (target <= high[miner_id])))
+        triggered = PriceAlert.query.filter_by(triggered=True).count()
+        still_active = PriceAlert.query.filter_by(triggered=True, is_active=True).count()
+
+    print(f'triggered {triggered:,}, expected {expected:,}')
+    if triggered != expected or fired != expected or still_active:
+        print('FAILED: triggered alerts do not match the price path')
+        sys.exit(1)
+    print('OK: exactly the crossed alerts were triggered')
+
+if __name__ == '__main__':
+    main()
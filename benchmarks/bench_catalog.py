@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Benchmark: marketplace listings from the in-memory catalog snapshot vs SQL
+
+Inserts N miners (with tied prices, scores and creation times so the id
+tie-break matters, and latest profitability for half of them), then checks
+that the snapshot path returns exactly the same pages as the SQL keyset path
+for every sort mode and filter, walking forwards and backwards through all
+pages, and that cursors from one path continue correctly on the other.
+Finally times /api/miners and /marketplace/ requests on both paths with the
+response cache disabled, and the snapshot rebuild after a catalog bump.
+
+Usage: python benchmarks/bench_catalog.py [--miners 5000] [--requests 300]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--miners', type=int, default=5000)
+parser.add_argument('--requests', type=int, default=300)
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_catalog.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from app.models import db, ASICMiner, LatestProfitability
+from app.cache import response_cache, bump_version
+from app.catalog import catalog_index
+
+SORTS = ['newest', 'price_low', 'price_high', 'profitability']
+FILTERS = [{}, {'algorithm': 'Scrypt'}, {'manufacturer': 'Canaan'}, {'algorithm': 'SHA-256', 'manufacturer': 'Bitmain'}]
+
+def walk(client, params, snapshot):
+    """Ids of every page walked forwards, then backwards from the last page, and the total"""
+    catalog_index.enabled = snapshot
+    forward, pages, cursor, total = [], [], '', None
+    while cursor is not None:
+        body = client.get('/api/miners', query_string={**params, 'cursor': cursor, 'per_page': 50}).get_json()
+        total = body['pagination']['total']
+        ids = [m['id'] for m in body['data']]
+        forward += ids
+        pages.append((ids, body['pagination']['prev_cursor']))
+        cursor = body['pagination']['next_cursor']
+    backward, cursor = pages[-1][0], pages[-1][1]
+    while cursor is not None:
+        body = client.get('/api/miners', query_string={**params, 'cursor': cursor, 'per_page': 50}).get_json()
+        backward = [m['id'] for m in body['data']] + backward
+        cursor = body['pagination']['prev_cursor']
+    return forward, backward, total
+
+def timed(client, path, params, snapshot):
+    catalog_index.enabled = snapshot
+    latencies = []
+    rng = random.Random(3)
+    for _ in range(args.requests):
+        query = {**rng.choice(FILTERS), 'sort': rng.choice(SORTS)}
+        query.update(params)
+        start = time.perf_counter()
+        response = client.get(path, query_string=query)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.status_code
+    latencies.sort()
+    return latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99) - 1] * 1000
+
+def main():
+    app = create_app('development')
+    app.config['CACHE_TYPE'] = 'null'
+    response_cache.init_app(app)
+    rng = random.Random(7)
+    failures = []
+    with app.app_context():
+        base = datetime(2025, 1, 1)
+        algorithms = ['SHA-256', 'SHA-256', 'SHA-256', 'Scrypt', 'Etchash']
+        manufacturers = ['Bitmain', 'MicroBT', 'Canaan', 'Goldshell', 'Jasminer']
+        db.session.execute(db.insert(ASICMiner), [{
+            'name': f'Bench Miner {i}', 'manufacturer': rng.choice(manufacturers), 'model': f'B{i}',
+            'hash_rate': rng.uniform(50, 300), 'power_consumption': rng.randint(2000, 5000),
+            'algorithm': rng.choice(algorithms), 'price_usd': float(rng.randint(10, 80) * 100),
+            'profitability_score': float(rng.randint(-20, 40)), 'stock_quantity': 5,
+            'is_available': rng.random() > 0.1, 'created_at': base + timedelta(days=rng.randint(0, 60)),
+            'release_year': rng.choice([2021, 2022, 2023, 2024])
+        } for i in range(args.miners)])
+        ids = [miner_id for (miner_id,) in db.session.query(ASICMiner.id)]
+        db.session.execute(db.insert(LatestProfitability), [{
+            'miner_id': miner_id, 'daily_profit_usd': rng.uniform(-5, 20), 'roi_days': rng.uniform(100, 900)
+        } for miner_id in ids[::2]])
+        db.session.commit()
+        bump_version('catalog')
+
+        started = time.perf_counter()
+        snapshot = catalog_index.snapshot()
+        print(f'snapshot of {len(snapshot):,} available miners built in {(time.perf_counter() - started) * 1000:.0f} ms')
+        for low, high in ((2000, 5000), (None, 1500), (7000, None)):
+            expected = ASICMiner.query.filter_by(is_available=True)
+            if low:
+                expected = expected.filter(ASICMiner.price_usd >= low)
+            if high:
+                expected = expected.filter(ASICMiner.price_usd <= high)
+            if int(snapshot.mask(min_price=low, max_price=high).sum()) != expected.count():
+                failures.append(f'price filter {low}..{high} count differs')
+
+    client = app.test_client()
+    for sort in SORTS:
+        for filters in FILTERS:
+            params = {**filters, 'sort': sort}
+            sql = walk(client, params, snapshot=False)
+            memory = walk(client, params, snapshot=True)
+            if sql != memory:
+                failures.append(f'{params}: snapshot pages differ from SQL')
+            if memory[0] != memory[1] or len(memory[0]) != memory[2]:
+                failures.append(f'{params}: backward walk or total inconsistent')
+            # A cursor issued by one path continues on the other
+            for first, second in ((False, True), (True, False)):
+                catalog_index.enabled = first
+                body = client.get('/api/miners', query_string={**params, 'cursor': '', 'per_page': 7}).get_json()
+                catalog_index.enabled = second
+                cursor = body['pagination']['next_cursor']
+                body = client.get('/api/miners', query_string={**params, 'cursor': cursor, 'per_page': 7}).get_json()
+                if [m['id'] for m in body['data']] != memory[0][7:14]:
+                    failures.append(f'{params}: cursor from the {"snapshot" if first else "SQL"} path does not continue')
+    print(f'compared {len(SORTS) * len(FILTERS)} sort/filter combinations page by page in both directions')
+
+    for path, params in (('/api/miners', {'cursor': ''}), ('/api/miners', {'page': 3}), ('/marketplace/', {})):
+        sql = timed(client, path, params, snapshot=False)
+        memory = timed(client, path, params, snapshot=True)
+        label = f'{path} {params}'
+        print(f'{label:<34} SQL p50 {sql[0]:6.2f} ms  p99 {sql[1]:6.2f} ms   '
+              f'snapshot p50 {memory[0]:6.2f} ms  p99 {memory[1]:6.2f} ms   ({sql[0] / memory[0]:.1f}x)')
+
+    with app.app_context():
+        ASICMiner.query.filter(ASICMiner.id == ids[0]).update({'price_usd': 1.0, 'is_available': True})
+        db.session.commit()
+        bump_version('catalog')
+        started = time.perf_counter()
+        snapshot = catalog_index.snapshot()
+        rebuilt = time.perf_counter() - started
+        print(f'rebuild after a catalog bump: {rebuilt * 1000:.0f} ms; stats {catalog_index.get_stats()}')
+        if snapshot.page(snapshot.mask(), 'price_low', per_page=1).items[0].id != ids[0]:
+            failures.append('snapshot did not pick up the change after the version bump')
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures[:10]))
+        sys.exit(1)
+    print('OK: snapshot listings match the SQL path for every sort, filter and cursor direction')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Benchmark: streaming NDJSON/CSV exports
+
+Inserts N raw profitability rows and a few thousand orders, then streams
+/api/export/profitability in every format (NDJSON, CSV, each plain and
+gzipped) for a tenth of the rows and for all of them, reading the response
+chunk by chunk like a client would. Reports rows/sec, output size and the
+growth of process RSS during each export, which should not depend on the
+row count. Checks row counts, that gzip output decompresses to the plain
+export, and that every export is admin-only. For contrast, the last
+step loads the same rows through the ORM and json.dumps them in one go.
+
+Usage: python benchmarks/bench_exports.py [--rows 500000]
+"""
+import os
+import sys
+import csv
+import io
+import json
+import time
+import zlib
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--rows', type=int, default=500000)
+parser.add_argument('--orders', type=int, default=5000)
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_exports.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from app.models import db, User, ASICMiner, ProfitabilityData, Order, OrderItem
+
+def rss_mb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def export(client, url):
+    """(body bytes decompressed, rows, seconds, wire bytes, RSS growth MB) of a streamed export"""
+    baseline = peak = rss_mb()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    assert response.status_code == 200, (url, response.status_code)
+    gzipped = response.mimetype == 'application/gzip'
+    decompressor = zlib.decompressobj(31) if gzipped else None
+    wire = lines = 0
+    digest = zlib.crc32(b'')
+    for i, chunk in enumerate(response.response):
+        wire += len(chunk)
+        if decompressor is not None:
+            chunk = decompressor.decompress(chunk)
+        lines += chunk.count(b'\n')
+        digest = zlib.crc32(chunk, digest)
+        if i % 20 == 0:
+            peak = max(peak, rss_mb())
+    response.close()
+    elapsed = time.perf_counter() - started
+    return digest, lines, elapsed, wire, max(peak, rss_mb()) - baseline
+
+def main():
+    app = create_app('development')
+    failures = []
+    with app.app_context():
+        miner_ids = [miner_id for (miner_id,) in db.session.query(ASICMiner.id)]
+        start = datetime(2025, 1, 1)
+        batch = 50000
+        for offset in range(0, args.rows, batch):
+            db.session.execute(db.insert(ProfitabilityData), [{
+                'miner_id': miner_ids[i % len(miner_ids)], 'timestamp': start + timedelta(minutes=i),
+                'daily_profit_usd': 10.0 + (i % 97) / 10, 'monthly_profit_usd': 300.0, 'yearly_profit_usd': 3650.0,
+                'net_profit_daily': 10.0, 'electricity_cost': 0.08,
+                'roi_days': float('inf') if i % 50 == 0 else 400.0 + i % 13, 'data_source': 'bench'
+            } for i in range(offset, min(offset + batch, args.rows))])
+            db.session.commit()
+        tenth = start + timedelta(minutes=args.rows - args.rows // 10)
+
+        admin = User.query.filter_by(username='admin').first()
+        customer = User(username='exporter', email='exporter@example.com')
+        customer.set_password('password123')
+        db.session.add(customer)
+        db.session.flush()
+        db.session.execute(db.insert(Order), [{
+            'order_number': f'EXP{i:08d}', 'user_id': customer.id, 'total_amount': 5000.0, 'status': 'confirmed',
+            'shipping_address': 'x', 'billing_address': 'x', 'created_at': start + timedelta(hours=i)
+        } for i in range(args.orders)])
+        order_ids = [order_id for (order_id,) in db.session.query(Order.id)]
+        db.session.execute(db.insert(OrderItem), [{
+            'order_id': order_id, 'miner_id': miner_ids[j], 'quantity': 1, 'unit_price': 2500.0, 'total_price': 2500.0
+        } for order_id in order_ids for j in range(2)])
+        db.session.commit()
+        admin_id, customer_id = admin.id, customer.id
+    print(f'inserted {args.rows:,} profitability rows and {args.orders:,} orders')
+
+    client = app.test_client()
+    if client.get('/api/export/profitability').status_code == 200:
+        failures.append('profitability export is open to anonymous callers')
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+    digests = {}
+    for fmt in ('ndjson', 'csv'):
+        for gzip in (False, True):
+            for label, query in (('10%', f'&start={tenth.isoformat()}'), ('all', '')):
+                url = f'/api/export/profitability?format={fmt}&gzip={int(gzip)}{query}'
+                digest, lines, elapsed, wire, growth = export(client, url)
+                rows = lines - (1 if fmt == 'csv' else 0)
+                expected = args.rows // 10 if label == '10%' else args.rows
+                print(f'{fmt:<6} {"gzip" if gzip else "plain":<5} {label:>3}: {rows:>9,} rows in {elapsed:5.2f}s '
+                      f'{rows / elapsed:>9,.0f} rows/s  {wire / 1e6:7.1f} MB  RSS +{growth:5.1f} MB')
+                if rows != expected:
+                    failures.append(f'{url}: {rows} rows, expected {expected}')
+                digests.setdefault((fmt, label), set()).add(digest)
+    if any(len(found) != 1 for found in digests.values()):
+        failures.append('gzip output does not decompress to the plain export')
+
+    with app.app_context():
+        sample = client.get('/api/export/profitability?format=ndjson').response
+        first = json.loads(next(iter(sample)).split(b'\n')[0])
+        if first['roi_days'] is not None:
+            failures.append('infinite roi_days was not written as null')
+
+    with client.session_transaction() as session:
+        session['_user_id'] = str(customer_id)
+    for name in ('orders', 'miners', 'profitability'):
+        if client.get(f'/api/export/{name}').status_code != 403:
+            failures.append(f'{name} export is not admin-only')
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+    body = client.get('/api/export/orders?format=csv').get_data(as_text=True)
+    order_rows = list(csv.DictReader(io.StringIO(body)))
+    print(f'orders csv: {len(order_rows):,} order lines, columns {", ".join(order_rows[0])}')
+    if len(order_rows) != args.orders * 2:
+        failures.append(f'orders export has {len(order_rows)} lines, expected {args.orders * 2}')
+
+    with app.app_context():
+        baseline = rss_mb()
+        started = time.perf_counter()
+        rows = ProfitabilityData.query.all()
+        body = json.dumps([{'id': r.id, 'miner_id': r.miner_id, 'timestamp': r.timestamp.isoformat(),
+                            'daily_profit_usd': r.daily_profit_usd, 'roi_days': r.roi_days} for r in rows])
+        print(f'for comparison, ORM .all() + json.dumps of {len(rows):,} rows: {time.perf_counter() - started:.2f}s, '
+              f'RSS +{rss_mb() - baseline:.0f} MB')
+        del rows, body
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+    print('OK: exports stream every row with memory independent of the row count')
+
+if __name__ == '__main__':
+    main()
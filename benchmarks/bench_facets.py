@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+"""
+Benchmark: marketplace facet counts from the catalog snapshot
+
+Inserts N miners, then for a set of filter combinations checks every facet
+count against a SQL GROUP BY over the rows matching all other filters, and
+counts the SQL statements each /marketplace/ request issues (cache-version
+checks excluded) with the response cache disabled. Compares facet latency
+against the SQL GROUP BY queries the counts would otherwise need, and checks
+that counts follow a miner becoming unavailable after the catalog bump.
+
+Usage: python benchmarks/bench_facets.py [--miners 5000] [--requests 200]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--miners', type=int, default=5000)
+parser.add_argument('--requests', type=int, default=200)
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_facets.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sqlalchemy import event
+from app import create_app
+from app.models import db, ASICMiner, CacheVersion
+from app.cache import response_cache, bump_version
+from app.catalog import catalog_index, PRICE_RANGES
+
+FILTERS = [
+    {},
+    {'algorithm': 'SHA-256'},
+    {'manufacturer': 'Canaan', 'price_range': '2000-5000'},
+    {'algorithm': 'Scrypt', 'release_year': 2023},
+    {'min_price': 3000.0, 'max_price': 6000.0, 'manufacturer': 'Bitmain'}
+]
+
+def sql_facets(filters):
+    """Facet counts with one GROUP BY per facet, each ignoring its own filter"""
+    columns = {
+        'algorithm': ASICMiner.algorithm,
+        'manufacturer': ASICMiner.manufacturer,
+        'release_year': ASICMiner.release_year,
+        'price_range': db.case(*[
+            (db.and_(ASICMiner.price_usd >= low, ASICMiner.price_usd < high), key)
+            for key, (_, low, high) in PRICE_RANGES.items()
+        ])
+    }
+    conditions = {
+        'algorithm': ASICMiner.algorithm == filters.get('algorithm'),
+        'manufacturer': ASICMiner.manufacturer == filters.get('manufacturer'),
+        'release_year': ASICMiner.release_year == filters.get('release_year'),
+    }
+    price = []
+    if filters.get('min_price'):
+        price.append(ASICMiner.price_usd >= filters['min_price'])
+    if filters.get('max_price'):
+        price.append(ASICMiner.price_usd <= filters['max_price'])
+    if filters.get('price_range'):
+        _, low, high = PRICE_RANGES[filters['price_range']]
+        price += [ASICMiner.price_usd >= low, ASICMiner.price_usd < high]
+    result = {}
+    for facet, column in columns.items():
+        query = db.session.query(column, db.func.count()).filter(ASICMiner.is_available == True)
+        for other, condition in conditions.items():
+            if other != facet and filters.get(other):
+                query = query.filter(condition)
+        if facet != 'price_range':
+            query = query.filter(*price)
+        result[facet] = {value: count for value, count in query.group_by(column) if value not in (None, 0)}
+    return result
+
+def main():
+    app = create_app('development')
+    app.config['CACHE_TYPE'] = 'null'
+    response_cache.init_app(app)
+    rng = random.Random(5)
+    failures = []
+    with app.app_context():
+        db.session.execute(db.insert(ASICMiner), [{
+            'name': f'Facet Miner {i}', 'manufacturer': rng.choice(['Bitmain', 'MicroBT', 'Canaan', 'Goldshell']),
+            'model': f'F{i}', 'hash_rate': rng.uniform(50, 300), 'power_consumption': rng.randint(2000, 5000),
+            'algorithm': rng.choice(['SHA-256', 'SHA-256', 'Scrypt', 'Etchash']),
+            'price_usd': float(rng.randint(5, 150) * 100), 'stock_quantity': 5,
+            'is_available': rng.random() > 0.1, 'release_year': rng.choice([2021, 2022, 2023, 2024, None])
+        } for i in range(args.miners)])
+        db.session.commit()
+        bump_version('catalog')
+        snapshot = catalog_index.snapshot()
+
+        sql_time = memory_time = 0.0
+        for filters in FILTERS:
+            started = time.perf_counter()
+            expected = sql_facets(filters)
+            sql_time += time.perf_counter() - started
+            full = {'algorithm': '', 'manufacturer': '', 'min_price': None, 'max_price': None,
+                    'release_year': None, 'price_range': '', **filters}
+            started = time.perf_counter()
+            got = snapshot.facets(full)
+            memory_time += time.perf_counter() - started
+            for facet, entries in got.items():
+                counts = {entry['value']: entry['count'] for entry in entries if entry['count']}
+                if counts != expected[facet]:
+                    failures.append(f'{filters}: {facet} counts differ from SQL')
+        print(f'{len(FILTERS)} filter combinations: SQL GROUP BY {sql_time / len(FILTERS) * 1000:.1f} ms each, '
+              f'snapshot (uncached) {memory_time / len(FILTERS) * 1000:.2f} ms each')
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if CacheVersion.__tablename__ not in statement:
+            statements.append(statement)
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute', record)
+    client = app.test_client()
+    client.get('/marketplace/')  # Warm the snapshot and facet cache
+    statements.clear()
+    latencies = []
+    for i in range(args.requests):
+        query = {k: v for k, v in FILTERS[i % len(FILTERS)].items()}
+        started = time.perf_counter()
+        response = client.get('/marketplace/', query_string=query)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200 or b'badge bg-light' not in response.data:
+            failures.append(f'browse {query} did not render facets')
+            break
+    latencies.sort()
+    print(f'/marketplace/ with facets: p50 {latencies[len(latencies) // 2] * 1000:.2f} ms, '
+          f'{len(statements)} SQL statements over {args.requests} requests')
+    if statements:
+        failures.append(f'browse issued {len(statements)} queries on a warm snapshot, e.g. {statements[0][:80]}')
+
+    with app.app_context():
+        event.remove(db.engine, 'before_cursor_execute', record)
+        miner = ASICMiner.query.filter_by(is_available=True, algorithm='Scrypt').first()
+        before = {e['value']: e['count'] for e in catalog_index.snapshot().facets({})['algorithm']}
+        miner.is_available = False
+        db.session.commit()
+        bump_version('catalog')
+        after = {e['value']: e['count'] for e in catalog_index.snapshot().facets({})['algorithm']}
+        if after['Scrypt'] != before['Scrypt'] - 1:
+            failures.append('facet counts did not follow an availability change')
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures[:10]))
+        sys.exit(1)
+    print('OK: facet counts match SQL and browse renders them without queries')
+
+if __name__ == '__main__':
+    main()
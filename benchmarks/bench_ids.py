@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+"""
+Uniqueness and throughput check for the order/tracking id generator
+
+Generates ids from several processes at once (forked from a parent that has
+already used the generator, as with gunicorn --preload) and from several
+threads per process, then verifies that every id is unique, that each
+producer's ids strictly increase, and that every process got its own slot.
+
+Usage: python benchmarks/bench_ids.py [--processes 8] [--threads 4] [--ids 100000]
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.ids import id_generator, SnowflakeGenerator
+
+def produce(args):
+    threads, count = args
+    results = [None] * threads
+
+    def work(index):
+        results[index] = [id_generator.next_id() for _ in range(count)]
+
+    workers = [threading.Thread(target=work, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return os.getpid(), time.perf_counter() - start, results
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--processes', type=int, default=8)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--ids', type=int, default=100000, help='ids per thread')
+    parser.add_argument('--start-method', default='fork', choices=['fork', 'spawn', 'forkserver'])
+    args = parser.parse_args()
+
+    # Claim a slot in the parent first so forked children must not reuse it
+    parent_id = id_generator.next_id()
+
+    start = time.perf_counter()
+    with multiprocessing.get_context(args.start_method).Pool(args.processes) as pool:
+        outputs = pool.map(produce, [(args.threads, args.ids)] * args.processes)
+    wall = time.perf_counter() - start
+
+    all_ids = [parent_id]
+    slots = {SnowflakeGenerator.decode(parent_id)[1:3]}
+    failures = []
+    for pid, elapsed, per_thread in outputs:
+        process_ids = []
+        for ids in per_thread:
+            if any(b <= a for a, b in zip(ids, ids[1:])):
+                failures.append(f'pid {pid}: ids not strictly increasing within a thread')
+            process_ids.extend(ids)
+        worker = {SnowflakeGenerator.decode(value)[1:3] for value in process_ids}
+        if len(worker) != 1:
+            failures.append(f'pid {pid}: ids carry {len(worker)} different worker ids')
+        if worker & slots:
+            failures.append(f'pid {pid}: worker id {worker} shared with another process')
+        slots |= worker
+        all_ids.extend(process_ids)
+        rate = len(process_ids) / elapsed
+        print(f'pid {pid}: node/slot {sorted(worker)}  {len(process_ids)} ids in {elapsed:.2f}s ({rate:,.0f}/s)')
+
+    duplicates = len(all_ids) - len(set(all_ids))
+    if duplicates:
+        failures.append(f'{duplicates} duplicate ids')
+
+    print(f'{len(all_ids):,} ids from {args.processes} processes x {args.threads} threads '
+          f'in {wall:.2f}s ({len(all_ids) / wall:,.0f} ids/s aggregate)')
+    print(f'sample codes: {SnowflakeGenerator.encode(all_ids[1])} {SnowflakeGenerator.encode(all_ids[-1])}')
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+    print('OK: all ids unique and ordered per producer')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Benchmark: bulk catalog import
+
+Writes a CSV price list of N rows (with a sprinkling of invalid rows and
+repeated manufacturer/model keys) and imports it through the CLI code path,
+then writes a second list that reprices and restocks a tenth of those
+miners, adds new ones, and imports it as NDJSON through /api/import/miners.
+Checks the counters and per-row errors of both reports, that every miner has
+an Inventory row matching its stock, that stock shards were resynced for a
+restocked miner that had them (and not created for the others), and that a
+price alert on a repriced miner was triggered. For contrast, the last step
+adds miners one ORM object at a time the way the add-miner form does.
+
+Usage: python benchmarks/bench_import.py [--rows 100000]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--rows', type=int, default=100000)
+parser.add_argument('--orm-rows', type=int, default=2000)
+args = parser.parse_args()
+
+WORK_DIR = tempfile.mkdtemp()
+DB_PATH = os.path.join(WORK_DIR, 'bench_import.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from app.models import db, User, ASICMiner, Inventory, StockShard, PriceAlert
+from app.imports import CatalogImporter
+from app.reservations import reservations
+
+COLUMNS = ['manufacturer', 'model', 'name', 'hash_rate', 'power_consumption', 'algorithm', 'price_usd',
+           'stock_quantity', 'release_year', 'is_available']
+MANUFACTURERS = ['Bitmain', 'MicroBT', 'Canaan', 'Goldshell', 'Jasminer']
+
+def record(rng, i, price=None, stock=None):
+    return {
+        'manufacturer': MANUFACTURERS[i % len(MANUFACTURERS)], 'model': f'IMP-{i}', 'name': f'Import Miner {i}',
+        'hash_rate': round(rng.uniform(50, 300), 1), 'power_consumption': rng.randint(2000, 5000),
+        'algorithm': rng.choice(['SHA-256', 'Scrypt', 'Etchash']),
+        'price_usd': price if price is not None else float(rng.randint(10, 150) * 100),
+        'stock_quantity': stock if stock is not None else rng.randint(0, 40),
+        'release_year': rng.choice([2021, 2022, 2023, 2024]), 'is_available': 'true'
+    }
+
+def write_csv(path, rng):
+    """N data rows; returns (invalid row numbers, repeated keys, final values by model)"""
+    invalid, repeated, final = [], 0, {}
+    with open(path, 'w') as out:
+        out.write(','.join(COLUMNS) + '\n')
+        for n in range(args.rows):
+            line = n + 2  # Header is line 1
+            if n % 1000 == 7:
+                out.write('Bitmain,,no model,100,3000,SHA-256,5000,1,2023,true\n')
+                invalid.append(line)
+                continue
+            if n % 1000 == 13:
+                out.write(f'Bitmain,BAD-{n},bad price,100,3000,SHA-256,cheap,1,2023,true\n')
+                invalid.append(line)
+                continue
+            i = n - 1 if n % 500 == 21 else n  # Repeats the previous row's key with new values
+            row = record(rng, i)
+            if i != n:
+                repeated += 1
+            final[row['model']] = row
+            out.write(','.join(str(row[column]) for column in COLUMNS) + '\n')
+    return invalid, repeated, final
+
+def main():
+    app = create_app('development')
+    rng = random.Random(11)
+    failures = []
+    csv_path = os.path.join(WORK_DIR, 'catalog.csv')
+    invalid, repeated, final = write_csv(csv_path, rng)
+    print(f'wrote {args.rows:,} CSV rows ({os.path.getsize(csv_path) / 1e6:.1f} MB), '
+          f'{len(invalid)} invalid, {repeated} repeated keys')
+
+    with app.app_context():
+        started = time.perf_counter()
+        with open(csv_path, newline='') as stream:
+            report = CatalogImporter(dry_run=True).run(stream, 'csv')
+        print(f'dry run: {report["rows"]:,} rows checked in {time.perf_counter() - started:.2f}s')
+        if ASICMiner.query.filter(ASICMiner.model.like('IMP-%')).count():
+            failures.append('dry run saved miners')
+
+        started = time.perf_counter()
+        with open(csv_path, newline='') as stream:
+            report = CatalogImporter().run(stream, 'csv')
+        elapsed = time.perf_counter() - started
+        print(f'initial import: {report["inserted"]:,} inserted, {report["updated"]:,} updated, '
+              f'{report["invalid"]} invalid in {elapsed:.2f}s ({report["rows"] / elapsed:,.0f} rows/s)')
+        if report['inserted'] != len(final) or report['invalid'] != len(invalid) or report['failed']:
+            failures.append(f'initial import counters wrong: {report}')
+        if [error['row'] for error in report['errors']] != invalid[:len(report['errors'])]:
+            failures.append('row errors do not point at the invalid lines')
+        print(f'  first error: row {report["errors"][0]["row"]}: {report["errors"][0]["message"]}')
+
+        stock = dict(db.session.query(ASICMiner.model, ASICMiner.stock_quantity).filter(ASICMiner.model.like('IMP-%')))
+        if any(stock[model] != row['stock_quantity'] for model, row in final.items()):
+            failures.append('imported stock differs from the last row for each key')
+        mismatched = db.session.query(db.func.count(ASICMiner.id)).outerjoin(Inventory).filter(
+            ASICMiner.model.like('IMP-%'),
+            db.or_(Inventory.id == None, Inventory.quantity_available != ASICMiner.stock_quantity)
+        ).scalar()
+        if mismatched:
+            failures.append(f'{mismatched} imported miners have no matching Inventory row')
+
+        # Watch a miner that the second list reprices below the target
+        watched = ASICMiner.query.filter_by(model='IMP-100').first()
+        admin = User.query.filter_by(username='admin').first()
+        db.session.add(PriceAlert(user_id=admin.id, miner_id=watched.id, target_price=watched.price_usd - 1))
+        # IMP-0 has been held before, so it has stock shards for the restock to resync
+        reservations.ensure_shards(ASICMiner.query.filter_by(model='IMP-0').first().id)
+        db.session.commit()
+        admin_id, watched_id, watched_price = admin.id, watched.id, watched.price_usd
+
+    # Reprice and restock every tenth miner and add new ones, as NDJSON over the API
+    updates = {}
+    ndjson_path = os.path.join(WORK_DIR, 'update.ndjson')
+    with open(ndjson_path, 'w') as out:
+        for i in range(0, args.rows, 10):
+            if f'IMP-{i}' not in final:
+                continue
+            price = watched_price - 100 if i == 100 else final[f'IMP-{i}']['price_usd'] + 50
+            row = record(rng, i, price=price, stock=rng.randint(41, 60))
+            updates[row['model']] = row
+            out.write(json.dumps(row) + '\n')
+        for i in range(args.rows, args.rows + args.rows // 20):
+            out.write(json.dumps(record(rng, i)) + '\n')
+        out.write('{"manufacturer": "Bitmain", "model": "NEG", "hash_rate": -1}\n')
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(admin_id)
+    started = time.perf_counter()
+    with open(ndjson_path, 'rb') as stream:
+        response = client.post('/api/import/miners', data=stream, content_type='application/x-ndjson')
+    elapsed = time.perf_counter() - started
+    body = response.get_json()
+    report = body['data']
+    print(f'update import (API, NDJSON): {report["inserted"]:,} inserted, {report["updated"]:,} updated, '
+          f'{report["invalid"]} invalid in {elapsed:.2f}s ({report["rows"] / elapsed:,.0f} rows/s)')
+    if report['updated'] != len(updates) or report['inserted'] != args.rows // 20 or report['invalid'] != 1:
+        failures.append(f'update import counters wrong: {report}')
+
+    with app.app_context():
+        model = 'IMP-0'
+        miner = ASICMiner.query.filter_by(model=model).first()
+        levels = db.session.query(db.func.sum(StockShard.quantity)).filter_by(miner_id=miner.id).scalar()
+        inventory = Inventory.query.filter_by(miner_id=miner.id).first()
+        if miner.stock_quantity != updates[model]['stock_quantity'] or inventory.quantity_available != miner.stock_quantity:
+            failures.append('restock did not reach the miner and its Inventory row')
+        if levels != miner.stock_quantity:
+            failures.append(f'stock shards hold {levels}, expected {miner.stock_quantity}')
+        sharded = db.session.query(db.func.count(db.distinct(StockShard.miner_id))).scalar()
+        if sharded != 1:
+            failures.append(f'{sharded} miners have stock shards; only IMP-0 had any before the restock')
+        alert = PriceAlert.query.filter_by(miner_id=watched_id).first()
+        if not alert.triggered:
+            failures.append('price alert on a repriced miner was not triggered')
+        print(f'restocked {model}: stock {miner.stock_quantity}, shards {levels}; alert triggered: {alert.triggered}')
+
+        started = time.perf_counter()
+        for i in range(args.orm_rows):
+            row = record(rng, 10 ** 7 + i)
+            miner = ASICMiner(**{k: v for k, v in row.items() if k != 'is_available'})
+            db.session.add(miner)
+            db.session.flush()
+            db.session.add(Inventory(miner_id=miner.id, quantity_available=miner.stock_quantity))
+            db.session.commit()
+        elapsed = time.perf_counter() - started
+        print(f'for comparison, one ORM object and commit per row: {args.orm_rows / elapsed:,.0f} rows/s')
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures[:10]))
+        sys.exit(1)
+    print('OK: imports validate, upsert and report every row')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Benchmark: coin price history writes, candles and downsampled range queries
+
+Records a year of minute-level BTC prices (a random walk) through
+PriceHistory.record_many(), then times PriceHistory.series() for ranges from
+a day to a year at a few hundred points against reading every raw sample.
+Part of the samples are delivered late and out of order. Checks that the
+stored candles match OHLC computed directly from the generated samples, and
+that every series stays within its point budget and keeps the range's first
+and last samples.
+
+Usage: python benchmarks/bench_prices.py [--days 365] [--points 500] [--queries 20]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+import numpy as np
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--days', type=int, default=365)
+parser.add_argument('--points', type=int, default=500)
+parser.add_argument('--queries', type=int, default=20)
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_prices.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from app.models import db, CoinPriceRollup
+from app.prices import PriceHistory
+
+def main():
+    rng = np.random.default_rng(11)
+    minutes = args.days * 1440
+    end = datetime(2026, 1, 1)
+    start = end - timedelta(minutes=minutes)
+    times = [start + timedelta(minutes=i) for i in range(minutes)]
+    prices = np.round(60000 * np.exp(np.cumsum(rng.normal(0, 0.0008, minutes))), 2)
+    # Hold back every 97th sample and deliver it late to exercise out-of-order candle merging
+    late = np.zeros(minutes, dtype=bool)
+    late[::97] = True
+    failures = []
+
+    app = create_app('development')
+    with app.app_context():
+        started = time.perf_counter()
+        PriceHistory.record_many(('BTC', times[i], float(prices[i])) for i in np.flatnonzero(~late))
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+        print(f'recorded {np.count_nonzero(~late):,} samples in {elapsed:.1f}s ({np.count_nonzero(~late) / elapsed:,.0f}/s)')
+        started = time.perf_counter()
+        PriceHistory.record_many(('BTC', times[i], float(prices[i])) for i in np.flatnonzero(late))
+        db.session.commit()
+        print(f'recorded {np.count_nonzero(late):,} late samples in {time.perf_counter() - started:.2f}s')
+
+        # Candles against OHLC computed straight from the samples
+        for resolution, size in (('5min', 5), ('hour', 60), ('day', 1440)):
+            expected = prices.reshape(-1, size)
+            rows = CoinPriceRollup.query.filter_by(symbol='BTC', resolution=resolution).order_by(CoinPriceRollup.bucket_start).all()
+            got = np.array([[r.open, r.high, r.low, r.close, r.sample_count] for r in rows])
+            want = np.column_stack([expected[:, 0], expected.max(axis=1), expected.min(axis=1), expected[:, -1],
+                                    np.full(len(expected), size)])
+            if got.shape != want.shape or not np.allclose(got, want):
+                failures.append(f'{resolution} candles do not match the samples')
+            print(f'{resolution:<5} candles: {len(rows):,}')
+
+        for label, span in (('1 day', timedelta(days=1)), ('7 days', timedelta(days=7)),
+                            ('30 days', timedelta(days=30)), (f'{args.days} days', end - start)):
+            span = min(span, end - start)
+            latencies = []
+            for q in range(args.queries):
+                range_end = end - timedelta(hours=q)
+                range_start = max(start, range_end - span)
+                t0 = time.perf_counter()
+                series = PriceHistory.series('BTC', range_start, range_end, args.points)
+                latencies.append(time.perf_counter() - t0)
+                points = series['points']
+                if len(points) > args.points:
+                    failures.append(f'{label}: {len(points)} points over the budget')
+                if q == 0:
+                    first, last = points[0][0], points[-1][0]
+                    first_range = (range_start, min(range_end, times[-1]))
+            latencies.sort()
+            print(f'{label:<9} source {series["source"]:<5} {series["samples"]:>8,} samples -> {len(points):>4} points   '
+                  f'p50 {latencies[len(latencies) // 2] * 1000:7.1f} ms   max {latencies[-1] * 1000:7.1f} ms')
+            if series['source'] == 'raw' and [first, last] != [
+                int((moment - datetime(1970, 1, 1)).total_seconds() * 1000) for moment in first_range
+            ]:
+                failures.append(f'{label}: first or last sample dropped')
+
+        t0 = time.perf_counter()
+        times_read, _ = PriceHistory._series('BTC', 'raw', start, end)
+        print(f'for comparison, reading all {len(times_read):,} raw samples takes {time.perf_counter() - t0:.2f}s')
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+    print('OK: candles match the samples and every range fits its point budget')
+
+if __name__ == '__main__':
+    main()
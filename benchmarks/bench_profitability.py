@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Benchmark: scalar vs vectorized profitability calculation
+
+Compares ProfitabilityCalculator.calculate_miner_profitability (one call per
+miner) with BatchProfitabilityEngine (one NumPy pass over the catalog) using a
+fixed price snapshot, and checks that both paths produce the same numbers.
+
+Usage: python benchmarks/bench_profitability.py [sizes...]
+"""
+import os
+import sys
+import time
+import random
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import numpy as np
+from app.services import ProfitabilityCalculator, BatchProfitabilityEngine
+
+PRICES = {'bitcoin': {'usd': 65000.0}, 'litecoin': {'usd': 85.0}}
+ALGORITHMS = ['SHA-256', 'Scrypt', 'Kheavyhash', 'Ethash', 'RandomX']
+FIELDS = ['daily_revenue', 'daily_electricity_cost', 'daily_pool_fee', 'daily_net_profit', 'roi_days']
+
+def make_miners(n, seed=42):
+    """Generate a synthetic catalog"""
+    rng = random.Random(seed)
+    return [
+        SimpleNamespace(
+            hash_rate=rng.uniform(0.5, 3000.0),
+            power_consumption=rng.randint(300, 3500),
+            price_usd=rng.uniform(500, 15000),
+            algorithm=rng.choice(ALGORITHMS)
+        )
+        for _ in range(n)
+    ]
+
+def run(n):
+    miners = make_miners(n)
+    
+    start = time.perf_counter()
+    scalar = [ProfitabilityCalculator.calculate_miner_profitability(m, prices=PRICES) for m in miners]
+    scalar_time = time.perf_counter() - start
+    
+    engine = BatchProfitabilityEngine(prices=PRICES)
+    hash_rate = np.array([m.hash_rate for m in miners])
+    power = np.array([m.power_consumption for m in miners], dtype=np.float64)
+    price = np.array([m.price_usd for m in miners])
+    algorithms = np.array([m.algorithm for m in miners], dtype=object)
+    
+    start = time.perf_counter()
+    batch = engine.calculate(hash_rate, power, price, algorithms)
+    batch_time = time.perf_counter() - start
+    
+    for field in FIELDS:
+        expected = np.array([r[field] for r in scalar])
+        assert np.array_equal(expected, batch[field]), f"{field} mismatch"
+    
+    print(f"{n:>8} miners | scalar {scalar_time * 1000:9.1f} ms | "
+          f"vectorized {batch_time * 1000:7.2f} ms | speedup {scalar_time / batch_time:6.1f}x")
+
+if __name__ == '__main__':
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    print("Both paths use coin_registry coefficients (model defaults here; no database or network).")
+    for size in sizes:
+        run(size)
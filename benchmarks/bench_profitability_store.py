@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Benchmark: ProfitabilityData insert throughput and retention compaction
+
+Measures per-object ORM inserts against ProfitabilityStore.bulk_insert, then
+loads N days of 5-minute history and reports row counts and database size
+before and after ProfitabilityStore.compact().
+
+Usage: python benchmarks/bench_profitability_store.py [--miners 50] [--days 30]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_profitability_store.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from app.models import db, ASICMiner, ProfitabilityData, ProfitabilityRollup
+from app.retention import ProfitabilityStore
+
+def make_rows(miner_ids, timestamps, rng):
+    for ts in timestamps:
+        for miner_id in miner_ids:
+            daily = rng.uniform(-5, 25)
+            yield {
+                'miner_id': miner_id,
+                'daily_profit_usd': daily,
+                'monthly_profit_usd': daily * 30,
+                'yearly_profit_usd': daily * 365,
+                'electricity_cost': 0.12,
+                'net_profit_daily': daily,
+                'roi_days': rng.uniform(200, 900),
+                'timestamp': ts,
+                'data_source': 'internal'
+            }
+
+def table_sizes():
+    db.session.execute(db.text('VACUUM'))
+    return (
+        ProfitabilityData.query.count(),
+        ProfitabilityRollup.query.count(),
+        os.path.getsize(DB_PATH) / (1024 * 1024)
+    )
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--miners', type=int, default=50)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--insert-rows', type=int, default=20000)
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    app = create_app('development')
+    with app.app_context():
+        miners = [
+            {'name': f'Bench Miner {i}', 'manufacturer': 'Bench', 'model': f'B{i}', 'hash_rate': 100.0,
+             'power_consumption': 3000, 'algorithm': 'SHA-256', 'price_usd': 5000.0}
+            for i in range(args.miners)
+        ]
+        db.session.execute(db.insert(ASICMiner), miners)
+        db.session.commit()
+        miner_ids = [m.id for m in ASICMiner.query.all()]
+
+        now = datetime.utcnow()
+        sample = list(make_rows(miner_ids, [now] * (args.insert_rows // len(miner_ids)), rng))
+
+        start = time.perf_counter()
+        for row in sample:
+            db.session.add(ProfitabilityData(**row))
+        db.session.commit()
+        orm_rate = len(sample) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        ProfitabilityStore.bulk_insert(sample)
+        bulk_rate = len(sample) / (time.perf_counter() - start)
+
+        print(f"Insert throughput ({len(sample)} rows)")
+        print(f"  ORM session.add : {orm_rate:10.0f} rows/s")
+        print(f"  bulk_insert     : {bulk_rate:10.0f} rows/s ({bulk_rate / orm_rate:.1f}x)")
+
+        db.session.execute(db.delete(ProfitabilityData))
+        db.session.commit()
+
+        steps = args.days * 24 * 12
+        timestamps = [now - timedelta(minutes=5 * i) for i in range(steps)]
+        start = time.perf_counter()
+        loaded = ProfitabilityStore.bulk_insert(make_rows(miner_ids, timestamps, rng), batch_size=10000)
+        print(f"\nLoaded {loaded} rows ({args.days} days x 5 min x {len(miner_ids)} miners) "
+              f"in {time.perf_counter() - start:.1f}s")
+
+        raw, rollups, size = table_sizes()
+        print(f"Before compaction: {raw:>9} raw rows, {rollups:>7} rollups, {size:8.1f} MB")
+
+        start = time.perf_counter()
+        stats = ProfitabilityStore.compact(now=now, raw_retention_days=7, hourly_retention_days=14)
+        elapsed = time.perf_counter() - start
+
+        raw, rollups, size = table_sizes()
+        print(f"After compaction:  {raw:>9} raw rows, {rollups:>7} rollups, {size:8.1f} MB")
+        print(f"Compaction took {elapsed:.1f}s: {stats}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+"""
+Benchmark: flash-sale load on one hot miner through the reservation API
+
+Phase 1 fires concurrent add-to-cart holds (POST /api/cart/hold) at a single
+miner with less stock than demand and reports holds/sec and p99 latency.
+Phase 2 has every buyer check out concurrently, converting their holds, and
+reports checkout p99 latency. Afterwards it checks that nothing was oversold:
+shards + active holds + units sold must equal the starting stock.
+
+Sharding only relieves row-lock contention on databases with row-level
+locking; pass --database-url for a scratch PostgreSQL database and compare
+--shards 1 with the default. SQLite serializes all writers regardless.
+
+Usage: python benchmarks/bench_reservations.py [--holds 2000] [--stock 1500] [--workers 32] [--shards 8]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--holds', type=int, default=2000)
+parser.add_argument('--stock', type=int, default=1500)
+parser.add_argument('--workers', type=int, default=32)
+parser.add_argument('--shards', type=int, default=8)
+parser.add_argument('--database-url')
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_reservations.db')
+os.environ['DEV_DATABASE_URL'] = args.database_url or f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from werkzeug.security import generate_password_hash
+from app import create_app
+from app.models import db, User, ASICMiner, Inventory, OrderItem, StockShard, StockReservation
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1000
+
+def run(fn, count):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(fn, range(count)))
+    return results, time.perf_counter() - start
+
+def main():
+    app = create_app('development')
+    app.config['RESERVATION_SHARDS'] = args.shards
+    with app.app_context():
+        miner = ASICMiner(
+            name='Launch Miner', manufacturer='Bench', model='L1', hash_rate=200, power_consumption=3500,
+            algorithm='SHA-256', price_usd=9000, stock_quantity=args.stock, is_available=True
+        )
+        miner.inventory = Inventory(quantity_available=args.stock, reserved_quantity=0)
+        db.session.add(miner)
+        users = [
+            User(username=f'buyer{i}', email=f'buyer{i}@example.com',
+                 password_hash=generate_password_hash('x', method='pbkdf2:sha256:1'))
+            for i in range(args.workers)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        miner_id = miner.id
+        user_ids = [user.id for user in users]
+
+    clients = []
+    for user_id in user_ids:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        clients.append(client)
+
+    def hold(index):
+        start = time.perf_counter()
+        response = clients[index % len(clients)].post('/api/cart/hold', json={'miner_id': miner_id, 'quantity': 1})
+        return index % len(clients), response.status_code, time.perf_counter() - start
+
+    results, elapsed = run(hold, args.holds)
+    held = Counter(worker for worker, status, _ in results if status == 200)
+    print(f'holds: {args.holds} requests, {sum(held.values())} granted, statuses {dict(Counter(s for _, s, _ in results))}')
+    print(f'  {args.holds / elapsed:.0f} holds/s   p50 {percentile([r[2] for r in results], 0.5):.1f} ms'
+          f'   p99 {percentile([r[2] for r in results], 0.99):.1f} ms')
+
+    def checkout(worker):
+        start = time.perf_counter()
+        response = clients[worker].post('/api/cart/checkout', json={
+            'items': [{'miner_id': miner_id, 'quantity': held[worker]}],
+            'shipping_info': {'address': '1 Launch Way'}
+        })
+        return response.status_code, time.perf_counter() - start
+
+    buyers = [worker for worker in range(len(clients)) if held[worker]]
+    results, elapsed = run(lambda i: checkout(buyers[i]), len(buyers))
+    print(f'checkouts: {len(buyers)}, statuses {dict(Counter(s for s, _ in results))}')
+    print(f'  {len(buyers) / elapsed:.0f} checkouts/s   p50 {percentile([r[1] for r in results], 0.5):.1f} ms'
+          f'   p99 {percentile([r[1] for r in results], 0.99):.1f} ms')
+
+    with app.app_context():
+        free = db.session.query(db.func.coalesce(db.func.sum(StockShard.quantity), 0)).filter_by(miner_id=miner_id).scalar()
+        holding = db.session.query(db.func.coalesce(db.func.sum(StockReservation.quantity), 0)).filter_by(
+            miner_id=miner_id, status='held').scalar()
+        sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).filter_by(miner_id=miner_id).scalar()
+        on_hand = db.session.get(ASICMiner, miner_id).stock_quantity
+
+    print(f'stock {args.stock}: sold {sold}, held {holding}, free {free}, on hand {on_hand}')
+    if free < 0 or free + holding + sold != args.stock or on_hand != args.stock - sold:
+        print('FAILED: stock accounting does not balance')
+        sys.exit(1)
+    print('OK: no overselling')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""
+Benchmark: miningnow.com ingestion against a local fixture HTTP server
+
+Serves generated listing and miner pages (JSON-LD on some, spec tables on
+others) with ETag or Last-Modified validators and an artificial per-request
+latency, then runs MiningNowScraper and reports pages/sec for:
+
+  cold, 1 connection        - every page fetched, parsed and upserted
+  cold, N connections       - same with the concurrent pool
+  warm, N connections       - every page answered 304 Not Modified
+  after price changes       - only the changed pages are re-parsed
+
+and checks that the catalog, prices and miningnow.com profitability points
+in the database match the fixture.
+
+Usage: python benchmarks/bench_scraper.py [--pages 20] [--per-page 25] [--latency 0.02] [--concurrency 8]
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import hashlib
+import tempfile
+import threading
+from email.utils import formatdate
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--pages', type=int, default=20, help='listing pages')
+parser.add_argument('--per-page', type=int, default=25, help='miners per listing page')
+parser.add_argument('--latency', type=float, default=0.02, help='seconds added to every response')
+parser.add_argument('--concurrency', type=int, default=8)
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_scraper.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from app.models import db, ASICMiner, ProfitabilityData, ScrapedPage
+from app.scraper import MiningNowScraper
+
+MINERS = {}
+for index in range(args.pages * args.per_page):
+    MINERS[f'fixture-{index}'] = {
+        'name': f'Fixture Miner {index}', 'manufacturer': ['Bitmain', 'MicroBT', 'Canaan'][index % 3],
+        'model': f'FX-{index}', 'hash_rate': f'{100 + index % 90} TH/s' if index % 5 else f'{9500 + index} GH/s',
+        'power': f'{3000 + index % 500} W', 'algorithm': 'SHA-256', 'price': 4000 + index, 'profit': round(5 + index % 17 * 0.5, 2)
+    }
+MODIFIED = {slug: time.time() - 86400 for slug in MINERS}
+
+def listing_html(page):
+    links = ''.join(
+        f'<li><a class="card" href="/asic-miner/fixture-{i}">Miner {i}</a></li>'
+        for i in range((page - 1) * args.per_page, page * args.per_page)
+    )
+    next_link = f'<a rel="next" href="/asic-miners/?page={page + 1}">Next</a>' if page < args.pages else ''
+    return f'<html><head><title>ASIC miners</title></head><body><ul>{links}</ul>{next_link}<a href="/about">About</a></body></html>'
+
+def detail_html(slug):
+    miner = MINERS[slug]
+    specs = (
+        f"<tr><th>Hashrate</th><td>{miner['hash_rate']}</td></tr><tr><th>Power</th><td>{miner['power']}</td></tr>"
+        f"<tr><th>Algorithm</th><td>{miner['algorithm']}</td></tr><tr><th>Profitability</th><td>${miner['profit']}/day</td></tr>"
+    )
+    product = {
+        '@context': 'https://schema.org', '@type': 'Product', 'name': miner['name'], 'model': miner['model'],
+        'brand': {'@type': 'Brand', 'name': miner['manufacturer']},
+        'offers': {'@type': 'Offer', 'price': str(miner['price']), 'priceCurrency': 'USD'}
+    }
+    filler = '<p>' + 'Lorem ipsum dolor sit amet. ' * 200 + '</p>'
+    return (f'<html><head><script type="application/ld+json">{json.dumps(product)}</script></head>'
+            f'<body><h1>{miner["name"]}</h1>{filler}<table>{specs}</table></body></html>')
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        time.sleep(args.latency)
+        url = urlparse(self.path)
+        if url.path == '/asic-miners/':
+            page = int(parse_qs(url.query).get('page', ['1'])[0])
+            body, slug = listing_html(page), None
+        elif url.path.startswith('/asic-miner/') and url.path.rsplit('/', 1)[-1] in MINERS:
+            slug = url.path.rsplit('/', 1)[-1]
+            body = detail_html(slug)
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = body.encode()
+        # Even miners use ETags, odd ones only Last-Modified; listings use ETags
+        use_etag = slug is None or int(slug.rsplit('-', 1)[-1]) % 2 == 0
+        etag = '"' + hashlib.md5(data).hexdigest() + '"'
+        last_modified = formatdate(MODIFIED.get(slug, 0), usegmt=True)
+        if use_etag and self.headers.get('If-None-Match') == etag:
+            return self._not_modified()
+        if not use_etag and self.headers.get('If-Modified-Since') == last_modified:
+            return self._not_modified()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('ETag' if use_etag else 'Last-Modified', etag if use_etag else last_modified)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _not_modified(self):
+        self.send_response(304)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FixtureHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_address[1]}'
+
+    app = create_app('development')
+    failures = []
+
+    def run(label, concurrency):
+        with app.app_context():
+            start = time.perf_counter()
+            stats = MiningNowScraper(base_url, concurrency).run()
+            elapsed = time.perf_counter() - start
+        print(f'{label:<28} {stats["pages"]:>5} pages in {elapsed:6.2f}s  {stats["pages"] / elapsed:8.1f} pages/s   '
+              f'304 {stats["not_modified"]}, unchanged {stats["unchanged"]}, inserted {stats["miners_inserted"]}, '
+              f'updated {stats["miners_updated"]}, errors {stats["errors"]}')
+        return stats
+
+    total_pages = args.pages + len(MINERS)
+    stats = run('cold, 1 connection', 1)
+    if stats['miners_inserted'] != len(MINERS) or stats['pages'] != total_pages or stats['errors']:
+        failures.append(f'cold run inserted {stats["miners_inserted"]} of {len(MINERS)} miners')
+
+    with app.app_context():
+        db.session.execute(db.delete(ScrapedPage))
+        db.session.commit()
+    stats = run(f'cold, {args.concurrency} connections', args.concurrency)
+    if stats['miners_updated'] != len(MINERS) or stats['miners_inserted']:
+        failures.append('second cold run did not match every miner to its existing row')
+
+    stats = run(f'warm, {args.concurrency} connections', args.concurrency)
+    if stats['not_modified'] != total_pages or stats['miners_updated']:
+        failures.append(f'warm run re-fetched {total_pages - stats["not_modified"]} pages')
+
+    changed = ['fixture-0', 'fixture-1', f'fixture-{len(MINERS) - 1}']
+    for slug in changed:
+        MINERS[slug]['price'] += 250
+        MODIFIED[slug] = time.time()
+    stats = run('after 3 price changes', args.concurrency)
+    if stats['miners_updated'] != len(changed):
+        failures.append(f'expected {len(changed)} updated miners, got {stats["miners_updated"]}')
+
+    with app.app_context():
+        prices = dict(db.session.query(ASICMiner.model, ASICMiner.price_usd).filter(ASICMiner.model.like('FX-%')).all())
+        wrong = [slug for slug, miner in MINERS.items() if prices.get(miner['model']) != miner['price']]
+        points = ProfitabilityData.query.filter_by(data_source='miningnow.com').count()
+        big = db.session.query(ASICMiner.hash_rate).filter_by(model='FX-0').scalar()
+    if wrong:
+        failures.append(f'{len(wrong)} miners have stale prices, e.g. {wrong[:3]}')
+    if points != 2 * len(MINERS) + len(changed):
+        failures.append(f'{points} miningnow.com profitability points, expected {2 * len(MINERS) + len(changed)}')
+    if abs(big - 9.5) > 1e-9:
+        failures.append(f'GH/s hash rate not converted to TH/s ({big})')
+    server.shutdown()
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+    print('OK: catalog matches the fixture and unchanged pages were skipped')
+
+if __name__ == '__main__':
+    main()
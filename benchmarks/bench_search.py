@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Benchmark: catalog search via the FTS index vs the old leading-wildcard ILIKE path
+
+Loads a synthetic catalog into a temporary SQLite database and times free-text
+queries and facet filters both ways.
+
+Usage: python benchmarks/bench_search.py [--miners 100000] [--repeat 5]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_search.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app import create_app
+from app.models import db, ASICMiner
+from app.search import catalog_search
+
+MANUFACTURERS = ['Bitmain', 'MicroBT', 'Canaan', 'Iceriver', 'Goldshell', 'Jasminer', 'Innosilicon']
+ALGORITHMS = ['SHA-256', 'Scrypt', 'Kheavyhash', 'Ethash', 'RandomX', 'Blake3', 'Equihash']
+WORDS = ['efficient', 'hydro', 'cooled', 'immersion', 'quiet', 'industrial', 'home', 'compact',
+         'professional', 'firmware', 'overclock', 'datacenter', 'warranty', 'refurbished', 'bulk',
+         'stock', 'shipping', 'europe', 'asia', 'psu', 'included', 'hosting', 'ready', 'tested',
+         'batch', 'new', 'used', 'noise', 'fans', 'board', 'chips', 'controller', 'custom', 'dual']
+QUERIES = ['antminer', 'hydro cooled', 'goldshell kd', 'immersion industrial warranty', 'whatsminer m5']
+SERIES = {'Bitmain': 'Antminer', 'MicroBT': 'Whatsminer', 'Canaan': 'Avalon', 'Iceriver': 'KS',
+          'Goldshell': 'KD', 'Jasminer': 'X', 'Innosilicon': 'T'}
+
+def make_miners(n, rng):
+    for i in range(n):
+        manufacturer = rng.choice(MANUFACTURERS)
+        model = f"{rng.choice('SMLKEX')}{rng.randint(1, 99)}{rng.choice(['', ' Pro', 'j Pro', ' XP', ' Hyd'])}"
+        yield {
+            'name': f"{SERIES[manufacturer]} {model}",
+            'manufacturer': manufacturer,
+            'model': model,
+            'hash_rate': rng.uniform(1, 400),
+            'power_consumption': rng.randint(300, 5500),
+            'algorithm': rng.choice(ALGORITHMS),
+            'price_usd': rng.uniform(300, 20000),
+            'description': ' '.join(rng.sample(WORDS, 8)),
+            'is_available': True
+        }
+
+def ilike_search(query, text):
+    """The pre-index search behavior: one leading-wildcard ILIKE per column"""
+    pattern = f'%{text}%'
+    return query.filter(db.or_(
+        ASICMiner.name.ilike(pattern),
+        ASICMiner.model.ilike(pattern),
+        ASICMiner.description.ilike(pattern)
+    ))
+
+def timed(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--miners', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    app = create_app('development')
+    with app.app_context():
+        batch = []
+        for row in make_miners(args.miners, rng):
+            batch.append(row)
+            if len(batch) == 5000:
+                db.session.execute(db.insert(ASICMiner), batch)
+                batch = []
+        if batch:
+            db.session.execute(db.insert(ASICMiner), batch)
+        db.session.commit()
+        print(f"{ASICMiner.query.count()} miners, search backend: {catalog_search.backend}\n")
+
+        base = lambda: ASICMiner.query.filter_by(is_available=True)
+
+        def page(query, order):
+            """One listing page as paginate() builds it: the rows plus a COUNT"""
+            return query.order_by(*order).limit(12).all(), query.count()
+
+        print(f"{'query':<32} {'ILIKE ms':>10} {'FTS ms':>10} {'speedup':>8} {'FTS hits':>9}")
+        for text in QUERIES:
+            ilike_ms, _ = timed(lambda: page(ilike_search(base(), text), [ASICMiner.created_at.desc()]), args.repeat)
+
+            def fts():
+                query, rank = catalog_search.search(base(), text)
+                return page(query, [rank.asc(), ASICMiner.id.desc()])
+            fts_ms, (_, hits) = timed(fts, args.repeat)
+            print(f"{text:<32} {ilike_ms:10.2f} {fts_ms:10.2f} {ilike_ms / fts_ms:7.1f}x {hits:9}")
+
+        print(f"\n{'facet filter':<32} {'ILIKE ms':>10} {'exact ms':>10} {'speedup':>8}")
+        for column, value in [('manufacturer', 'Goldshell'), ('algorithm', 'Blake3')]:
+            col = getattr(ASICMiner, column)
+            ilike_ms, _ = timed(lambda: page(base().filter(col.ilike(f'%{value}%')), [ASICMiner.created_at.desc()]), args.repeat)
+            exact_ms, _ = timed(lambda: page(base().filter(col == value), [ASICMiner.created_at.desc()]), args.repeat)
+            print(f"{column + '=' + value:<32} {ilike_ms:10.2f} {exact_ms:10.2f} {ilike_ms / exact_ms:7.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Benchmark: Monte Carlo ROI simulation throughput
+
+Adds a set of SHA-256 and Scrypt miners, then runs RoiSimulator.simulate()
+over all of them inline and with 2 and 4 pool processes and reports
+miner-paths/sec overall and per core (a miner-path is one miner evaluated
+over one simulated price/difficulty path for the full horizon). Checks that
+the seeded distributions are identical for every process count, that
+percentiles are ordered, and that a default-seed single-miner lookup is
+served from the SimulationResult table while other seeds are never stored.
+Pool timings include process start-up.
+
+Usage: python benchmarks/bench_simulation.py [--miners 40] [--paths 20000] [--horizon 1095] [--processes 1,2,4]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--miners', type=int, default=40)
+    parser.add_argument('--paths', type=int, default=20000)
+    parser.add_argument('--horizon', type=int, default=1095)
+    parser.add_argument('--processes', default='1,2,4')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_simulation.db')
+    os.environ['DEV_DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['SCHEDULER_ENABLED'] = 'false'
+
+    from app import create_app
+    from app.models import db, ASICMiner, SimulationResult
+    from app.simulation import RoiSimulator
+
+    app = create_app('development')
+    failures = []
+    with app.app_context():
+        db.session.execute(db.insert(ASICMiner), [{
+            'name': f'Sim Miner {i}', 'manufacturer': 'Bench', 'model': f'S{i}',
+            'hash_rate': 100 + i * 5 if i % 4 else 0.009 + i * 0.0001, 'power_consumption': 3000 + i * 20,
+            'algorithm': 'SHA-256' if i % 4 else 'Scrypt', 'price_usd': 1500 + i * 100, 'stock_quantity': 1
+        } for i in range(args.miners)])
+        db.session.commit()
+        miners = ASICMiner.query.filter_by(manufacturer='Bench').order_by(ASICMiner.id).all()
+        overrides = {'paths': args.paths, 'horizon_days': args.horizon, 'electricity_cost': 0.04, 'seed': 42}
+        miner_paths = len(miners) * args.paths
+
+        reference = None
+        for processes in [int(p) for p in args.processes.split(',')]:
+            start = time.perf_counter()
+            results = RoiSimulator(processes=processes).simulate(miners, overrides)
+            elapsed = time.perf_counter() - start
+            label = 'inline' if processes <= 1 else f'{processes} processes'
+            print(f'{label:<16} {miner_paths:>12,} miner-paths in {elapsed:6.2f}s  '
+                  f'{miner_paths / elapsed:12,.0f}/s  {miner_paths / elapsed / max(processes, 1):12,.0f}/s per core')
+            if reference is None:
+                reference = results
+            elif any(results[k]['break_even_day'] != reference[k]['break_even_day'] or
+                     results[k]['profit_at_horizon'] != reference[k]['profit_at_horizon'] for k in reference):
+                failures.append(f'{label} results differ from the inline run with the same seed')
+
+        for result in reference.values():
+            days = [d if d is not None else float('inf') for d in result['break_even_day'].values()]
+            profits = list(result['profit_at_horizon'].values())
+            if days != sorted(days) or profits != sorted(profits):
+                failures.append(f'unordered percentiles for miner {result["miner_id"]}')
+        sample = next(iter(reference.values()))
+        print(f'miner {sample["miner_id"]}: break-even {sample["break_even_day"]}, '
+              f'P(break even) {sample["probability_break_even"]}, static ROI {sample["static_roi_days"]} days')
+
+        simulator = RoiSimulator(processes=1)
+        default_seed = {**overrides, 'seed': None}
+        start = time.perf_counter()
+        _, cached = simulator.for_miner(miners[0], default_seed)
+        first = time.perf_counter() - start
+        start = time.perf_counter()
+        _, cached_again = simulator.for_miner(miners[0], default_seed)
+        second = time.perf_counter() - start
+        print(f'single miner: simulated in {first * 1000:.0f} ms, cached lookup {second * 1000:.1f} ms')
+        if cached or not cached_again:
+            failures.append('second lookup was not served from the cache')
+        stored = SimulationResult.query.count()
+        simulator.for_miner(miners[0], overrides)
+        if simulator.for_miner(miners[0], overrides)[1] or SimulationResult.query.count() != stored:
+            failures.append('a run with a non-default seed was cached')
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+    print('OK: seeded distributions match across process counts and results are cached')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+"""
+Benchmark: live stream fan-out to many connected viewers
+
+Serves the app from a threaded local server, opens N concurrent
+/api/stream connections (half subscribed to SHA-256, half to Scrypt and
+prices), then changes the BTC price once and measures how long each viewer
+takes to receive it. Checks that:
+
+  - every SHA-256 viewer got exactly one profitability event with the new price
+  - Scrypt viewers got the prices delta but no Scrypt event (nothing changed)
+  - the change cost one producer refresh regardless of N
+  - a subscriber that never reads keeps one pending event per topic (coalesced)
+
+For comparison it times N requests to /api/crypto-prices, the work one round
+of polling by the same viewers would cost.
+
+Usage: python benchmarks/bench_stream.py [--viewers 200]
+"""
+import os
+import sys
+import time
+import json
+import argparse
+import tempfile
+import threading
+import http.client
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--viewers', type=int, default=200)
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'bench_stream.db')
+os.environ['DEV_DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+os.environ['STREAM_MAX_CONNECTIONS'] = str(args.viewers + 10)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from werkzeug.serving import make_server
+from app import create_app
+from app.models import db, Cryptocurrency
+from app.cache import bump_version
+from app.coins import coin_registry
+from app.stream import broadcaster
+
+class Viewer(threading.Thread):
+    """One EventSource-like client recording the events it receives"""
+
+    def __init__(self, port, topics):
+        super().__init__(daemon=True)
+        self.port = port
+        self.topics = topics
+        self.events = []  # (arrived_at, event_name, data)
+        self.ready = threading.Event()
+
+    def run(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        conn.request('GET', f'/api/stream?topics={self.topics}')
+        response = conn.getresponse()
+        name = None
+        while True:
+            line = response.readline()
+            if not line:
+                return
+            line = line.decode().rstrip('\n')
+            if line.startswith('event: '):
+                name = line[7:]
+            elif line.startswith('data: '):
+                self.events.append((time.perf_counter(), name, json.loads(line[6:])))
+                self.ready.set()
+
+def main():
+    app = create_app('development')
+    app.config['STREAM_POLL_INTERVAL'] = 0.05
+    broadcaster.init_app(app)
+    with app.app_context():
+        coin_registry.set_network('BTC', difficulty=1.2e14)
+        coin_registry.set_network('LTC', difficulty=4.0e7)
+        for crypto in Cryptocurrency.query.all():
+            crypto.current_price = {'BTC': 60000.0, 'LTC': 80.0}[crypto.symbol]
+        db.session.commit()
+        bump_version('coins')
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    started = time.perf_counter()
+    viewers = [Viewer(port, 'SHA-256' if i % 2 == 0 else 'Scrypt,prices') for i in range(args.viewers)]
+    for viewer in viewers:
+        viewer.start()
+    for viewer in viewers:
+        viewer.ready.wait(30)
+    print(f'{args.viewers} viewers connected and primed in {time.perf_counter() - started:.2f}s')
+    failures = []
+    if any(not viewer.events for viewer in viewers):
+        failures.append('some viewers never received the initial snapshot')
+
+    refreshes_before = broadcaster.get_stats()['refreshes']
+    initial = [len(viewer.events) for viewer in viewers]
+    with app.app_context():
+        Cryptocurrency.query.filter_by(symbol='BTC').update({'current_price': 66000.0})
+        db.session.commit()
+        changed_at = time.perf_counter()
+        bump_version('coins')
+
+    deadline = time.time() + 30
+    while time.time() < deadline and any(len(v.events) == n for v, n in zip(viewers, initial)):
+        time.sleep(0.01)
+    time.sleep(max(0.5, broadcaster.poll_interval * 5))  # Let any unexpected extra events arrive
+
+    latencies = []
+    for viewer, count in zip(viewers, initial):
+        new = viewer.events[count:]
+        names = [name for _, name, _ in new]
+        if viewer.topics == 'SHA-256':
+            if names != ['profitability'] or new[0][2]['crypto_price'] != 66000.0:
+                failures.append(f'SHA-256 viewer got {names}')
+        elif names != ['prices'] or new[0][2]['bitcoin']['usd'] != 66000.0:
+            failures.append(f'Scrypt viewer got {names}')
+        if new:
+            latencies.append(new[0][0] - changed_at)
+    latencies.sort()
+    refreshes = broadcaster.get_stats()['refreshes'] - refreshes_before
+    if latencies:
+        print(f'fan-out to {len(latencies)} viewers: p50 {latencies[len(latencies) // 2] * 1000:.0f} ms   '
+              f'p99 {latencies[int(len(latencies) * 0.99) - 1] * 1000:.0f} ms   max {latencies[-1] * 1000:.0f} ms '
+              f'(includes up to {broadcaster.poll_interval * 1000:.0f} ms poll interval)')
+    print(f'producer refreshes for the change: {refreshes}')
+    if refreshes != 1:
+        failures.append(f'{refreshes} producer refreshes for one change')
+
+    # A viewer that stops reading holds at most one pending event per topic
+    with app.app_context():
+        stalled = broadcaster.subscribe({'algorithm:SHA-256'})
+        stalled.receive(0)
+        for price in (61000.0, 62000.0, 63000.0, 64000.0):
+            Cryptocurrency.query.filter_by(symbol='BTC').update({'current_price': price})
+            db.session.commit()
+            bump_version('coins')
+            broadcaster.refresh()
+        pending = stalled.receive(0)
+        broadcaster.unsubscribe(stalled)
+    print(f'stalled subscriber after 4 changes: {len(pending)} pending event(s), {stalled.coalesced} coalesced')
+    if len(pending) != 1 or pending[0][2]['crypto_price'] != 64000.0:
+        failures.append('stalled subscriber did not coalesce to the latest event')
+
+    client = app.test_client()
+    start = time.perf_counter()
+    for _ in range(args.viewers):
+        client.get('/api/crypto-prices')
+    print(f'one polling round by {args.viewers} viewers: {args.viewers} requests, {time.perf_counter() - start:.2f}s of server time')
+    print(f'stream stats: {broadcaster.get_stats()}')
+
+    broadcaster.stop()
+    server.shutdown()
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures[:10]))
+        sys.exit(1)
+    print('OK: one refresh reached every viewer with only its subscribed topics')
+
+if __name__ == '__main__':
+    main()
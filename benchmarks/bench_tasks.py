@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+Benchmark: database task queue enqueue and drain throughput
+
+Creates orders without shipping records, enqueues one orders.create_shipping
+task per order, then drains the queue with 1, 2 and 4 worker processes and
+reports tasks/sec. Verifies every order ends up with exactly one shipping
+record and no task is left pending.
+
+Uses a temporary SQLite database unless --database-url is given; PostgreSQL
+shows the effect of SKIP LOCKED claiming with several workers.
+
+Usage: python benchmarks/bench_tasks.py [--tasks 2000] [--processes 1,2,4]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+def drain(_):
+    from app import create_app
+    from app.tasks import TaskWorker
+    app = create_app('development')
+    with app.app_context():
+        worker = TaskWorker()
+        return worker.work(burst=True)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tasks', type=int, default=2000)
+    parser.add_argument('--processes', default='1,2,4')
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench_tasks.db')
+    os.environ['DEV_DATABASE_URL'] = args.database_url or f'sqlite:///{db_path}'
+    os.environ['SCHEDULER_ENABLED'] = 'false'
+
+    from app import create_app
+    from app.models import db, User, Order, Shipping, QueuedTask
+    from app.tasks import enqueue
+    from app.ids import new_order_number
+
+    app = create_app('development')
+    with app.app_context():
+        user = User.query.first()
+        db.session.execute(db.insert(Order), [{
+            'order_number': new_order_number(), 'user_id': user.id, 'total_amount': 1000,
+            'shipping_address': 'Bench', 'billing_address': 'Bench'
+        } for _ in range(args.tasks)])
+        db.session.commit()
+        order_ids = [order_id for (order_id,) in db.session.query(Order.id).order_by(Order.id).all()]
+
+    # Enqueue cost as seen by a request: one task per committed transaction
+    with app.app_context():
+        sample = order_ids[:min(500, len(order_ids))]
+        start = time.perf_counter()
+        for order_id in sample:
+            enqueue('orders.create_shipping', {'order_id': order_id})
+            db.session.commit()
+        per_commit = len(sample) / (time.perf_counter() - start)
+        QueuedTask.query.delete()
+        db.session.commit()
+    print(f'enqueue: {per_commit:,.0f} tasks/s with one commit per task')
+
+    context = multiprocessing.get_context('spawn')
+    failures = []
+    for processes in [int(p) for p in args.processes.split(',')]:
+        with app.app_context():
+            Shipping.query.delete()
+            QueuedTask.query.delete()
+            db.session.commit()
+            start = time.perf_counter()
+            for order_id in order_ids:
+                enqueue('orders.create_shipping', {'order_id': order_id})
+            db.session.commit()
+            batched = len(order_ids) / (time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with context.Pool(processes) as pool:
+            processed = sum(pool.map(drain, range(processes)))
+        elapsed = time.perf_counter() - start
+
+        with app.app_context():
+            shipped = db.session.query(db.func.count(db.distinct(Shipping.order_id))).scalar()
+            shipping_rows = Shipping.query.count()
+            left = QueuedTask.query.filter(QueuedTask.status != 'done').count()
+        print(f'{processes} process(es): enqueued {batched:,.0f} tasks/s in one transaction, '
+              f'drained {processed} tasks in {elapsed:.2f}s ({processed / elapsed:,.0f} tasks/s incl. startup)')
+        if shipped != len(order_ids) or shipping_rows != len(order_ids) or left:
+            failures.append(f'{processes} processes: {shipping_rows} shipping rows for {shipped}/{len(order_ids)} orders, {left} tasks not done')
+
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+    print('OK: every task ran exactly once')
+
+if __name__ == '__main__':
+    main()
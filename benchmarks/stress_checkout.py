@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""
+Stress test: parallel /api/cart/checkout requests against a few contested miners
+
+Fires many concurrent checkouts for more units than are in stock and checks
+that stock never goes negative and that every unit sold is backed by exactly
+one order item, for both ASICMiner.stock_quantity and Inventory.
+
+Uses a temporary SQLite database unless --database-url is given (e.g. a
+scratch PostgreSQL database, which exercises real row-level locking).
+
+Usage: python benchmarks/stress_checkout.py [--checkouts 500] [--workers 32] [--stock 100]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--checkouts', type=int, default=500)
+parser.add_argument('--workers', type=int, default=32)
+parser.add_argument('--miners', type=int, default=3)
+parser.add_argument('--stock', type=int, default=100)
+parser.add_argument('--max-quantity', type=int, default=3)
+parser.add_argument('--database-url')
+args = parser.parse_args()
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), 'stress_checkout.db')
+os.environ['DEV_DATABASE_URL'] = args.database_url or f'sqlite:///{DB_PATH}'
+os.environ['SCHEDULER_ENABLED'] = 'false'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from werkzeug.security import generate_password_hash
+from app import create_app
+from app.models import db, User, ASICMiner, Inventory, Order, OrderItem
+
+def setup(app):
+    with app.app_context():
+        miners = []
+        for i in range(args.miners):
+            miner = ASICMiner(
+                name=f'Stress Miner {i}', manufacturer='Stress', model=f'S{i}',
+                hash_rate=100, power_consumption=3000, algorithm='SHA-256',
+                price_usd=1000 + i, stock_quantity=args.stock, is_available=True
+            )
+            miner.inventory = Inventory(quantity_available=args.stock, reserved_quantity=0)
+            miners.append(miner)
+        db.session.add_all(miners)
+
+        users = [
+            User(username=f'stress{i}', email=f'stress{i}@example.com',
+                 password_hash=generate_password_hash('x', method='pbkdf2:sha256:1'))
+            for i in range(args.workers)
+        ]
+        db.session.add_all(users)
+        db.session.commit()
+        return [m.id for m in miners], [u.id for u in users]
+
+def main():
+    app = create_app('development')
+    miner_ids, user_ids = setup(app)
+    rng = random.Random(7)
+    carts = [
+        [{'miner_id': miner_id, 'quantity': rng.randint(1, args.max_quantity)}
+         for miner_id in rng.sample(miner_ids, rng.randint(1, len(miner_ids)))]
+        for _ in range(args.checkouts)
+    ]
+
+    clients = []
+    for user_id in user_ids:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        clients.append(client)
+
+    def checkout(index):
+        client = clients[index % len(clients)]
+        start = time.perf_counter()
+        response = client.post('/api/cart/checkout', json={
+            'items': carts[index], 'shipping_info': {'address': '1 Stress Way'}
+        })
+        return response.status_code, time.perf_counter() - start
+
+    # Each worker owns one client so no test client is shared between threads
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(checkout, range(args.checkouts)))
+    elapsed = time.perf_counter() - start
+
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(latency for _, latency in results)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+
+    with app.app_context():
+        sold = dict(
+            db.session.query(OrderItem.miner_id, db.func.sum(OrderItem.quantity))
+            .filter(OrderItem.miner_id.in_(miner_ids))
+            .group_by(OrderItem.miner_id)
+            .all()
+        )
+        orders = Order.query.filter(Order.user_id.in_(user_ids)).count()
+        failures = []
+        for miner in ASICMiner.query.filter(ASICMiner.id.in_(miner_ids)).all():
+            units = sold.get(miner.id, 0)
+            if miner.stock_quantity < 0 or miner.inventory.quantity_available < 0:
+                failures.append(f'{miner.name}: negative stock')
+            if miner.stock_quantity != args.stock - units:
+                failures.append(f'{miner.name}: stock {miner.stock_quantity} != {args.stock} - {units} sold')
+            if miner.inventory.quantity_available != args.stock - units:
+                failures.append(f'{miner.name}: inventory {miner.inventory.quantity_available} != {args.stock} - {units} sold')
+            print(f'{miner.name}: sold {units}/{args.stock}, remaining {miner.stock_quantity}')
+
+    if not statuses.get(200):
+        failures.append('no checkout succeeded')
+    if orders != statuses.get(200, 0):
+        failures.append(f'{orders} orders stored but {statuses.get(200, 0)} checkouts succeeded')
+
+    print(f'checkouts: {args.checkouts}  workers: {args.workers}  statuses: {dict(statuses)}')
+    print(f'throughput: {args.checkouts / elapsed:.1f} checkouts/s  p99 latency: {p99:.1f} ms')
+    if failures:
+        print('FAILED:\n  ' + '\n  '.join(failures))
+        sys.exit(1)
+    print('OK: no overselling')
+
+if __name__ == '__main__':
+    main()
@@ -79,7 +79,7 @@ def init_database():
             'name': 'Antminer L7',
             'manufacturer': 'Bitmain',
             'model': 'L7',
-            'hash_rate': 9.5,
+            'hash_rate': 0.0095,  # 9.5 GH/s
             'power_consumption': 3425,
             'algorithm': 'Scrypt',
             'price_usd': 8500,
@@ -91,7 +91,7 @@ def init_database():
             'name': 'Iceriver KS0 Pro',
             'manufacturer': 'Iceriver',
             'model': 'KS0 Pro',
-            'hash_rate': 2.0,
+            'hash_rate': 0.2,  # 200 GH/s
             'power_consumption': 450,
             'algorithm': 'Kheavyhash',
             'price_usd': 2500,
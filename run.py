@@ -1,7 +1,20 @@
 import os
+import time
+import click
 from app import create_app, db
 from app.models import User, ASICMiner, Inventory, ProfitabilityData, Cryptocurrency
 from app.services import ProfitabilityCalculator, CryptoPriceAPI
+from app.retention import ProfitabilityStore
+from app.reviews import ReviewService
+from app.search import catalog_search
+from app.reservations import reservations
+from app.scheduler import scheduler
+from app.tasks import run_workers
+from app.scraper import MiningNowScraper
+from app.imports import CatalogImporter
+from app.schema import upgrade_schema
+from app.coins import coin_registry
+from app.simulation import RoiSimulator
 
 app = create_app(os.environ.get('FLASK_ENV', 'development'))
 
@@ -81,7 +94,7 @@ def init_db():
             'name': 'Antminer L7',
             'manufacturer': 'Bitmain',
             'model': 'L7',
-            'hash_rate': 9.5,
+            'hash_rate': 0.0095,  # 9.5 GH/s
             'power_consumption': 3425,
             'algorithm': 'Scrypt',
             'price_usd': 8500,
@@ -93,7 +106,7 @@ def init_db():
             'name': 'Iceriver KS0 Pro',
             'manufacturer': 'Iceriver',
             'model': 'KS0 Pro',
-            'hash_rate': 2.0,
+            'hash_rate': 0.2,  # 200 GH/s
             'power_consumption': 450,
             'algorithm': 'Kheavyhash',
             'price_usd': 2500,
@@ -105,7 +118,7 @@ def init_db():
             'name': 'Antminer E9',
             'manufacturer': 'Bitmain',
             'model': 'E9',
-            'hash_rate': 2400.0,
+            'hash_rate': 0.0024,  # 2.4 GH/s
             'power_consumption': 1920,
             'algorithm': 'Ethash',
             'price_usd': 9000,
@@ -115,8 +128,16 @@ def init_db():
         }
     ]
     
+    # Rates these miners were first seeded with, in GH/s or MH/s rather than TH/s
+    legacy_hash_rates = {'Antminer L7': 9.5, 'Iceriver KS0 Pro': 2.0, 'Antminer E9': 2400.0}
+    
     for miner_data in sample_miners:
-        if not ASICMiner.query.filter_by(name=miner_data['name']).first():
+        existing = ASICMiner.query.filter_by(name=miner_data['name']).first()
+        if existing:
+            if existing.hash_rate == legacy_hash_rates.get(existing.name):
+                existing.hash_rate = miner_data['hash_rate']
+                print(f"Corrected {existing.name} hash rate to {existing.hash_rate} TH/s")
+        else:
             miner = ASICMiner(**miner_data)
             db.session.add(miner)
             db.session.flush()
@@ -131,12 +152,84 @@ def init_db():
     db.session.commit()
     print("Database initialized with sample data")
 
+@app.cli.command()
+def upgrade_db():
+    """Add tables, columns and indexes the models gained since the database was created"""
+    changes = upgrade_schema()
+    for change in changes:
+        print(change)
+    print(f"Schema up to date ({len(changes)} changes)")
+
 @app.cli.command()
 def update_profitability():
     """Update profitability data for all miners"""
     ProfitabilityCalculator.update_all_profitability_data()
     print("Profitability data updated")
 
+@app.cli.command()
+def compact_profitability():
+    """Downsample old profitability data into hourly and daily rollups"""
+    stats = ProfitabilityStore.compact()
+    print(f"Compacted {stats['raw_rows_compacted']} raw rows into {stats['hourly_rollups_written']} hourly rollups")
+    print(f"Compacted {stats['hourly_rollups_compacted']} hourly rollups into {stats['daily_rollups_written']} daily rollups")
+
+@app.cli.command()
+def rebuild_latest_profitability():
+    """Rebuild the per-miner latest profitability snapshot from history"""
+    count = ProfitabilityStore.rebuild_latest()
+    print(f"Latest profitability rebuilt for {count} miners")
+
+@app.cli.command()
+def rebuild_review_stats():
+    """Recompute rating counts, sums and histograms for all miners"""
+    count = ReviewService.rebuild_stats()
+    print(f"Review stats rebuilt for {count} miners")
+
+@app.cli.command()
+def rebuild_search_index():
+    """Rebuild the catalog full-text search index"""
+    backend = catalog_search.rebuild()
+    print(f"Search index rebuilt ({backend})")
+
+@app.cli.command()
+def expire_reservations():
+    """Expire overdue stock holds and return their units to stock"""
+    count = reservations.expire_holds()
+    print(f"Expired {count} stock reservations")
+
+@app.cli.command()
+def resync_stock_shards():
+    """Recompute reservation stock shards from on-hand stock, e.g. after a manual restock"""
+    count = reservations.resync_shards()
+    print(f"Stock shards resynced for {count} miners")
+
+@app.cli.command()
+@click.option('--base-url', help='Scrape this site instead of MININGNOW_BASE_URL')
+@click.option('--concurrency', type=int, help='Parallel requests')
+def sync_miningnow(base_url, concurrency):
+    """Import miners and profitability from miningnow.com, skipping unchanged pages"""
+    stats = MiningNowScraper(base_url, concurrency).run()
+    print(f"Fetched {stats['pages']} pages ({stats['not_modified']} not modified, {stats['unchanged']} unchanged, {stats['errors']} errors)")
+    print(f"Miners inserted: {stats['miners_inserted']}, updated: {stats['miners_updated']}")
+
+@app.cli.command()
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json']), help='File format (default from the extension)')
+@click.option('--dry-run', is_flag=True, help='Validate every row without saving')
+@click.option('--batch-size', type=int, help='Rows per transaction (default IMPORT_BATCH_SIZE)')
+def import_miners(path, fmt, dry_run, batch_size):
+    """Bulk import or update miners from a CSV, JSON or NDJSON price list"""
+    fmt = fmt or ('json' if path.lower().endswith(('.json', '.ndjson')) else 'csv')
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = CatalogImporter(batch_size, dry_run).run(stream, fmt)
+    print(f"{'Checked' if dry_run else 'Imported'} {report['rows']} rows in {report['seconds']}s")
+    print(f"Miners inserted: {report['inserted']}, updated: {report['updated']}, invalid: {report['invalid']}, "
+          f"failed: {report['failed']}, repeated: {report['duplicates']}")
+    for error in report['errors'][:20]:
+        print(f"  row {error['row']}: {error['message']}")
+    if len(report['errors']) > 20:
+        print(f"  ... and {len(report['errors']) - 20} more")
+
 @app.cli.command()
 def update_crypto_prices():
     """Update cryptocurrency prices"""
@@ -144,6 +237,61 @@ def update_crypto_prices():
     api.update_crypto_data()
     print("Cryptocurrency prices updated")
 
+@app.cli.command()
+@click.argument('symbol')
+@click.option('--difficulty', type=float, help='Network difficulty')
+@click.option('--block-reward', type=float, help='Coins per block')
+def set_coin_network(symbol, difficulty, block_reward):
+    """Override a coin's network difficulty and block reward used for profitability"""
+    crypto = coin_registry.set_network(symbol.upper(), difficulty, block_reward)
+    print(f"{crypto.symbol}: difficulty {crypto.network_difficulty}, block reward {crypto.block_reward}")
+
+@app.cli.command()
+def refresh_coin_network():
+    """Fetch current network difficulty for coins that have a public source"""
+    updated = coin_registry.refresh_network()
+    print(f"Network difficulty refreshed for: {', '.join(updated) or 'none'}")
+
+@app.cli.command()
+@click.argument('name')
+def run_job(name):
+    """Run a scheduled job now, recording it in the job history"""
+    if name not in scheduler.jobs:
+        print(f"Unknown job {name}; available: {', '.join(sorted(scheduler.jobs))}")
+        return
+    if scheduler.run_now(name):
+        print(f"Job {name} finished: {scheduler.get_status(history=1)[name]['last_status']}")
+    else:
+        print(f"Job {name} is already running on another worker")
+
+@app.cli.command()
+@click.option('--paths', type=int, help='Paths per miner (default SIMULATION_PATHS)')
+@click.option('--horizon-days', type=int, help='Days simulated (default SIMULATION_HORIZON_DAYS)')
+@click.option('--processes', type=int, help='Worker processes (default SIMULATION_PROCESSES)')
+def simulate_roi(paths, horizon_days, processes):
+    """Run the Monte Carlo ROI simulation for every available miner and cache the results"""
+    stats = RoiSimulator(processes).simulate_catalog({'paths': paths, 'horizon_days': horizon_days})
+    print(f"Simulated {stats['miners']} miners ({stats['paths']} paths) in {stats['seconds']}s")
+
+@app.cli.command()
+def run_scheduler():
+    """Run the job scheduler in the foreground (set SCHEDULER_ENABLED=false on web workers)"""
+    print(f"Scheduler running jobs: {', '.join(sorted(scheduler.jobs))}")
+    tick = app.config.get('SCHEDULER_TICK', 15)
+    while True:
+        with app.app_context():
+            scheduler.run_pending()
+        time.sleep(tick)
+
+@app.cli.command()
+@click.option('--processes', default=1, help='Worker processes to run')
+@click.option('--batch-size', type=int, help='Tasks claimed per round trip')
+def run_worker(processes, batch_size):
+    """Process background tasks from the database queue until interrupted"""
+    print(f"Task worker starting with {processes} process(es)")
+    run_workers(app, processes, batch_size=batch_size)
+
 if __name__ == '__main__':
+    scheduler.autostart(app)
     # Use use_reloader=False to prevent reload issues on Windows
     app.run(debug=False, host='0.0.0.0', port=5000)
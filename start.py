@@ -16,6 +16,7 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 from app import create_app, db
 from app.models import User, ASICMiner
+from app.scheduler import scheduler
 
 def main():
     """Run the application"""
@@ -55,7 +56,7 @@ def main():
             miners_data = [
                 {'name': 'Antminer S19 Pro', 'manufacturer': 'Bitmain', 'model': 'S19 Pro', 'hash_rate': 110.0, 'power_consumption': 1450, 'algorithm': 'SHA-256', 'price_usd': 6500, 'stock_quantity': 50},
                 {'name': 'MicroBT Whatsminer M50S', 'manufacturer': 'MicroBT', 'model': 'M50S', 'hash_rate': 126.0, 'power_consumption': 1632, 'algorithm': 'SHA-256', 'price_usd': 7200, 'stock_quantity': 35},
-                {'name': 'Antminer L7', 'manufacturer': 'Bitmain', 'model': 'L7', 'hash_rate': 9.5, 'power_consumption': 3425, 'algorithm': 'Scrypt', 'price_usd': 8500, 'stock_quantity': 20},
+                {'name': 'Antminer L7', 'manufacturer': 'Bitmain', 'model': 'L7', 'hash_rate': 0.0095, 'power_consumption': 3425, 'algorithm': 'Scrypt', 'price_usd': 8500, 'stock_quantity': 20},
             ]
             
             for data in miners_data:
@@ -79,6 +80,7 @@ def main():
     print("🌐 Starting server...\n")
     
     # Run the app
+    scheduler.autostart(app)
     app.run(debug=True, host='0.0.0.0', port=5000)
 
 if __name__ == '__main__':
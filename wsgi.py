@@ -5,9 +5,12 @@ Full Flask app with beautiful UI and all features
 import os
 from app import create_app, db
 from app.models import User, ASICMiner
+from app.scheduler import scheduler
 
 # Create the Flask app
 app = create_app(os.environ.get('FLASK_ENV', 'production'))
+# Web server process: run the periodic jobs here, never in CLI or worker processes
+scheduler.autostart(app)
 
 @app.shell_context_processor
 def make_shell_context():